@@ -0,0 +1,138 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Cache of ASR results keyed by a hash of the decoded 16 kHz PCM, the language and
+the model, so a clip sent again (on retries, or to validate it again) skips the
+model server. Recent results are kept in a bounded in-memory LRU; older ones are
+found through the `audio_hash` of the stored SpeechToTextAudio rows.
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .models import SpeechToTextAudio
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Thread-safe mapping that drops the least recently used key when full."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def set(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+_memory = LRUCache(settings.ASR_CACHE_SIZE)
+
+
+def audio_hash(samples):
+    """sha256 of the decoded float32 samples."""
+    return hashlib.sha256(samples.tobytes()).hexdigest()
+
+
+def model_key():
+    """
+    Configured ASR model and version, stored as the `cache_model` of the
+    SpeechToTextAudio rows. The name and version the model server reports may
+    differ from them, so entries are never keyed on those.
+    """
+    model_name = settings.APP_SETTINGS.inference_asr_model_name
+    return f"{model_name}:{settings.ASR_MODEL_VERSION}"
+
+
+def _key(audio_hash, lang_code, cache_model):
+    return (audio_hash, lang_code, cache_model)
+
+
+def get(audio_hash, lang_code):
+    """
+    Returns the cached result (text, model_name, model_version) of the current ASR
+    model for the clip, or `None`.
+    """
+    cache_model = model_key()
+    key = _key(audio_hash, lang_code, cache_model)
+
+    result = _memory.get(key)
+    if result is not None:
+        logger.debug("ASR cache hit in memory")
+        return result
+
+    row = (
+        SpeechToTextAudio.objects.filter(
+            audio_hash=audio_hash,
+            language__code=lang_code,
+            cache_model=cache_model,
+        )
+        .only("text", "model_name", "model_version")
+        .order_by("-created_at")
+        .first()
+    )
+    if row is None:
+        return None
+    logger.debug("ASR cache hit in database")
+    result = {
+        "text": row.text,
+        "model_name": row.model_name,
+        "model_version": row.model_version,
+    }
+    _memory.set(key, result)
+    return result
+
+
+def put(audio_hash, lang_code, result):
+    """Keeps a transcription returned by the model in the memory tier."""
+    key = _key(audio_hash, lang_code, model_key())
+    _memory.set(
+        key,
+        {
+            "text": result["text"],
+            "model_name": result["model_name"],
+            "model_version": result["model_version"],
+        },
+    )
+
+
+def clear():
+    _memory.clear()
@@ -0,0 +1,316 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Streaming speech-to-text over WebSocket, served by the ASGI application
+(translatorapp/asgi.py) at /api/speech-to-text/stream/.
+
+The client sends a start message, then 16 kHz mono PCM16 audio as binary messages
+while recording, and an end message when done:
+
+    -> {"type": "start", "language": "rap", "token": "..."}
+    -> <binary PCM16> ...
+    <- {"type": "partial", "text": "..."}
+    -> {"type": "end"}
+    <- {"type": "final", "id": 1, "text": "...", ...}
+
+Audio is split in segments at pauses. The open segment is transcribed again every
+ASR_STREAM_PARTIAL_SECONDS of new audio and sent as a partial transcription; once
+a pause closes it its text is kept, so each ASR call covers a few seconds of audio
+however long the recording is. When the client ends, only the audio received
+after the last partial is left to transcribe.
+"""
+
+import io
+import json
+import logging
+import time
+
+import numpy as np
+import soundfile as sf
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Lang, SpeechToTextAudio
+from .utils import asr_deployment, get_asr_prediction
+
+logger = logging.getLogger(__name__)
+
+PATH = "/api/speech-to-text/stream/"
+SAMPLING_RATE = 16000
+
+
+class StreamError(Exception):
+    """Ends the stream, sending `detail` to the client before closing."""
+
+    def __init__(self, detail, code=1008):
+        super().__init__(detail)
+        self.detail = detail
+        self.code = code
+
+
+class Disconnected(Exception):
+    """The client closed the socket."""
+
+
+def _is_silent(audio):
+    rms = np.sqrt(np.mean(np.square(audio))) if len(audio) else 0.0
+    return 20 * np.log10(rms + 1e-10) < settings.ASR_STREAM_SILENCE_DB
+
+
+async def transcribe(audio, lang_code):
+    return await sync_to_async(get_asr_prediction, thread_sensitive=False)(
+        audio, SAMPLING_RATE, lang_code, deployment=asr_deployment()
+    )
+
+
+class StreamTranscriber:
+    """
+    Transcribes PCM16 audio as it arrives, segment by segment.
+    """
+
+    def __init__(self, lang_code, transcribe=transcribe):
+        self.lang_code = lang_code
+        self.transcribe = transcribe
+        self.model_name = None
+        self.model_version = None
+        self.texts = []  # transcriptions of closed segments
+        self.pcm = bytearray()  # whole recording, kept to store it
+        self._remainder = b""  # odd byte of a chunk split mid sample
+        self._open_segment()
+
+    def _open_segment(self):
+        self.segment = np.zeros(0, dtype=np.float32)
+        self.segment_text = ""
+        self.transcribed = 0  # samples of the segment covered by segment_text
+        self.speech = False
+
+    @property
+    def text(self):
+        return " ".join(t for t in [*self.texts, self.segment_text] if t)
+
+    @property
+    def seconds(self):
+        return len(self.pcm) / 2 / SAMPLING_RATE
+
+    async def feed(self, data):
+        """
+        Adds a chunk of audio. Returns the transcription so far when a partial is
+        due, otherwise `None`.
+        """
+        data = self._remainder + data
+        data, self._remainder = data[: len(data) // 2 * 2], data[len(data) // 2 * 2 :]
+        self.pcm.extend(data)
+        samples = np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768
+        self.segment = np.concatenate([self.segment, samples])
+        self.speech = self.speech or not _is_silent(samples)
+
+        silence = int(settings.ASR_STREAM_SILENCE_SECONDS * SAMPLING_RATE)
+        paused = len(self.segment) >= silence and _is_silent(self.segment[-silence:])
+        if paused and not self.speech:
+            # nothing said yet, drop the silence
+            self._open_segment()
+            return None
+        if paused or (
+            len(self.segment) >= settings.ASR_STREAM_MAX_SEGMENT_SECONDS * SAMPLING_RATE
+        ):
+            await self._transcribe_segment()
+            self._close_segment()
+            return self.text
+        if (
+            len(self.segment) - self.transcribed
+            >= settings.ASR_STREAM_PARTIAL_SECONDS * SAMPLING_RATE
+        ):
+            await self._transcribe_segment()
+            return self.text
+        return None
+
+    async def finish(self):
+        """Transcribes the audio left and returns the final transcription."""
+        if self.transcribed < len(self.segment):
+            await self._transcribe_segment()
+        self._close_segment()
+        return self.text
+
+    async def _transcribe_segment(self):
+        if self.speech:
+            self.segment_text, self.model_name, self.model_version = (
+                await self.transcribe(self.segment.copy(), self.lang_code)
+            )
+        self.transcribed = len(self.segment)
+
+    def _close_segment(self):
+        if self.segment_text:
+            self.texts.append(self.segment_text)
+        self._open_segment()
+
+    def wav(self):
+        buffer = io.BytesIO()
+        sf.write(
+            buffer,
+            np.frombuffer(bytes(self.pcm), dtype="<i2"),
+            SAMPLING_RATE,
+            format="WAV",
+            subtype="PCM_16",
+        )
+        return buffer.getvalue()
+
+
+def database_sync_to_async(fn):
+    """
+    Runs `fn` in a thread like `sync_to_async`, closing stale database connections
+    before and after as Django does around each HTTP request.
+    """
+
+    def inner(*args, **kwargs):
+        close_old_connections()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(inner)
+
+
+async def _send_json(send, data):
+    await send({"type": "websocket.send", "text": json.dumps(data, cls=JSONEncoder)})
+
+
+async def _receive(receive):
+    message = await receive()
+    if message["type"] == "websocket.disconnect":
+        raise Disconnected()
+    return message
+
+
+def _parse(message):
+    try:
+        return json.loads(message.get("text") or "")
+    except json.JSONDecodeError:
+        raise StreamError("Expected a JSON message")
+
+
+@database_sync_to_async
+def _authenticate(token):
+    if token:
+        try:
+            user, _ = TokenAuthentication().authenticate_credentials(token)
+        except AuthenticationFailed as e:
+            raise StreamError(str(e.detail))
+        return user
+    if getattr(settings, "TRANSLATION_REQUIRES_AUTH", False):
+        raise StreamError("Authentication credentials were not provided.")
+    return None
+
+
+@database_sync_to_async
+def _get_lang(language_code):
+    try:
+        return Lang.objects.get(code=language_code)
+    except Lang.DoesNotExist:
+        logger.error(f"Language with code '{language_code}' not found")
+        raise StreamError(f"Language code '{language_code}' not supported")
+
+
+@database_sync_to_async
+def _save(transcriber, lang, user):
+    audio_obj = SpeechToTextAudio.objects.create(
+        text=transcriber.text,
+        language=lang,
+        audio_file=ContentFile(transcriber.wav(), name="stream.wav"),
+        audio_format="wav",
+        model_name=transcriber.model_name,
+        model_version=transcriber.model_version,
+        validated=False,
+        validated_text=None,
+        user=user,
+    )
+    return {
+        "type": "final",
+        "id": audio_obj.id,
+        "text": audio_obj.text,
+        "language": lang.code,
+        "audio_url": audio_obj.audio_file.url if audio_obj.audio_file else None,
+        "audio_format": "wav",
+        "model_name": audio_obj.model_name,
+        "model_version": audio_obj.model_version,
+        "validated": False,
+        "validated_text": None,
+    }
+
+
+async def _stream(receive, send):
+    start = _parse(await _receive(receive))
+    if start.get("type") != "start":
+        raise StreamError("The first message must be of type 'start'")
+    user = await _authenticate(start.get("token"))
+    lang = await _get_lang(start.get("language"))
+    logger.info("Received streaming speech-to-text request")
+
+    transcriber = StreamTranscriber(lang.code)
+    while True:
+        message = await _receive(receive)
+        if message.get("bytes") is not None:
+            text = await transcriber.feed(message["bytes"])
+            if transcriber.seconds > settings.ASR_STREAM_MAX_SECONDS:
+                raise StreamError(
+                    "Recording longer than "
+                    f"{settings.ASR_STREAM_MAX_SECONDS:g} seconds",
+                    code=1009,
+                )
+            if text is not None:
+                await _send_json(send, {"type": "partial", "text": text})
+        elif _parse(message).get("type") == "end":
+            break
+
+    end = time.perf_counter()
+    await transcriber.finish()
+    result = await _save(transcriber, lang, user)
+    result["latency_ms"] = round((time.perf_counter() - end) * 1000, 1)
+    logger.info(
+        f"Streaming ASR transcription complete: {transcriber.seconds:.1f}s of audio, "
+        f"final transcription after {result['latency_ms']}ms"
+    )
+    await _send_json(send, result)
+
+
+async def speech_to_text_stream(scope, receive, send):
+    """ASGI application of the streaming speech-to-text WebSocket."""
+    message = await receive()
+    if message["type"] != "websocket.connect":
+        return
+    await send({"type": "websocket.accept"})
+
+    code = 1000
+    try:
+        await _stream(receive, send)
+    except Disconnected:
+        logger.debug("Client closed the speech-to-text stream")
+        return
+    except StreamError as e:
+        await _send_json(send, {"type": "error", "detail": e.detail})
+        code = e.code
+    except Exception as e:
+        logger.error(f"Failed to transcribe speech stream: {str(e)}")
+        await _send_json(
+            send, {"type": "error", "detail": "Error en la transcripción del audio"}
+        )
+        code = 1011
+    await send({"type": "websocket.close", "code": code})
@@ -0,0 +1,163 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Decoding of uploaded audio into the 16 kHz mono float32 samples the ASR model
+expects. WAV, FLAC and Ogg Vorbis are decoded in-process with soundfile and
+resampled with soxr. Containers libsndfile cannot read (webm, mp4) and Opus, which
+ffmpeg decodes faster, fall back to an ffmpeg subprocess.
+"""
+
+import io
+import logging
+import subprocess
+import threading
+
+import numpy as np
+import soundfile as sf
+import soxr
+
+logger = logging.getLogger(__name__)
+
+SAMPLING_RATE = 16000
+# silence appended to every clip, as the ffmpeg apad filter did before
+PAD_SECONDS = 0.1
+# only decoded with ffmpeg
+FFMPEG_CONTAINERS = ("webm", "mp4")
+# readable by soundfile, but several times slower than with ffmpeg
+FFMPEG_SUBTYPES = ("OPUS",)
+
+
+class AudioDecodeError(Exception):
+    """Raised when the uploaded audio cannot be decoded."""
+
+
+def sniff_container(b: bytes) -> str | None:
+    try:
+        if b.startswith(b"OggS"):
+            return "ogg"
+        if b.startswith(b"\x1aE\xdf\xa3") or b[0:64].find(b"webm") != -1:
+            return "webm"
+        if b.startswith(b"RIFF") and b[8:12] == b"WAVE":
+            return "wav"
+        if b.startswith(b"fLaC"):
+            return "flac"
+        # naive MP4/ISOBMFF check
+        if b[4:8] == b"ftyp":
+            return "mp4"
+    except Exception:
+        pass
+    return None
+
+
+def to_pcm16(waveform):
+    """Float waveform in [-1, 1] as 16-bit little-endian PCM bytes."""
+    waveform = np.clip(np.asarray(waveform, dtype=np.float32), -1.0, 1.0)
+    return (waveform * 32767).astype("<i2").tobytes()
+
+
+def from_pcm16(pcm):
+    """16-bit little-endian PCM bytes as a float32 waveform in [-1, 1]."""
+    return np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32767
+
+
+# Scratch array soundfile reads into, reused by every decode in the same thread and
+# grown when needed. Decoded samples are always copied out of it.
+_buffers = threading.local()
+
+
+def _buffer(name, size):
+    buffer = getattr(_buffers, name, None)
+    if buffer is None or len(buffer) < size:
+        grown = 2 * len(buffer) if buffer is not None else 0
+        buffer = np.empty(max(size, grown), dtype=np.float32)
+        setattr(_buffers, name, buffer)
+    return buffer[:size]
+
+
+def _padded(samples):
+    """Copies `samples` into a new array, followed by PAD_SECONDS of zeros."""
+    pad = int(PAD_SECONDS * SAMPLING_RATE)
+    out = np.zeros(len(samples) + pad, dtype=np.float32)
+    out[: len(samples)] = samples
+    return out
+
+
+def _decode_soundfile(audio_bytes):
+    """Decodes with soundfile, or returns `None` if ffmpeg is faster for the codec."""
+    with sf.SoundFile(io.BytesIO(audio_bytes)) as f:
+        if f.subtype in FFMPEG_SUBTYPES:
+            return None
+        frames = _buffer("frames", f.frames * f.channels).reshape(-1, f.channels)
+        read = f.read(dtype="float32", out=frames)
+        sampling_rate = f.samplerate
+
+    samples = read.mean(axis=1) if read.shape[1] > 1 else read[:, 0]
+    if sampling_rate != SAMPLING_RATE:
+        samples = soxr.resample(samples, sampling_rate, SAMPLING_RATE)
+    return samples
+
+
+def _decode_ffmpeg(audio_bytes, container=None):
+    command = [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-analyzeduration",
+        "10M",
+        "-probesize",
+        "10M",
+        *(["-f", container] if container else []),
+        "-i",
+        "pipe:0",
+        "-ac",
+        "1",
+        "-ar",
+        str(SAMPLING_RATE),
+        "-f",
+        "f32le",
+        "pipe:1",
+    ]
+    result = subprocess.run(command, input=audio_bytes, capture_output=True)
+    if result.returncode != 0 or not result.stdout:
+        logger.error(f"ffmpeg error: {result.stderr.decode(errors='ignore')[-1024:]}")
+        raise AudioDecodeError("ffmpeg could not decode the audio")
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+
+def decode_audio(audio_bytes):
+    """
+    Decodes an uploaded recording into 16 kHz mono float32 samples, followed by
+    PAD_SECONDS of silence. The returned array is owned by the caller.
+    """
+    container = sniff_container(audio_bytes)
+    logger.debug(f"Detected container: {container}")
+
+    if container not in FFMPEG_CONTAINERS:
+        try:
+            samples = _decode_soundfile(audio_bytes)
+        except sf.SoundFileError as e:
+            logger.debug(f"soundfile could not decode the audio, using ffmpeg: {e}")
+            samples = None
+        if samples is not None:
+            if not len(samples):
+                raise AudioDecodeError("Decoded audio has zero length")
+            return _padded(samples)
+
+    samples = _decode_ffmpeg(
+        audio_bytes, container if container in ("webm", "ogg", "mp4") else None
+    )
+    return _padded(samples)
@@ -0,0 +1,165 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Shared HTTP client for the inference servers. Keeps a keep-alive session with its
+own connection pool and circuit breaker per deployment, so requests reuse open
+connections instead of paying a TCP (and TLS) handshake each time.
+"""
+
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# gateway errors returned while a model server is starting or overloaded
+RETRY_STATUS_CODES = {502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a deployment failed too many times in a row."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `max_failures` consecutive failures, rejecting calls for
+    `reset_timeout` seconds. Then a single trial call is let through: the circuit
+    closes if it succeeds and opens again if it fails.
+    """
+
+    def __init__(self, max_failures, reset_timeout):
+        self.max_failures = max_failures
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # half open, let one call through
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.max_failures:
+                self.opened_at = time.monotonic()
+
+
+class DeploymentClient:
+    """Pooled session and circuit breaker of a single deployment."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=settings.INFERENCE_POOL_SIZE,
+            max_retries=0,
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.breaker = CircuitBreaker(
+            settings.INFERENCE_CIRCUIT_FAILURES, settings.INFERENCE_CIRCUIT_RESET
+        )
+
+    def post(self, url, **kwargs):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {self.base_url}")
+
+        kwargs.setdefault(
+            "timeout",
+            (settings.INFERENCE_CONNECT_TIMEOUT, settings.INFERENCE_READ_TIMEOUT),
+        )
+        max_retries = settings.INFERENCE_MAX_RETRIES
+        for attempt in range(max_retries + 1):
+            try:
+                response = self.session.post(url, **kwargs)
+            except requests.ConnectionError as e:
+                # includes ConnectTimeout, the request never reached the server
+                error = e
+            except requests.Timeout:
+                # the server may still be generating, sending it again would only
+                # add another expensive call
+                self.breaker.record_failure()
+                raise
+            else:
+                if response.status_code not in RETRY_STATUS_CODES:
+                    self.breaker.record_success()
+                    return response
+                error = None
+
+            if attempt == max_retries:
+                break
+            # exponential backoff with full jitter
+            delay = random.uniform(0, settings.INFERENCE_RETRY_BACKOFF * 2**attempt)
+            logger.warning(
+                f"Inference call to {url} failed (attempt {attempt + 1}), "
+                f"retrying in {delay:.2f}s"
+            )
+            time.sleep(delay)
+
+        self.breaker.record_failure()
+        if error is not None:
+            raise error
+        return response
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(url):
+    """Returns the client of the deployment serving `url`."""
+    parts = urlsplit(url)
+    base_url = f"{parts.scheme}://{parts.netloc}"
+    with _clients_lock:
+        if base_url not in _clients:
+            _clients[base_url] = DeploymentClient(base_url)
+        return _clients[base_url]
+
+
+def post(url, **kwargs):
+    """
+    Sends a POST request to an inference server through its pooled session.
+    Connection errors, connect timeouts and gateway errors are retried, read
+    timeouts are not.
+    """
+    return get_client(url).post(url, **kwargs)
+
+
+def reset():
+    """Closes all sessions. Used by tests and the benchmark."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.session.close()
+        _clients.clear()
@@ -0,0 +1,103 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+KServe v2 binary tensor extension, as implemented by Triton's HTTP endpoint.
+Tensors are sent as raw little-endian bytes after the JSON header instead of JSON
+number lists: the body is `<json header><tensor 1 bytes><tensor 2 bytes>...` and
+the `Inference-Header-Content-Length` header has the size of the JSON part.
+"""
+
+import json
+
+import numpy as np
+
+HEADER_LENGTH = "Inference-Header-Content-Length"
+
+DATATYPES = {
+    "BOOL": np.bool_,
+    "UINT8": np.uint8,
+    "INT16": np.int16,
+    "INT32": np.int32,
+    "INT64": np.int64,
+    "FP16": np.float16,
+    "FP32": np.float32,
+    "FP64": np.float64,
+}
+
+
+def encode_request(inputs, binary_inputs=None, binary_outputs=None):
+    """
+    Builds the body and headers of an inference request.
+
+    Args:
+        inputs (`list[dict]`): Inputs sent as JSON, in the usual v2 format.
+        binary_inputs (`dict[str, tuple[str, np.ndarray]]`, *optional*):
+            Inputs sent as raw bytes, mapping their name to (datatype, array).
+        binary_outputs (`list[str]`, *optional*):
+            Outputs the server should return as raw bytes.
+    """
+    # binary inputs go first, in the same order as their bytes in the body
+    binary_specs = []
+    chunks = []
+    for name, (datatype, array) in (binary_inputs or {}).items():
+        data = np.ascontiguousarray(array, dtype=DATATYPES[datatype]).tobytes()
+        binary_specs.append(
+            {
+                "name": name,
+                "shape": list(array.shape),
+                "datatype": datatype,
+                "parameters": {"binary_data_size": len(data)},
+            }
+        )
+        chunks.append(data)
+
+    request = {"id": "0", "inputs": binary_specs + list(inputs)}
+    if binary_outputs:
+        request["outputs"] = [
+            {"name": name, "parameters": {"binary_data": True}}
+            for name in binary_outputs
+        ]
+
+    header = json.dumps(request).encode("utf-8")
+    headers = {
+        "Content-Type": "application/octet-stream",
+        HEADER_LENGTH: str(len(header)),
+    }
+    return b"".join([header, *chunks]), headers
+
+
+def decode_response(response):
+    """
+    Parses an inference response. The `data` of binary outputs is set to a numpy
+    array with the output shape.
+    """
+    header_length = response.headers.get(HEADER_LENGTH)
+    if header_length is None:
+        return response.json()
+
+    content = response.content
+    header_length = int(header_length)
+    result = json.loads(content[:header_length])
+    offset = header_length
+    for output in result.get("outputs", []):
+        size = output.get("parameters", {}).get("binary_data_size")
+        if size is None:
+            continue
+        output["data"] = np.frombuffer(
+            content[offset : offset + size], dtype=DATATYPES[output["datatype"]]
+        ).reshape(output["shape"])
+        offset += size
+    return result
@@ -0,0 +1,90 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from django.core.management.base import BaseCommand
+from main.models import CacheTTS
+from main.normalization import normalize_text_for_cache, normalized_hash
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills normalized_text and normalized_hash of CacheTTS rows written before "
+        "they existed (or with raw SQL). No row is deleted: the key is unique per "
+        "language and gender, so rows whose text normalizes to the key of another "
+        "row (e.g. only a glottal stop or a macron tells them apart) are left "
+        "without it and listed for review. They are still found by their text."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the rows that would be updated and left without a key",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        dry_run = options["dry_run"]
+
+        # keys already taken; pending rows go newest first, so they take them first
+        taken = set(
+            CacheTTS.objects.exclude(normalized_hash=None).values_list(
+                "language_id", "gender", "normalized_hash"
+            )
+        )
+        pending = (
+            CacheTTS.objects.filter(normalized_hash=None)
+            .only("id", "text", "language_id", "gender")
+            .order_by("-id")
+        )
+
+        updated, collisions = 0, 0
+        batch = []
+        for row in pending.iterator(chunk_size=batch_size):
+            row.normalized_text = normalize_text_for_cache(row.text)
+            row.normalized_hash = normalized_hash(row.normalized_text)
+            if row.normalized_hash is None:
+                continue
+            key = (row.language_id, row.gender, row.normalized_hash)
+            if key in taken:
+                self.stdout.write(
+                    f"CacheTTS id={row.id} text={row.text!r} has the normalized "
+                    f"text of another row, left without a key"
+                )
+                collisions += 1
+                continue
+            taken.add(key)
+            batch.append(row)
+            if len(batch) == batch_size:
+                self._save(batch, dry_run)
+                updated += len(batch)
+                batch = []
+        self._save(batch, dry_run)
+        updated += len(batch)
+
+        if dry_run:
+            message = (
+                f"Would update {updated} rows, {collisions} would be left without "
+                f"a key"
+            )
+        else:
+            message = f"Updated {updated} rows, {collisions} left without a key"
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def _save(self, batch, dry_run):
+        if dry_run:
+            return
+        CacheTTS.objects.bulk_update(batch, ["normalized_text", "normalized_hash"])
@@ -0,0 +1,133 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import logging
+import resource
+import subprocess
+import time
+
+import numpy as np
+import soundfile as sf
+from django.core.management.base import BaseCommand
+from main import audio
+
+
+def _cpu_seconds():
+    # this process and its finished ffmpeg subprocesses
+    usage = [
+        resource.getrusage(who)
+        for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
+    ]
+    return sum(u.ru_utime + u.ru_stime for u in usage)
+
+
+def _decode_subprocess(audio_bytes):
+    """Previous path: every upload decoded by an ffmpeg subprocess writing WAV."""
+    container = audio.sniff_container(audio_bytes)
+    command = [
+        "ffmpeg",
+        *(["-f", container] if container in ("webm", "ogg", "mp4") else []),
+        "-i",
+        "pipe:0",
+        "-af",
+        "apad=pad_dur=0.1",
+        "-analyzeduration",
+        "10M",
+        "-ac",
+        "1",
+        "-acodec",
+        "pcm_s16le",
+        "-ar",
+        "16000",
+        "-f",
+        "wav",
+        "-probesize",
+        "10M",
+        "pipe:1",
+    ]
+    result = subprocess.run(command, input=audio_bytes, capture_output=True)
+    samples, _ = sf.read(io.BytesIO(result.stdout), dtype="float32")
+    return samples
+
+
+def _encode_ffmpeg(wav_bytes, container, codec):
+    result = subprocess.run(
+        ["ffmpeg", "-i", "pipe:0", "-c:a", codec, "-f", container]
+        + (["-movflags", "frag_keyframe+empty_moov"] if container == "mp4" else [])
+        + ["pipe:1"],
+        input=wav_bytes,
+        capture_output=True,
+        check=True,
+    )
+    return result.stdout
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares CPU time and latency per request of decoding uploaded audio with "
+        "an ffmpeg subprocess per request and with main.audio.decode_audio"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=5)
+        parser.add_argument("--requests", type=int, default=50)
+
+    def _clips(self, seconds):
+        rng = np.random.default_rng(0)
+        stereo = rng.uniform(-0.3, 0.3, size=(int(seconds * 48000), 2))
+
+        def encode(format, subtype, sampling_rate=48000, data=stereo):
+            buffer = io.BytesIO()
+            sf.write(buffer, data, sampling_rate, format=format, subtype=subtype)
+            return buffer.getvalue()
+
+        wav = encode("WAV", "PCM_16")
+        return {
+            "wav 48k stereo": wav,
+            "wav 16k mono": encode("WAV", "PCM_16", 16000, stereo[::3, 0]),
+            "flac 48k stereo": encode("FLAC", "PCM_16"),
+            "ogg/vorbis 48k stereo": encode("OGG", "VORBIS"),
+            "ogg/opus 48k stereo": encode("OGG", "OPUS"),
+            "webm/opus 48k stereo": _encode_ffmpeg(wav, "webm", "libopus"),
+            "mp4/aac 48k stereo": _encode_ffmpeg(wav, "mp4", "aac"),
+        }
+
+    def _measure(self, decode, audio_bytes, requests):
+        decode(audio_bytes)  # warm up
+        latencies = []
+        cpu = _cpu_seconds()
+        for _ in range(requests):
+            start = time.perf_counter()
+            decode(audio_bytes)
+            latencies.append((time.perf_counter() - start) * 1000)
+        cpu = (_cpu_seconds() - cpu) / requests * 1000
+        return cpu, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+    def handle(self, *args, **options):
+        # per request debug logs would be timed too
+        logging.getLogger("main").setLevel(logging.INFO)
+        for name, audio_bytes in self._clips(options["seconds"]).items():
+            for path, decode in [
+                ("subprocess", _decode_subprocess),
+                ("decode_audio", audio.decode_audio),
+            ]:
+                cpu_ms, p50_ms, p99_ms = self._measure(
+                    decode, audio_bytes, options["requests"]
+                )
+                self.stdout.write(
+                    f"{name:22} {path:12} cpu={cpu_ms:6.1f}ms/request "
+                    f"p50={p50_ms:6.1f}ms p99={p99_ms:6.1f}ms"
+                )
@@ -0,0 +1,106 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from main import kserve
+
+
+def _timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares payload size and encode/decode time of audio sent as a JSON list "
+        "of floats and as a KServe v2 binary tensor"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=60)
+        parser.add_argument("--sampling-rate", type=int, default=16000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        samples = int(options["seconds"] * options["sampling_rate"])
+        audio = rng.uniform(-1, 1, size=(1, samples)).astype(np.float32)
+        repeat = options["repeat"]
+
+        # JSON, as sent before: a nested list of python floats
+        def encode_json():
+            return json.dumps(
+                {
+                    "id": "0",
+                    "inputs": [
+                        {
+                            "name": "audio",
+                            "shape": list(audio.shape),
+                            "datatype": "FP32",
+                            "data": audio.tolist(),
+                        }
+                    ],
+                }
+            ).encode("utf-8")
+
+        def decode_json():
+            data = json.loads(json_body)["inputs"][0]["data"]
+            return np.array(data, dtype=np.float32)
+
+        def encode_binary():
+            return kserve.encode_request([], binary_inputs={"audio": ("FP32", audio)})
+
+        # the same audio as a binary output, as the TTS waveform comes back
+        header = json.dumps(
+            {
+                "outputs": [
+                    {
+                        "name": "audio",
+                        "shape": list(audio.shape),
+                        "datatype": "FP32",
+                        "parameters": {"binary_data_size": audio.nbytes},
+                    }
+                ]
+            }
+        ).encode("utf-8")
+        response = SimpleNamespace(
+            headers={kserve.HEADER_LENGTH: str(len(header))},
+            content=header + audio.tobytes(),
+        )
+
+        json_encode_ms, json_body = _timed(encode_json, repeat)
+        json_decode_ms, _ = _timed(decode_json, repeat)
+        binary_encode_ms, (binary_body, _) = _timed(encode_binary, repeat)
+        binary_decode_ms, decoded = _timed(
+            lambda: kserve.decode_response(response), repeat
+        )
+        assert np.array_equal(decoded["outputs"][0]["data"], audio)
+
+        for name, size, encode_ms, decode_ms in [
+            ("json", len(json_body), json_encode_ms, json_decode_ms),
+            ("binary", len(binary_body), binary_encode_ms, binary_decode_ms),
+        ]:
+            self.stdout.write(
+                f"{name}: {options['seconds']:g}s of audio, "
+                f"payload={size / 1024 / 1024:.2f}MB "
+                f"encode={encode_ms:.1f}ms decode={decode_ms:.1f}ms"
+            )
@@ -0,0 +1,96 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.core.management.base import BaseCommand
+from main import inference_client
+from main.utils import generate_payload
+
+
+class StubTritonHandler(BaseHTTPRequestHandler):
+    """Answers every request like a Triton translation model would."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps(
+            {
+                "model_name": "stub",
+                "model_version": "1",
+                "outputs": [
+                    {
+                        "name": "translation",
+                        "datatype": "BYTES",
+                        "shape": [1, 1],
+                        "data": ["Iorana"],
+                    }
+                ],
+            }
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the per-call overhead of inference requests against a local stub "
+        "Triton server, with bare requests.post and with the pooled client"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=500)
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubTritonHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/v2/models/stub/infer"
+        data = json.dumps(generate_payload("Hola", "spa_Latn", "rap_Latn"))
+
+        inference_client.reset()
+        try:
+            for name, post in [
+                ("requests.post", requests.post),
+                ("inference_client.post", inference_client.post),
+            ]:
+                # warmup, opens the pooled connection
+                post(url=url, data=data).json()
+                latencies = []
+                for _ in range(options["calls"]):
+                    start = time.perf_counter()
+                    post(url=url, data=data).json()
+                    latencies.append((time.perf_counter() - start) * 1000)
+                latencies.sort()
+                self.stdout.write(
+                    f"{name}: mean={statistics.mean(latencies):.3f}ms "
+                    f"p50={latencies[len(latencies) // 2]:.3f}ms "
+                    f"p99={latencies[int(len(latencies) * 0.99)]:.3f}ms"
+                )
+        finally:
+            inference_client.reset()
+            server.shutdown()
@@ -0,0 +1,138 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import base64
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from main.models import CacheTTS, Lang
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares stored bytes per second of audio and cache hit latency of "
+        "CacheTTS audio stored as base64 float32 text and as PCM16 bytes. Rows are "
+        "written in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=5)
+        parser.add_argument("--rows", type=int, default=20)
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--sampling-rate", type=int, default=16000)
+
+    def _measure(self, fetch, decode, ids, requests):
+        latencies = []
+        for i in range(requests):
+            start = time.perf_counter()
+            decode(fetch(ids[i % len(ids)]))
+            latencies.append((time.perf_counter() - start) * 1000)
+        return np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+    def _stored_size(self, cursor, table, column, ids):
+        # on-disk size of the values, after any TOAST compression
+        cursor.execute(
+            f"SELECT avg(pg_column_size({column})) FROM {table} WHERE id = ANY(%s)",
+            [ids],
+        )
+        return float(cursor.fetchone()[0])
+
+    def handle(self, *args, **options):
+        seconds = options["seconds"]
+        sampling_rate = options["sampling_rate"]
+        rng = np.random.default_rng(0)
+        t = np.arange(int(seconds * sampling_rate)) / sampling_rate
+        waveforms = [
+            (0.3 * np.sin(2 * np.pi * rng.uniform(100, 400) * t)).astype(np.float32)
+            + rng.normal(0, 0.01, len(t)).astype(np.float32)
+            for _ in range(options["rows"])
+        ]
+
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                self._run(cursor, waveforms, seconds, sampling_rate, options)
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def _run(self, cursor, waveforms, seconds, sampling_rate, options):
+        lang, _ = Lang.objects.get_or_create(
+            code="bench_Latn", defaults={"name": "benchmark"}
+        )
+        cursor.execute(
+            "CREATE TEMPORARY TABLE bench_base64_tts "
+            "(id serial PRIMARY KEY, audio_data text NOT NULL)"
+        )
+        base64_ids, pcm16_ids = [], []
+        for i, waveform in enumerate(waveforms):
+            cursor.execute(
+                "INSERT INTO bench_base64_tts (audio_data) VALUES (%s) RETURNING id",
+                [base64.b64encode(waveform.tobytes()).decode("utf-8")],
+            )
+            base64_ids.append(cursor.fetchone()[0])
+            cached = CacheTTS(text=f"benchmark {i}", language=lang, gender="female")
+            cached.set_waveform(waveform, sampling_rate)
+            cached.save()
+            pcm16_ids.append(cached.id)
+
+        def fetch_base64(id):
+            cursor.execute(
+                "SELECT audio_data FROM bench_base64_tts WHERE id = %s", [id]
+            )
+            return cursor.fetchone()[0]
+
+        def fetch_pcm16(id):
+            return CacheTTS.objects.get(id=id)
+
+        paths = [
+            (
+                "base64 float32 -> JSON list",
+                fetch_base64,
+                lambda data: np.frombuffer(
+                    base64.b64decode(data), dtype=np.float32
+                ).tolist(),
+            ),
+            (
+                "pcm16 -> JSON list",
+                fetch_pcm16,
+                lambda cached: cached.get_waveform().tolist(),
+            ),
+            (
+                "pcm16 -> stream",
+                fetch_pcm16,
+                lambda cached: cached.get_audio_bytes(),
+            ),
+        ]
+
+        base64_size = self._stored_size(
+            cursor, "bench_base64_tts", "audio_data", base64_ids
+        )
+        pcm16_size = self._stored_size(cursor, "main_cachetts", "audio", pcm16_ids)
+        self.stdout.write(
+            f"{'base64 float32':14} {base64_size / seconds:9.0f} bytes/s of audio"
+        )
+        self.stdout.write(f"{'pcm16':14} {pcm16_size / seconds:9.0f} bytes/s of audio")
+
+        for name, fetch, decode in paths:
+            ids = base64_ids if fetch is fetch_base64 else pcm16_ids
+            decode(fetch(ids[0]))  # warm up
+            p50_ms, p99_ms = self._measure(fetch, decode, ids, options["requests"])
+            self.stdout.write(f"{name:28} hit p50={p50_ms:6.2f}ms p99={p99_ms:6.2f}ms")
@@ -0,0 +1,139 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from main.models import Lang, TranslationMemory, TranslationPair
+from main.views import TranslateViewSet
+
+
+class Rollback(Exception):
+    pass
+
+
+def _previous_lookup(src_lang, dst_lang, src_text):
+    """Former TranslateViewSet.get_queryset and utils.filter_cache."""
+    results = (
+        TranslationPair.objects.filter(
+            correct=True,
+            validated=True,
+            src_lang__code__in=[src_lang.code, dst_lang.code],
+        )
+        .filter(Q(src_text__iexact=src_text) | Q(dst_text__iexact=src_text))
+        .order_by("-created_at")
+    )
+    for result in results:
+        if src_lang.code in (result.src_lang.code, result.dst_lang.code):
+            if dst_lang.code == result.dst_lang.code:
+                return result.dst_text
+            return result.src_text
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares translation cache lookup latency of the former case-insensitive "
+        "OR query over TranslationPair and of the TranslationMemory hash index, on "
+        "synthetic validated pairs written in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pairs", type=int, default=1_000_000)
+        parser.add_argument("--lookups", type=int, default=200)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+
+    def _texts(self, rng, count, vocabulary):
+        lengths = rng.integers(3, 13, size=count)
+        words = rng.integers(0, len(vocabulary), size=lengths.sum())
+        texts, start = [], 0
+        for length in lengths:
+            texts.append(" ".join(vocabulary[w] for w in words[start : start + length]))
+            start += length
+        return texts
+
+    def _insert(self, src_lang, dst_lang, count, batch_size):
+        rng = np.random.default_rng(0)
+        vocabulary = [f"w{i:05d}" for i in range(20_000)]
+        sample = []
+        for start in range(0, count, batch_size):
+            size = min(batch_size, count - start)
+            src_texts = self._texts(rng, size, vocabulary)
+            dst_texts = self._texts(rng, size, vocabulary)
+            # bulk_create does not call save, the memory is filled below
+            pairs = TranslationPair.objects.bulk_create(
+                TranslationPair(
+                    src_text=src_text,
+                    dst_text=dst_text,
+                    src_lang=src_lang,
+                    dst_lang=dst_lang,
+                    correct=True,
+                    validated=True,
+                )
+                for src_text, dst_text in zip(src_texts, dst_texts)
+            )
+            TranslationMemory.objects.bulk_create(
+                row for pair in pairs for row in pair.memory_rows()
+            )
+            sample.extend(src_texts[:5])
+            self.stdout.write(f"Inserted {start + size}/{count} pairs", ending="\r")
+        self.stdout.write("")
+        return sample
+
+    def _measure(self, lookup, texts):
+        latencies = []
+        for text in texts:
+            start = time.perf_counter()
+            lookup(text)
+            latencies.append((time.perf_counter() - start) * 1000)
+        return np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def _run(self, options):
+        src_lang, _ = Lang.objects.get_or_create(code="bench_src")
+        dst_lang, _ = Lang.objects.get_or_create(code="bench_dst")
+        sample = self._insert(
+            src_lang, dst_lang, options["pairs"], options["batch_size"]
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE main_translationpair")
+            cursor.execute("ANALYZE main_translationmemory")
+
+        rng = np.random.default_rng(1)
+        hits = [text.upper() for text in rng.choice(sample, size=options["lookups"])]
+        misses = [f"{text} w99999" for text in hits]
+        view = TranslateViewSet()
+        paths = [
+            ("iexact OR", lambda t: _previous_lookup(src_lang, dst_lang, t)),
+            ("hash index", lambda t: view.lookup_cache(src_lang, dst_lang, t)[0]),
+        ]
+        for name, lookup in paths:
+            assert lookup(hits[0]) is not None and lookup(misses[0]) is None
+            for kind, texts in [("hit", hits), ("miss", misses)]:
+                p50_ms, p99_ms = self._measure(lookup, texts)
+                self.stdout.write(
+                    f"{options['pairs']} pairs {name:10} {kind:4} "
+                    f"p50={p50_ms:8.2f}ms p99={p99_ms:8.2f}ms"
+                )
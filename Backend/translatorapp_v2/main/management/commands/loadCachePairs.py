@@ -12,36 +12,145 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import csv
+import hashlib
 import json
 import os
+import time
 
-from django.core.management.base import BaseCommand
-from main.models import Lang, TranslationPair
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from main.models import Lang, TranslationMemory, TranslationPair
+
+TRUE_VALUES = ("1", "true", "t", "yes", "y")
+
+
+def _read_jsonl(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _read_csv(file):
+    yield from csv.DictReader(file)
+
+
+def _read_json(file):
+    # a JSON array can only be parsed whole, prefer JSON Lines for large corpora
+    yield from json.load(file)
+
+
+READERS = {
+    ".jsonl": _read_jsonl,
+    ".ndjson": _read_jsonl,
+    ".csv": _read_csv,
+    ".json": _read_json,
+}
+
+
+def _as_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def _key(src_lang_id, dst_lang_id, src_text, dst_text):
+    # digest instead of the texts, to keep memory flat on large corpora
+    return hashlib.blake2b(
+        json.dumps([src_lang_id, dst_lang_id, src_text, dst_text]).encode("utf-8"),
+        digest_size=16,
+    ).digest()
 
 
 class Command(BaseCommand):
-    help = "Loads data of verified matches from json "
+    help = (
+        "Loads verified translation pairs from a JSON Lines, CSV or JSON file with "
+        "src_lang, dst_lang, src_text, dst_text and correct fields. Rows are "
+        "streamed and inserted in chunks, skipping pairs already verified."
+    )
 
     def add_arguments(self, parser):
         parser.add_argument("file", type=str)
+        parser.add_argument("--data-dir", type=str, default="data")
+        parser.add_argument("--chunk-size", type=int, default=5000)
 
     def handle(self, *args, **options):
+        path = os.path.join(options["data_dir"], options["file"])
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in READERS:
+            raise CommandError(
+                f"Unsupported file type {extension}, use one of {', '.join(READERS)}"
+            )
+        chunk_size = options["chunk_size"]
+
+        self.langs = dict(Lang.objects.values_list("code", "id"))
+        # pairs already verified, read once instead of queried per chunk
+        self.seen = {
+            _key(*fields)
+            for fields in TranslationPair.objects.filter(validated=True)
+            .values_list("src_lang_id", "dst_lang_id", "src_text", "dst_text")
+            .iterator(chunk_size=chunk_size)
+        }
+        self.inserted = self.duplicates = self.skipped = 0
+        start = time.perf_counter()
+
+        with open(path, mode="r", encoding="utf-8", newline="") as file:
+            chunk = []
+            for line, item in enumerate(READERS[extension](file), start=1):
+                pair = self._pair(line, item)
+                if pair is None:
+                    continue
+                chunk.append(pair)
+                if len(chunk) == chunk_size:
+                    self._insert(chunk)
+                    chunk = []
+                    elapsed = time.perf_counter() - start
+                    self.stdout.write(
+                        f"{line} rows read, {self.inserted} inserted "
+                        f"({self.inserted / elapsed:.0f} rows/s)"
+                    )
+            self._insert(chunk)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Inserted {self.inserted} pairs in {elapsed:.1f}s "
+                f"({self.inserted / elapsed:.0f} rows/s), skipped "
+                f"{self.duplicates} duplicates and {self.skipped} invalid rows"
+            )
+        )
+
+    def _pair(self, line, item):
+        try:
+            src_lang_id = self.langs[item["src_lang"]]
+            dst_lang_id = self.langs[item["dst_lang"]]
+            src_text, dst_text = item["src_text"], item["dst_text"]
+        except KeyError as e:
+            self.stderr.write(f"Row {line}: unknown language or missing field {e}")
+            self.skipped += 1
+            return None
+
+        key = _key(src_lang_id, dst_lang_id, src_text, dst_text)
+        if key in self.seen:
+            self.duplicates += 1
+            return None
+        self.seen.add(key)
+        return TranslationPair(
+            src_lang_id=src_lang_id,
+            dst_lang_id=dst_lang_id,
+            src_text=src_text,
+            dst_text=dst_text,
+            correct=_as_bool(item.get("correct", True)),
+            validated=True,
+        )
 
-        file = options["file"]
-
-        data = []
-        with open(os.path.join("data", file), mode="r", encoding="utf-8") as file:
-            data = json.load(file)
-
-        for item in data:
-            src_lang = Lang.objects.get(code=item["src_lang"])
-            dst_lang = Lang.objects.get(code=item["dst_lang"])
-            pair = TranslationPair(
-                src_lang=src_lang,
-                dst_lang=dst_lang,
-                src_text=item["src_text"],
-                dst_text=item["dst_text"],
-                correct=item["correct"],
-                validated=True,
+    def _insert(self, chunk):
+        if not chunk:
+            return
+        # bulk_create does not call save(), so the memory rows are added here
+        with transaction.atomic():
+            pairs = TranslationPair.objects.bulk_create(chunk)
+            TranslationMemory.objects.bulk_create(
+                row for pair in pairs for row in pair.memory_rows()
             )
-            pair.save()
+        self.inserted += len(pairs)
@@ -0,0 +1,92 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from main import partitions
+
+
+def _overlaps(ranges, start, end):
+    return any(
+        (lower is None or lower < end) and upper > start for _, lower, upper in ranges
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates the monthly partitions of TranslationRequest, TextToSpeechAudio "
+        "and SpeechToTextAudio for the current and the next --months-ahead months, "
+        "and for months with rows in the default partition. With --retention-months, "
+        "partitions older than that many months before the current one are "
+        "detached, and with --archive-dir also archived to gzipped CSV files and "
+        "dropped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead", type=int, default=settings.LOG_PARTITION_MONTHS_AHEAD
+        )
+        parser.add_argument(
+            "--retention-months", type=int, default=settings.LOG_RETENTION_MONTHS
+        )
+        parser.add_argument("--archive-dir", default=settings.LOG_ARCHIVE_DIR)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the partitions that would be created and detached",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Log tables are only partitioned in PostgreSQL")
+
+        current = partitions.month_start(timezone.now())
+        for model in partitions.LOG_MODELS:
+            table = model._meta.db_table
+            months = {
+                partitions.add_months(current, i)
+                for i in range(options["months_ahead"] + 1)
+            }
+            months.update(partitions.default_months(table))
+            ranges = partitions.partitions(table)
+            for month in sorted(months):
+                if _overlaps(ranges, month, partitions.add_months(month, 1)):
+                    continue
+                name = partitions.partition_name(table, month)
+                if options["dry_run"]:
+                    self.stdout.write(f"Would create {name}")
+                    continue
+                partitions.create_partition(table, month)
+                self.stdout.write(f"Created {name}")
+
+            if options["retention_months"]:
+                self._retain(table, current, options)
+
+        self.stdout.write(self.style.SUCCESS("Log table partitions are up to date"))
+
+    def _retain(self, table, current, options):
+        cutoff = partitions.add_months(current, -options["retention_months"])
+        for name, _, end in partitions.partitions(table):
+            if end > cutoff:
+                break
+            if options["dry_run"]:
+                self.stdout.write(f"Would detach {name}")
+                continue
+            partitions.detach_partition(table, name)
+            self.stdout.write(f"Detached {name}")
+            if options["archive_dir"]:
+                path = partitions.archive_table(name, options["archive_dir"])
+                self.stdout.write(f"Archived {name} to {path}")
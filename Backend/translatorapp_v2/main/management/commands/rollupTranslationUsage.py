@@ -0,0 +1,116 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from datetime import date, datetime, time
+from datetime import timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import BooleanField, Count, ExpressionWrapper, F, Q, Value
+from django.db.models.functions import Coalesce, TruncDay, TruncHour
+from django.utils import timezone
+from main.models import TranslationRequest, TranslationUsage
+
+TRUNCATE = {TranslationUsage.HOUR: TruncHour, TranslationUsage.DAY: TruncDay}
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the hourly and daily TranslationUsage rollups from "
+        "TranslationRequest, for whole UTC days from --since (the day of the first "
+        "request by default) until --until (today by default, not included). "
+        "Requests logged on those days while it runs may be missed, so it is meant "
+        "for past days."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=date.fromisoformat)
+        parser.add_argument("--until", type=date.fromisoformat)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        since = options["since"]
+        if since is None:
+            first = (
+                TranslationRequest.objects.order_by("created_at")
+                .values_list("created_at", flat=True)
+                .first()
+            )
+            if first is None:
+                self.stdout.write("No translation requests to roll up")
+                return
+            since = first.astimezone(dt_timezone.utc).date()
+        until = options["until"] or timezone.now().astimezone(dt_timezone.utc).date()
+
+        start = datetime.combine(since, time.min, tzinfo=dt_timezone.utc)
+        end = datetime.combine(until, time.min, tzinfo=dt_timezone.utc)
+        requests = TranslationRequest.objects.filter(
+            created_at__gte=start, created_at__lt=end
+        )
+        for period, truncate in TRUNCATE.items():
+            with transaction.atomic():
+                TranslationUsage.objects.filter(
+                    period=period, period_start__gte=start, period_start__lt=end
+                ).delete()
+                rows = self._rollup(requests, period, truncate, options["batch_size"])
+            self.stdout.write(
+                f"Rolled up {rows} {period} rows from {since} until {until}"
+            )
+        self.stdout.write(self.style.SUCCESS("Usage rollups recomputed"))
+
+    def _rollup(self, requests, period, truncate, batch_size):
+        counts = (
+            requests.annotate(
+                usage_start=truncate("created_at", tzinfo=dt_timezone.utc),
+                usage_src_lang=Coalesce(F("src_lang__code"), Value("")),
+                usage_dst_lang=Coalesce(F("dst_lang__code"), Value("")),
+                usage_model_name=Coalesce(F("model_name"), Value("")),
+                usage_model_version=Coalesce(F("model_version"), Value("")),
+                usage_authenticated=ExpressionWrapper(
+                    Q(user__isnull=False), output_field=BooleanField()
+                ),
+            )
+            .values(
+                "usage_start",
+                "usage_src_lang",
+                "usage_dst_lang",
+                "usage_model_name",
+                "usage_model_version",
+                "from_cache",
+                "usage_authenticated",
+            )
+            .annotate(usage_count=Count("id"))
+            .order_by()
+        )
+
+        batch, rows = [], 0
+        for row in counts.iterator(chunk_size=batch_size):
+            batch.append(
+                TranslationUsage(
+                    period=period,
+                    period_start=row["usage_start"],
+                    src_lang=row["usage_src_lang"],
+                    dst_lang=row["usage_dst_lang"],
+                    model_name=row["usage_model_name"],
+                    model_version=row["usage_model_version"],
+                    from_cache=row["from_cache"],
+                    authenticated=row["usage_authenticated"],
+                    count=row["usage_count"],
+                )
+            )
+            if len(batch) == batch_size:
+                TranslationUsage.objects.bulk_create(batch)
+                rows, batch = rows + len(batch), []
+        TranslationUsage.objects.bulk_create(batch)
+        return rows + len(batch)
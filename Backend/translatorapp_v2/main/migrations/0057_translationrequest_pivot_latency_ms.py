@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-17 00:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0056_merge_20260421_0001"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="translationrequest",
+            name="pivot_latency_ms",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.1 on 2026-10-17 01:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0057_translationrequest_pivot_latency_ms"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="speechtotextaudio",
+            name="audio_hash",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name="speechtotextaudio",
+            name="from_cache",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name="speechtotextaudio",
+            index=models.Index(
+                fields=["audio_hash", "language"], name="main_speech_audio_h_658875_idx"
+            ),
+        ),
+    ]
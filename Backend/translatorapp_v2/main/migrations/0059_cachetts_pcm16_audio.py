@@ -0,0 +1,88 @@
+# Generated by Django 5.1.1 on 2026-10-17 02:10
+
+import base64
+
+import numpy as np
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def base64_float32_to_pcm16(apps, schema_editor):
+    CacheTTS = apps.get_model("main", "CacheTTS")
+
+    batch = []
+    for row in CacheTTS.objects.only("id", "audio_data").iterator(
+        chunk_size=BATCH_SIZE
+    ):
+        waveform = np.frombuffer(base64.b64decode(row.audio_data), dtype=np.float32)
+        row.audio = (np.clip(waveform, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+        row.audio_format = "pcm16"
+        row.sampling_rate = 16000
+        row.num_samples = len(waveform)
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            CacheTTS.objects.bulk_update(
+                batch, ["audio", "audio_format", "sampling_rate", "num_samples"]
+            )
+            batch = []
+    CacheTTS.objects.bulk_update(
+        batch, ["audio", "audio_format", "sampling_rate", "num_samples"]
+    )
+
+
+def pcm16_to_base64_float32(apps, schema_editor):
+    CacheTTS = apps.get_model("main", "CacheTTS")
+
+    batch = []
+    for row in CacheTTS.objects.only("id", "audio").iterator(chunk_size=BATCH_SIZE):
+        waveform = np.frombuffer(row.audio, dtype="<i2").astype(np.float32) / 32767
+        row.audio_data = base64.b64encode(waveform.tobytes()).decode("utf-8")
+        row.audio_format = "wav"
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            CacheTTS.objects.bulk_update(batch, ["audio_data", "audio_format"])
+            batch = []
+    CacheTTS.objects.bulk_update(batch, ["audio_data", "audio_format"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0058_speechtotextaudio_audio_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cachetts",
+            name="audio",
+            field=models.BinaryField(default=b""),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="cachetts",
+            name="num_samples",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="cachetts",
+            name="sampling_rate",
+            field=models.PositiveIntegerField(default=16000),
+        ),
+        migrations.AlterField(
+            model_name="cachetts",
+            name="audio_format",
+            field=models.CharField(default="pcm16", max_length=10),
+        ),
+        migrations.RunPython(base64_float32_to_pcm16, pcm16_to_base64_float32),
+        # so the column can be added back to existing rows when unapplied
+        migrations.AlterField(
+            model_name="cachetts",
+            name="audio_data",
+            field=models.TextField(default=""),
+        ),
+        migrations.RemoveField(
+            model_name="cachetts",
+            name="audio_data",
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.1 on 2026-10-17 02:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0059_cachetts_pcm16_audio"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cachetts",
+            name="normalized_hash",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name="cachetts",
+            name="normalized_text",
+            field=models.TextField(blank=True, default=""),
+        ),
+        migrations.AddConstraint(
+            model_name="cachetts",
+            constraint=models.UniqueConstraint(
+                fields=("language", "gender", "normalized_hash"),
+                name="unique_cachetts_normalized_hash",
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.1 on 2026-10-17 02:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0060_cachetts_normalized_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cachetts",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="cachetts",
+            name="last_hit_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="cachetts",
+            name="source",
+            field=models.CharField(
+                choices=[("curated", "Curated"), ("auto", "Auto")],
+                default="curated",
+                max_length=10,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cachetts",
+            index=models.Index(
+                fields=["source", "last_hit_at"], name="main_cachet_source_cff03d_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.1.1 on 2026-10-17 03:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from main.normalization import normalize_text_for_cache, normalized_hash
+
+BATCH_SIZE = 5000
+
+
+def fill_translation_memory(apps, schema_editor):
+    TranslationPair = apps.get_model("main", "TranslationPair")
+    TranslationMemory = apps.get_model("main", "TranslationMemory")
+
+    pairs = TranslationPair.objects.filter(
+        correct=True,
+        validated=True,
+        src_lang__isnull=False,
+        dst_lang__isnull=False,
+    ).only("id", "src_lang", "dst_lang", "src_text", "dst_text", "created_at")
+
+    batch = []
+    for pair in pairs.iterator(chunk_size=BATCH_SIZE):
+        for src_lang_id, src_text, dst_lang_id, dst_text in [
+            (pair.src_lang_id, pair.src_text, pair.dst_lang_id, pair.dst_text),
+            (pair.dst_lang_id, pair.dst_text, pair.src_lang_id, pair.src_text),
+        ]:
+            normalized = normalize_text_for_cache(src_text)
+            if not normalized:
+                continue
+            batch.append(
+                TranslationMemory(
+                    pair_id=pair.id,
+                    src_lang_id=src_lang_id,
+                    dst_lang_id=dst_lang_id,
+                    src_hash=normalized_hash(normalized),
+                    dst_text=dst_text,
+                    created_at=pair.created_at,
+                )
+            )
+        if len(batch) >= BATCH_SIZE:
+            TranslationMemory.objects.bulk_create(batch)
+            batch = []
+    TranslationMemory.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0061_cachetts_source"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TranslationMemory",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("src_hash", models.CharField(max_length=64)),
+                ("dst_text", models.CharField(max_length=10000)),
+                ("created_at", models.DateTimeField()),
+                (
+                    "dst_lang",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="main.lang",
+                    ),
+                ),
+                (
+                    "pair",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="memory",
+                        to="main.translationpair",
+                    ),
+                ),
+                (
+                    "src_lang",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="main.lang",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["src_hash", "src_lang", "dst_lang", "-created_at"],
+                        name="translation_memory_index",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_translation_memory, migrations.RunPython.noop),
+    ]
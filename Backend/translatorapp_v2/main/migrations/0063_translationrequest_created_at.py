@@ -0,0 +1,21 @@
+# Generated by Django 5.1.1 on 2026-10-17 03:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0062_translationmemory"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="translationrequest",
+            name="created_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False
+            ),
+        ),
+    ]
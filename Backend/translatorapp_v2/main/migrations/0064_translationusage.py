@@ -0,0 +1,59 @@
+# Generated by Django 5.1.1 on 2026-10-17 03:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0063_translationrequest_created_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TranslationUsage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[("hour", "Hour"), ("day", "Day")], max_length=4
+                    ),
+                ),
+                ("period_start", models.DateTimeField()),
+                ("src_lang", models.CharField(default="", max_length=50)),
+                ("dst_lang", models.CharField(default="", max_length=50)),
+                ("model_name", models.CharField(default="", max_length=100)),
+                ("model_version", models.CharField(default="", max_length=100)),
+                ("from_cache", models.BooleanField()),
+                ("authenticated", models.BooleanField()),
+                ("count", models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                "ordering": ["period_start"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=(
+                            "period",
+                            "period_start",
+                            "src_lang",
+                            "dst_lang",
+                            "model_name",
+                            "model_version",
+                            "from_cache",
+                            "authenticated",
+                        ),
+                        name="unique_translation_usage",
+                    )
+                ],
+            },
+        ),
+    ]
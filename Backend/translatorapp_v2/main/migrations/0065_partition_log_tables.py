@@ -0,0 +1,149 @@
+# Generated by Django 5.1.1 on 2026-10-17 04:10
+
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+
+TABLES = [
+    "main_translationrequest",
+    "main_texttospeechaudio",
+    "main_speechtotextaudio",
+]
+
+
+def _next_month(moment):
+    moment = moment.astimezone(timezone.utc)
+    if moment.month == 12:
+        return datetime(moment.year + 1, 1, 1, tzinfo=timezone.utc)
+    return datetime(moment.year, moment.month + 1, 1, tzinfo=timezone.utc)
+
+
+def _indexes(cursor, table):
+    cursor.execute(
+        """
+        SELECT indexname, indexdef FROM pg_indexes
+        WHERE schemaname = current_schema() AND tablename = %s AND indexname <> %s
+        """,
+        [table, f"{table}_pkey"],
+    )
+    return cursor.fetchall()
+
+
+def _foreign_keys(cursor, table):
+    cursor.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype = 'f'
+        """,
+        [table],
+    )
+    return cursor.fetchall()
+
+
+def _add_keys(cursor, table, primary_key, indexes, foreign_keys, max_id):
+    cursor.execute(
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY ({primary_key})"
+    )
+    cursor.execute(
+        f"ALTER TABLE {table} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY "
+        f"(START WITH {(max_id or 0) + 1})"
+    )
+    for _, definition in indexes:
+        cursor.execute(definition)
+    for name, definition in foreign_keys:
+        cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+
+
+def partition_table(cursor, table):
+    """
+    Turns `table` into a table partitioned by created_at. Its rows until the end of
+    the current month are kept in the `<table>_legacy` partition, later ones go to
+    the default partition.
+    """
+    legacy = f"{table}_legacy"
+    indexes = _indexes(cursor, table)
+    foreign_keys = _foreign_keys(cursor, table)
+    cursor.execute(f"SELECT max(id) FROM {table}")
+    (max_id,) = cursor.fetchone()
+    bound = _next_month(datetime.now(timezone.utc))
+
+    cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    # replaced by the primary key of the partitioned table when attached
+    cursor.execute(f"ALTER TABLE {legacy} DROP CONSTRAINT {table}_pkey")
+    # index names are unique per schema, and the partitioned table takes these
+    for name, _ in indexes:
+        cursor.execute(f"ALTER INDEX {name} RENAME TO {name[:56]}_legacy")
+    cursor.execute(f"ALTER TABLE {legacy} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+
+    cursor.execute(
+        f"CREATE TABLE {table} "
+        f"(LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        f"PARTITION BY RANGE (created_at)"
+    )
+    # the partition key has to be part of the primary key
+    _add_keys(cursor, table, "id, created_at", indexes, foreign_keys, max_id)
+    cursor.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {legacy} WHERE created_at >= %s RETURNING *) "
+        f"INSERT INTO {table} SELECT * FROM moved",
+        [bound],
+    )
+    # the renamed indexes of the legacy table are attached to the new ones
+    cursor.execute(
+        f"ALTER TABLE {table} ATTACH PARTITION {legacy} "
+        f"FOR VALUES FROM (MINVALUE) TO (%s)",
+        [bound],
+    )
+
+
+def unpartition_table(cursor, table):
+    """Copies the rows of the attached partitions of `table` into a plain table."""
+    plain = f"{table}_plain"
+    indexes = [
+        (name, definition.replace(" ON ONLY ", " ON "))
+        for name, definition in _indexes(cursor, table)
+    ]
+    foreign_keys = _foreign_keys(cursor, table)
+    cursor.execute(f"SELECT max(id) FROM {table}")
+    (max_id,) = cursor.fetchone()
+
+    cursor.execute(
+        f"CREATE TABLE {plain} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    )
+    cursor.execute(f"INSERT INTO {plain} SELECT * FROM {table}")
+    cursor.execute(f"DROP TABLE {table} CASCADE")
+    cursor.execute(f"ALTER TABLE {plain} RENAME TO {table}")
+    _add_keys(cursor, table, "id", indexes, foreign_keys, max_id)
+
+
+def partition_log_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in TABLES:
+            partition_table(cursor, table)
+
+
+def unpartition_log_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in TABLES:
+            unpartition_table(cursor, table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0064_translationusage"),
+    ]
+
+    operations = [
+        # unique indexes of a partitioned table must include the partition key
+        migrations.AlterField(
+            model_name="translationrequest",
+            name="client_request_id",
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.RunPython(partition_log_tables, unpartition_log_tables),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.1 on 2026-10-17 05:30
+
+from django.db import migrations
+from main.normalization import normalize_text_for_cache, normalized_hash
+
+BATCH_SIZE = 1000
+
+
+def fill_normalized_hash(apps, schema_editor):
+    """
+    Same as the backfillTTSNormalizedText command: rows cached before 0060 get
+    their key, unless another row of the same language and gender has it already.
+    Those are left without a key and no row is deleted, as texts that only differ
+    in a glottal stop or a macron share a key. Run the command with --dry-run to
+    list them.
+    """
+    CacheTTS = apps.get_model("main", "CacheTTS")
+
+    taken = set(
+        CacheTTS.objects.exclude(normalized_hash=None).values_list(
+            "language_id", "gender", "normalized_hash"
+        )
+    )
+    pending = (
+        CacheTTS.objects.filter(normalized_hash=None)
+        .only("id", "text", "language_id", "gender")
+        .order_by("-id")
+    )
+
+    batch = []
+    for row in pending.iterator(chunk_size=BATCH_SIZE):
+        row.normalized_text = normalize_text_for_cache(row.text)
+        row.normalized_hash = normalized_hash(row.normalized_text)
+        if row.normalized_hash is None:
+            continue
+        key = (row.language_id, row.gender, row.normalized_hash)
+        if key in taken:
+            continue
+        taken.add(key)
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            CacheTTS.objects.bulk_update(batch, ["normalized_text", "normalized_hash"])
+            batch = []
+    CacheTTS.objects.bulk_update(batch, ["normalized_text", "normalized_hash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0065_partition_log_tables"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_normalized_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.1 on 2026-10-17 06:10
+
+from django.db import migrations, models
+from django.db.models import Value
+from django.db.models.functions import Concat
+
+
+def fill_cache_model(apps, schema_editor):
+    # rows cached so far were looked up by the reported model name and version
+    SpeechToTextAudio = apps.get_model("main", "SpeechToTextAudio")
+    SpeechToTextAudio.objects.exclude(audio_hash=None).update(
+        cache_model=Concat("model_name", Value(":"), "model_version")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0066_backfill_cachetts_normalized_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="speechtotextaudio",
+            name="cache_model",
+            field=models.CharField(blank=True, max_length=201, null=True),
+        ),
+        migrations.RunPython(fill_cache_model, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-17 03:21
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0067_speechtotextaudio_cache_model"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="cachetts",
+            index=models.Index(
+                django.db.models.functions.text.Upper("text"),
+                models.F("language"),
+                models.F("gender"),
+                name="cachetts_text_upper_idx",
+            ),
+        ),
+    ]
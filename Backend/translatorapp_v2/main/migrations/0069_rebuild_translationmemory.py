@@ -0,0 +1,58 @@
+# Generated by Django 5.1.1 on 2026-10-17 06:40
+
+from django.db import migrations
+from main.normalization import normalize_text_for_memory, normalized_hash
+
+BATCH_SIZE = 5000
+
+
+def rebuild_translation_memory(apps, schema_editor):
+    """
+    Rows filled by 0062 were keyed on normalize_text_for_cache, which drops
+    diacritics and punctuation. They are rebuilt keyed on the case-folded text.
+    """
+    TranslationPair = apps.get_model("main", "TranslationPair")
+    TranslationMemory = apps.get_model("main", "TranslationMemory")
+    TranslationMemory.objects.all().delete()
+
+    pairs = TranslationPair.objects.filter(
+        correct=True,
+        validated=True,
+        src_lang__isnull=False,
+        dst_lang__isnull=False,
+    ).only("id", "src_lang", "dst_lang", "src_text", "dst_text", "created_at")
+
+    batch = []
+    for pair in pairs.iterator(chunk_size=BATCH_SIZE):
+        for src_lang_id, src_text, dst_lang_id, dst_text in [
+            (pair.src_lang_id, pair.src_text, pair.dst_lang_id, pair.dst_text),
+            (pair.dst_lang_id, pair.dst_text, pair.src_lang_id, pair.src_text),
+        ]:
+            normalized = normalize_text_for_memory(src_text)
+            if not normalized:
+                continue
+            batch.append(
+                TranslationMemory(
+                    pair_id=pair.id,
+                    src_lang_id=src_lang_id,
+                    dst_lang_id=dst_lang_id,
+                    src_hash=normalized_hash(normalized),
+                    dst_text=dst_text,
+                    created_at=pair.created_at,
+                )
+            )
+        if len(batch) >= BATCH_SIZE:
+            TranslationMemory.objects.bulk_create(batch)
+            batch = []
+    TranslationMemory.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0068_cachetts_text_upper_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_translation_memory, migrations.RunPython.noop),
+    ]
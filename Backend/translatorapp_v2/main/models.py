@@ -12,7 +12,6 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import base64
 import hashlib
 import os
 import uuid
@@ -23,6 +22,13 @@ from django.db import models
 from django.db.models.functions import Upper
 from django.utils import timezone
 
+from .audio import from_pcm16, to_pcm16
+from .normalization import (
+    normalize_text_for_cache,
+    normalize_text_for_memory,
+    normalized_hash,
+)
+
 
 def get_asr_audio_upload_path(instance, filename):
     ext = filename.split(".")[-1]
@@ -127,6 +133,69 @@ class TranslationPair(models.Model):
         return f"{self.src_lang}:{self.src_text} | \
             {self.dst_lang}:{self.dst_text}"
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        # new pairs are rarely validated, skip the sync for translation requests
+        if not adding or (self.correct and self.validated):
+            self.sync_memory()
+
+    def sync_memory(self):
+        """
+        Keeps the TranslationMemory rows of the pair: one per direction while it
+        is correct and validated, none otherwise.
+        """
+        self.memory.all().delete()
+        TranslationMemory.objects.bulk_create(self.memory_rows())
+
+    def memory_rows(self):
+        """Unsaved TranslationMemory rows of the pair, if correct and validated."""
+        if not (
+            self.correct and self.validated and self.src_lang_id and self.dst_lang_id
+        ):
+            return []
+        return [
+            TranslationMemory(
+                pair=self,
+                src_lang_id=src_lang_id,
+                dst_lang_id=dst_lang_id,
+                src_hash=normalized_hash(normalize_text_for_memory(src_text)),
+                dst_text=dst_text,
+                created_at=self.created_at,
+            )
+            for src_lang_id, src_text, dst_lang_id, dst_text in [
+                (self.src_lang_id, self.src_text, self.dst_lang_id, self.dst_text),
+                (self.dst_lang_id, self.dst_text, self.src_lang_id, self.src_text),
+            ]
+            if normalize_text_for_memory(src_text)
+        ]
+
+
+class TranslationMemory(models.Model):
+    """
+    Validated translations looked up by the hash of the case-folded source text
+    (see normalize_text_for_memory), filled from correct and validated
+    TranslationPairs in both directions.
+    """
+
+    pair = models.ForeignKey(
+        TranslationPair, related_name="memory", on_delete=models.CASCADE
+    )
+    src_lang = models.ForeignKey(Lang, related_name="+", on_delete=models.CASCADE)
+    dst_lang = models.ForeignKey(Lang, related_name="+", on_delete=models.CASCADE)
+    src_hash = models.CharField(max_length=64)
+    dst_text = models.CharField(max_length=10000)
+    # of the pair, so the newest validated translation wins
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["src_hash", "src_lang", "dst_lang", "-created_at"],
+                name="translation_memory_index",
+            ),
+        ]
+
 
 class InvitationToken(models.Model):
     email = models.CharField(max_length=128)
@@ -274,6 +343,15 @@ class SpeechToTextAudio(models.Model):
     validated_text = models.TextField(max_length=5000, null=True, blank=True)
     validated = models.BooleanField(default=False)
 
+    # sha256 of the decoded 16 kHz PCM, to find the transcription of a clip sent
+    # again (main/asr_cache.py)
+    audio_hash = models.CharField(max_length=64, null=True, blank=True)
+    # configured ASR model and version the transcription is cached under, which may
+    # differ from the model_name and model_version reported by the model server
+    cache_model = models.CharField(max_length=201, null=True, blank=True)
+    # Track if transcription came from cache or model
+    from_cache = models.BooleanField(default=False)
+
     class Meta:
         indexes = [
             models.Index(fields=["language"]),
@@ -281,6 +359,7 @@ class SpeechToTextAudio(models.Model):
             models.Index(fields=["created_at"]),
             models.Index(fields=["model_name", "model_version"]),
             models.Index(fields=["validated"]),
+            models.Index(fields=["audio_hash", "language"]),
         ]
 
     def get_audio_bytes(self):
@@ -353,30 +432,84 @@ class GeneralSuggestion(models.Model):
 class CacheTTS(models.Model):
     """
     Cache for Text-to-Speech results to avoid redundant model calls.
-    Stores text and its corresponding audio in base64 format.
+    Stores text and its corresponding audio as 16-bit little-endian mono PCM.
+    Curated rows are recordings loaded by hand and are never evicted; auto rows
+    are model output admitted by main/tts_cache.py.
     """
 
+    CURATED = "curated"
+    AUTO = "auto"
+    SOURCES = [
+        (CURATED, "Curated"),
+        (AUTO, "Auto"),
+    ]
+
     text = models.TextField(max_length=5000)
     language = models.ForeignKey("Lang", on_delete=models.CASCADE)
     gender = models.CharField(max_length=15, default="female")
 
-    # Store the generated audio in base64
-    audio_data = models.TextField()  # Base64 encoded audio
-    audio_format = models.CharField(max_length=10, default="wav")  # e.g., 'wav', 'mp3'
+    # Lookup key of the cache, filled on save from `text`
+    normalized_text = models.TextField(default="", blank=True)
+    normalized_hash = models.CharField(max_length=64, null=True, blank=True)
+
+    # Raw PCM16 audio, streamed to clients as stored
+    audio = models.BinaryField()
+    audio_format = models.CharField(max_length=10, default="pcm16")
+    sampling_rate = models.PositiveIntegerField(default=16000)
+    num_samples = models.PositiveIntegerField(default=0)
+
+    source = models.CharField(max_length=10, default=CURATED, choices=SOURCES)
+    created_at = models.DateTimeField(default=timezone.now)
+    # only kept for auto rows, to evict the least recently hit ones
+    last_hit_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         indexes = [
             models.Index(fields=["text", "language", "gender"]),
+            # case insensitive lookups of find_cached_tts_normalized
+            models.Index(
+                Upper("text"), "language", "gender", name="cachetts_text_upper_idx"
+            ),
+            models.Index(fields=["source", "last_hit_at"]),
         ]
         # Ensure uniqueness for same text + language + model
         unique_together = [["text", "language", "gender"]]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["language", "gender", "normalized_hash"],
+                name="unique_cachetts_normalized_hash",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.normalized_text = normalize_text_for_cache(self.text)
+        self.normalized_hash = normalized_hash(self.normalized_text)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "text" in update_fields:
+            kwargs["update_fields"] = {
+                *update_fields,
+                "normalized_text",
+                "normalized_hash",
+            }
+        super().save(*args, **kwargs)
 
     def get_audio_bytes(self):
-        """Decode base64 audio data back to bytes"""
-        if self.audio_data:
-            return base64.b64decode(self.audio_data)
+        """PCM16 audio, as the buffer returned by the database driver (no copy)"""
+        if self.audio:
+            return self.audio
         return None
 
+    def get_waveform(self):
+        """Audio as float32 samples in [-1, 1]"""
+        return from_pcm16(self.audio)
+
+    def set_waveform(self, waveform, sampling_rate=16000):
+        """Stores a float waveform in [-1, 1] as PCM16"""
+        self.audio = to_pcm16(waveform)
+        self.audio_format = "pcm16"
+        self.sampling_rate = sampling_rate
+        self.num_samples = len(self.audio) // 2
+
 
 class TranslationRequest(models.Model):
     """
@@ -416,10 +549,16 @@ class TranslationRequest(models.Model):
     # Track if translation came from cache or model
     from_cache = models.BooleanField(default=False)
 
+    # Time spent in the model when pivoting through spanish, null otherwise
+    pivot_latency_ms = models.FloatField(null=True, blank=True)
+
+    # not unique in the database, since the table is partitioned by created_at,
+    # repeated ids are skipped when logged (main/request_log.py)
     client_request_id = models.CharField(
-        max_length=64, unique=True, null=True, blank=True, db_index=True
+        max_length=64, null=True, blank=True, db_index=True
     )
-    created_at = models.DateTimeField(auto_now_add=True)
+    # set when the request is logged, which may be before the row is written
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         indexes = [
@@ -435,6 +574,52 @@ class TranslationRequest(models.Model):
         return f"{self.src_lang.code} → {self.dst_lang.code} | {self.created_at}"
 
 
+class TranslationUsage(models.Model):
+    """
+    Number of translation requests per hour or day (UTC), language pair, model,
+    cache use and whether the user was logged in. Kept up to date as requests are
+    logged (main/usage_stats.py) and recomputed with rollupTranslationUsage.
+    """
+
+    HOUR = "hour"
+    DAY = "day"
+    PERIODS = [(HOUR, "Hour"), (DAY, "Day")]
+
+    period = models.CharField(max_length=4, choices=PERIODS)
+    period_start = models.DateTimeField()
+
+    # language codes, so rows can be upserted without looking them up
+    src_lang = models.CharField(max_length=50, default="")
+    dst_lang = models.CharField(max_length=50, default="")
+    model_name = models.CharField(max_length=100, default="")
+    model_version = models.CharField(max_length=100, default="")
+    from_cache = models.BooleanField()
+    authenticated = models.BooleanField()
+
+    count = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=[
+                    "period",
+                    "period_start",
+                    "src_lang",
+                    "dst_lang",
+                    "model_name",
+                    "model_version",
+                    "from_cache",
+                    "authenticated",
+                ],
+                name="unique_translation_usage",
+            )
+        ]
+        ordering = ["period_start"]
+
+    def __str__(self):
+        return f"{self.src_lang} → {self.dst_lang} | {self.period_start} | {self.count}"
+
+
 class Word(models.Model):
     text = models.CharField(max_length=100, unique=True, db_index=True)
 
@@ -0,0 +1,53 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Text normalization of cache keys. Kept apart from utils so models can fill their
+normalized columns on save.
+"""
+
+import hashlib
+import re
+import unicodedata
+
+
+def normalize_text_for_cache(s: str) -> str:
+    """Lowercase, remove diacritics and punctuation, collapse whitespace."""
+    if not s:
+        return ""
+    s = s.lower()
+    s = unicodedata.normalize("NFD", s)
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))  # strip diacritics
+    s = re.sub(r"[^\w\s]", "", s, flags=re.UNICODE)  # strip punctuation
+    s = re.sub(r"\s+", " ", s, flags=re.UNICODE).strip()  # collapse spaces
+    return s
+
+
+def normalize_text_for_memory(s: str) -> str:
+    """
+    Case-folded, with collapsed whitespace. Translation memory keys keep diacritics
+    and punctuation, so like the former `iexact` lookup only the case and spacing
+    of a source text may differ from the validated one.
+    """
+    if not s:
+        return ""
+    return " ".join(s.casefold().split())
+
+
+def normalized_hash(normalized_text: str) -> str | None:
+    """sha256 of an already normalized text, `None` for texts without words."""
+    if not normalized_text:
+        return None
+    return hashlib.sha256(normalized_text.encode("utf-8")).hexdigest()
@@ -0,0 +1,151 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Monthly partitions of the log tables, by created_at (UTC) in PostgreSQL. The rows
+written before the tables were partitioned are kept in a `<table>_legacy`
+partition, and rows of a month without partition go to `<table>_default` until
+the partition is created. Old partitions are detached, and optionally archived
+to gzipped CSV files and dropped.
+"""
+
+import gzip
+import logging
+import os
+import re
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+from django.db import connection, transaction
+
+from .models import SpeechToTextAudio, TextToSpeechAudio, TranslationRequest
+
+logger = logging.getLogger(__name__)
+
+LOG_MODELS = [TranslationRequest, TextToSpeechAudio, SpeechToTextAudio]
+
+_BOUNDS = re.compile(r"FROM \((.+)\) TO \((.+)\)")
+
+
+def month_start(moment):
+    """First instant of the UTC month of `moment`."""
+    return moment.astimezone(dt_timezone.utc).replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def default_partition_name(table):
+    return f"{table}_default"
+
+
+def _bound(value):
+    if value == "MINVALUE":
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+
+def partitions(table):
+    """
+    (name, start, end) of the range partitions of `table`, oldest first. `start` is
+    `None` for a partition without lower bound.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+            """,
+            [table],
+        )
+        rows = cursor.fetchall()
+    ranges = []
+    for name, bound in rows:
+        match = _BOUNDS.search(bound)
+        if match:  # not the default partition
+            ranges.append((name, _bound(match[1]), _bound(match[2])))
+    return sorted(ranges, key=lambda partition: partition[2])
+
+
+def default_months(table):
+    """Months of the rows stored in the default partition of `table`."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE 'UTC') "
+            f"FROM {default_partition_name(table)}"
+        )
+        return [month.replace(tzinfo=dt_timezone.utc) for (month,) in cursor]
+
+
+def create_partition(table, month):
+    """
+    Creates the partition of `month`, moving into it the rows of the month stored
+    in the default partition meanwhile. Returns the name of the partition.
+    """
+    name = partition_name(table, month)
+    start, end = month, add_months(month, 1)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE {name} "
+            f"(LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {default_partition_name(table)} "
+            f"WHERE created_at >= %s AND created_at < %s RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved",
+            [start, end],
+        )
+        # indexes and foreign keys of the table are added to the partition
+        cursor.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+    logger.info(f"Created partition {name}")
+    return name
+
+
+def detach_partition(table, name):
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+    logger.info(f"Detached partition {name}")
+
+
+def archive_table(name, archive_dir):
+    """
+    Writes the rows of the detached partition `name` to a gzipped CSV file in
+    `archive_dir` and drops it. Returns the path of the file.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    with connection.cursor() as cursor:
+        # written to a temporary file first, so a failed archive leaves no file
+        with gzip.open(f"{path}.tmp", "wb") as file:
+            cursor.cursor.copy_expert(
+                f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", file
+            )
+        os.replace(f"{path}.tmp", path)
+        cursor.execute(f"DROP TABLE {name}")
+    logger.info(f"Archived partition {name} to {path}")
+    return path
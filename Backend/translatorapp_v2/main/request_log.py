@@ -0,0 +1,156 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Logging of TranslationRequest rows off the request path. With REQUEST_LOG_ASYNC,
+records are queued in memory and a background thread writes them with one
+bulk_create once REQUEST_LOG_BATCH_SIZE are queued, or REQUEST_LOG_FLUSH_SECONDS
+after the first one. Otherwise they are written right away.
+
+Records whose client_request_id is already stored are skipped, so a retried
+request is logged once, and the written ones are counted in the usage rollups
+(main/usage_stats.py). The queue is drained when the process exits; records still
+queued when a process is killed are lost.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import usage_stats
+from .models import TranslationRequest
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+_queue = queue.Queue(maxsize=settings.REQUEST_LOG_MAX_QUEUE)
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def log(**fields):
+    """Logs a translation request with the TranslationRequest `fields`."""
+    record = TranslationRequest(**fields)
+    if not settings.REQUEST_LOG_ASYNC:
+        _write([record])
+        return
+
+    _start_worker()
+    try:
+        _queue.put_nowait(record)
+    except queue.Full:
+        logger.warning("Request log queue is full, writing synchronously")
+        _write([record])
+
+
+def _new_records(records):
+    """`records` without the client_request_ids repeated or already stored."""
+    keys = sorted({record.client_request_id for record in records} - {None})
+    seen = set()
+    if keys:
+        # client_request_id is not unique in the partitioned table, so writers of
+        # the same ids wait for each other until their transaction ends
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(hashtext(key)) FROM unnest(%s) AS key",
+                [keys],
+            )
+        seen = set(
+            TranslationRequest.objects.filter(client_request_id__in=keys).values_list(
+                "client_request_id", flat=True
+            )
+        )
+    new = []
+    for record in records:
+        if record.client_request_id is not None:
+            if record.client_request_id in seen:
+                continue
+            seen.add(record.client_request_id)
+        new.append(record)
+    return new
+
+
+def _write(records):
+    try:
+        with transaction.atomic():
+            records = _new_records(records)
+            TranslationRequest.objects.bulk_create(records)
+            usage_stats.record(records)
+    except Exception as e:
+        logger.error(f"Failed to log {len(records)} translation requests: {e}")
+
+
+def _take_batch():
+    """
+    Waits for a first record, then for up to a batch of records or the flush
+    interval. Returns the records and whether the worker was asked to stop.
+    """
+    batch = []
+    deadline = None
+    while len(batch) < settings.REQUEST_LOG_BATCH_SIZE:
+        timeout = None if deadline is None else deadline - time.monotonic()
+        if timeout is not None and timeout <= 0:
+            break
+        try:
+            record = _queue.get(timeout=timeout)
+        except queue.Empty:
+            break
+        if record is _STOP:
+            return batch, True
+        batch.append(record)
+        if deadline is None:
+            deadline = time.monotonic() + settings.REQUEST_LOG_FLUSH_SECONDS
+    return batch, False
+
+
+def _run():
+    stop = False
+    while not stop:
+        batch, stop = _take_batch()
+        if batch:
+            _write(batch)
+            logger.debug(f"Logged {len(batch)} translation requests")
+    connection.close()
+
+
+def _start_worker():
+    global _worker
+    with _worker_lock:
+        # also restarted in a forked process, where the thread does not exist
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(
+                target=_run, name="translation-request-log", daemon=True
+            )
+            _worker.start()
+
+
+def shutdown(timeout=None):
+    """Writes the queued records and stops the worker."""
+    global _worker
+    with _worker_lock:
+        worker, _worker = _worker, None
+    if worker is None or not worker.is_alive():
+        return
+    _queue.put(_STOP)
+    worker.join(timeout)
+
+
+atexit.register(shutdown, timeout=30)
@@ -36,6 +36,7 @@ from .models import (
     TextToSpeechAudio,
     TranslationPair,
     TranslationRequest,
+    TranslationUsage,
     Word,
     WordInformation,
 )
@@ -588,14 +589,22 @@ class GeneralSuggestionSerializer(serializers.ModelSerializer):
 
 class CacheTTSSerializer(serializers.ModelSerializer):
     language = serializers.CharField()
-    audio_data = serializers.CharField(read_only=True)
     gender = serializers.CharField(required=False, default="female")
 
     class Meta:
         model = CacheTTS
-        fields = ["text", "language", "gender", "audio_data", "audio_format"]
+        fields = [
+            "text",
+            "language",
+            "gender",
+            "audio_format",
+            "sampling_rate",
+            "num_samples",
+        ]
         read_only_fields = [
-            "audio_data",
+            "audio_format",
+            "sampling_rate",
+            "num_samples",
         ]
 
 
@@ -618,11 +627,44 @@ class TranslationRequestSerializer(serializers.ModelSerializer):
             "model_name",
             "model_version",
             "from_cache",
+            "pivot_latency_ms",
             "created_at",
         ]
         read_only_fields = ["created_at"]
 
 
+class TranslationUsageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TranslationUsage
+        fields = [
+            "period_start",
+            "src_lang",
+            "dst_lang",
+            "model_name",
+            "model_version",
+            "from_cache",
+            "authenticated",
+            "count",
+        ]
+
+
+class TranslationUsageQuerySerializer(serializers.Serializer):
+    period = serializers.ChoiceField(
+        choices=TranslationUsage.PERIODS, default=TranslationUsage.DAY
+    )
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    src_lang = serializers.CharField(required=False)
+    dst_lang = serializers.CharField(required=False)
+    model_name = serializers.CharField(required=False)
+    model_version = serializers.CharField(required=False)
+    # absent booleans of query params would otherwise be False
+    from_cache = serializers.BooleanField(required=False, allow_null=True, default=None)
+    authenticated = serializers.BooleanField(
+        required=False, allow_null=True, default=None
+    )
+
+
 class DefinitionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Definition
@@ -12,6 +12,9 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import asyncio
+import json
+
 import pytest
 from datetime import datetime, timedelta
 from django.contrib.auth.models import User
@@ -117,6 +120,60 @@ def create_languages():
     return english, spanish, rapanui, french
 
 
+@pytest.fixture
+def asgi_post():
+    """
+    Posts a JSON body to the ASGI application, as uvicorn serves it. `on_body` is
+    called with every chunk of the response body as soon as it is sent.
+    Returns the status code and the chunks.
+    """
+    from asgiref.sync import async_to_sync
+    from translatorapp.asgi import application
+
+    def post(path, data, on_body=None):
+        body = json.dumps(data).encode("utf-8")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode("utf-8"),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("utf-8")),
+            ],
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+        requests = [{"type": "http.request", "body": body, "more_body": False}]
+        status = []
+        chunks = []
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            # the client stays connected until the response is sent
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+            elif message.get("body"):
+                chunks.append(message["body"])
+                if on_body is not None:
+                    on_body(message["body"])
+
+        async_to_sync(application)(scope, receive, send)
+        return status[0], chunks
+
+    return post
+
+
 # MOCKS
 @pytest.fixture
 def mock_timezone(mocker):
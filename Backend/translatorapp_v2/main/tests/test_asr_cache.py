@@ -0,0 +1,140 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import io
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import soundfile as sf
+from django.core.files.uploadedfile import SimpleUploadedFile
+from fixtures import api_client, create_languages
+from main import asr_cache
+from main.models import SpeechToTextAudio
+
+
+@pytest.fixture
+def memory_storage(settings):
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    }
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    asr_cache.clear()
+    yield
+    asr_cache.clear()
+
+
+def upload(seed=0):
+    buffer = io.BytesIO()
+    samples = np.random.default_rng(seed).uniform(-0.3, 0.3, 16000)
+    sf.write(buffer, samples, 16000, format="WAV", subtype="PCM_16")
+    return SimpleUploadedFile("clip.wav", buffer.getvalue(), content_type="audio/wav")
+
+
+def transcribe(api_client, language="rap_Latn", seed=0):
+    return api_client.post(
+        "/api/speech-to-text/",
+        {
+            "audio": upload(seed),
+            "language": language,
+            "model_name": "asr",
+            "model_version": "1",
+        },
+        format="multipart",
+    )
+
+
+# 1. the least recently used entries are dropped first
+def test_lru_cache_eviction():
+    cache = asr_cache.LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+# 2. the same clip sent again is answered from the cache
+@pytest.mark.django_db
+def test_speech_to_text_cache_hit(api_client, create_languages, memory_storage, settings):
+    with patch(
+        "main.utils.get_asr_prediction",
+        return_value=("iorana", settings.APP_SETTINGS.inference_asr_model_name, "1"),
+    ) as mock_asr:
+        first = transcribe(api_client)
+        second = transcribe(api_client)
+        other_language = transcribe(api_client, language="spa_Latn")
+
+    assert first.status_code == 200
+    assert first.data["from_cache"] is False
+    assert second.data["from_cache"] is True
+    assert second.data["text"] == "iorana"
+    assert second.data["id"] != first.data["id"]
+    assert other_language.data["from_cache"] is False
+    assert mock_asr.call_count == 2
+
+    rows = SpeechToTextAudio.objects.order_by("id")
+    assert [row.from_cache for row in rows] == [False, True, False]
+    assert rows[0].audio_hash == rows[1].audio_hash
+
+
+# 3. stored transcriptions are found once out of memory, unless the model changed
+@pytest.mark.django_db
+def test_speech_to_text_cache_database_tier(
+    api_client, create_languages, memory_storage, settings
+):
+    model_name = settings.APP_SETTINGS.inference_asr_model_name
+    with patch(
+        "main.utils.get_asr_prediction", return_value=("iorana", model_name, "1")
+    ) as mock_asr:
+        transcribe(api_client)
+        asr_cache.clear()
+        response = transcribe(api_client)
+
+        asr_cache.clear()
+        settings.ASR_MODEL_VERSION = "2"
+        new_model = transcribe(api_client)
+
+    assert response.data["from_cache"] is True
+    assert new_model.data["from_cache"] is False
+    assert mock_asr.call_count == 2
+
+
+# 4. results are found when the model server reports another name and version
+@pytest.mark.django_db
+def test_speech_to_text_cache_reported_model(
+    api_client, create_languages, memory_storage
+):
+    with patch(
+        "main.utils.get_asr_prediction", return_value=("iorana", "asr-model", "7")
+    ) as mock_asr:
+        transcribe(api_client)
+        from_memory = transcribe(api_client)
+        asr_cache.clear()
+        from_database = transcribe(api_client)
+
+    for response in [from_memory, from_database]:
+        assert response.data["from_cache"] is True
+        assert response.data["model_name"] == "asr-model"
+        assert response.data["model_version"] == "7"
+    assert mock_asr.call_count == 1
+    assert SpeechToTextAudio.objects.first().cache_model == asr_cache.model_key()
@@ -0,0 +1,125 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import json
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from fixtures import create_languages
+from main.asr_stream import StreamTranscriber, speech_to_text_stream
+from main.models import SpeechToTextAudio
+
+
+def pcm(seconds, speech=True):
+    samples = int(seconds * 16000)
+    audio = np.sin(np.arange(samples) * 0.1) * 0.5 if speech else np.zeros(samples)
+    return (audio * 32767).astype("<i2").tobytes()
+
+
+def chunks(data, seconds=0.1):
+    size = int(seconds * 16000) * 2
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+def run_socket(messages):
+    async def run():
+        received = asyncio.Queue()
+        for message in [{"type": "websocket.connect"}, *messages]:
+            received.put_nowait(message)
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await speech_to_text_stream({"type": "websocket"}, received.get, send)
+        return sent
+
+    return asyncio.run(run())
+
+
+# 1. segments are closed at pauses and only the open one is transcribed again
+def test_stream_transcriber_segments():
+    calls = []
+
+    async def transcribe(audio, lang_code):
+        calls.append(len(audio) / 16000)
+        return f"segment{len(calls)}", "asr", "1"
+
+    async def run():
+        transcriber = StreamTranscriber("rap_Latn", transcribe=transcribe)
+        partials = []
+        audio = pcm(0.5, speech=False) + pcm(1) + pcm(0.5, speech=False) + pcm(0.3)
+        for chunk in chunks(audio):
+            partials.append(await transcriber.feed(chunk))
+        return transcriber, partials, await transcriber.finish()
+
+    transcriber, partials, text = asyncio.run(run())
+
+    # leading silence is dropped, the pause closes the first segment
+    assert calls == pytest.approx([0.5, 1.0, 1.5, 0.4])
+    assert "segment" in [p for p in partials if p][0]
+    assert text.startswith(transcriber.texts[0])
+    assert len(transcriber.texts) == 2
+    assert len(transcriber.pcm) == int(2.3 * 16000) * 2
+
+
+# 2. partial transcriptions are sent while recording, the final one is stored
+@pytest.mark.django_db(transaction=True)
+def test_speech_to_text_stream(settings, create_languages):
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    }
+    audio = pcm(1.2)
+    messages = [
+        {"type": "websocket.receive", "text": json.dumps({"type": "start", "language": "rap_Latn"})},
+        *[{"type": "websocket.receive", "bytes": chunk} for chunk in chunks(audio)],
+        {"type": "websocket.receive", "text": json.dumps({"type": "end"})},
+    ]
+    with patch(
+        "main.asr_stream.get_asr_prediction", return_value=("iorana", "asr", "1")
+    ) as mock_asr:
+        sent = run_socket(messages)
+
+    assert sent[0] == {"type": "websocket.accept"}
+    assert sent[-1] == {"type": "websocket.close", "code": 1000}
+    events = [json.loads(m["text"]) for m in sent[1:-1]]
+    assert [e["type"] for e in events] == ["partial", "partial", "final"]
+    final = events[-1]
+    assert final["text"] == "iorana"
+    assert final["model_name"] == "asr"
+
+    audio_obj = SpeechToTextAudio.objects.get(id=final["id"])
+    assert audio_obj.text == "iorana"
+    assert audio_obj.language.code == "rap_Latn"
+    assert audio_obj.audio_format == "wav"
+    assert audio_obj.audio_file.name.endswith(".wav")
+    # the last partial covered 1.0s, only the remaining audio triggers a call
+    assert mock_asr.call_count == 3
+
+
+# 3. unknown languages close the socket with an error
+@pytest.mark.django_db(transaction=True)
+def test_speech_to_text_stream_unknown_language(create_languages):
+    sent = run_socket(
+        [{"type": "websocket.receive", "text": json.dumps({"type": "start", "language": "xxx"})}]
+    )
+
+    assert json.loads(sent[1]["text"]) == {
+        "type": "error",
+        "detail": "Language code 'xxx' not supported",
+    }
+    assert sent[-1] == {"type": "websocket.close", "code": 1008}
@@ -0,0 +1,63 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import io
+from unittest.mock import patch
+
+import numpy as np
+import soundfile as sf
+from main import audio
+
+
+def encode(data, sampling_rate, format="WAV", subtype="PCM_16"):
+    buffer = io.BytesIO()
+    sf.write(buffer, data, sampling_rate, format=format, subtype=subtype)
+    return buffer.getvalue()
+
+
+# 1. stereo 48 kHz wav is decoded in-process to padded 16 kHz mono
+def test_decode_wav_in_process():
+    tone = 0.5 * np.sin(2 * np.pi * 440 * np.arange(48000) / 48000)
+    audio_bytes = encode(np.stack([tone, tone], axis=1), 48000)
+
+    with patch.object(audio, "_decode_ffmpeg") as mock_ffmpeg:
+        samples = audio.decode_audio(audio_bytes)
+
+    mock_ffmpeg.assert_not_called()
+    assert samples.dtype == np.float32
+    assert len(samples) == 16000 + int(audio.PAD_SECONDS * 16000)
+    assert np.all(samples[16000:] == 0)
+    assert 0.45 < np.abs(samples[100:15900]).max() < 0.55
+
+
+# 2. decoded samples are not overwritten by the next decode in the same thread
+def test_decode_returns_own_array():
+    first = audio.decode_audio(encode(np.full(1600, 0.25), 16000))
+    second = audio.decode_audio(encode(np.full(1600, -0.25), 16000))
+
+    assert not np.shares_memory(first, second)
+    assert np.allclose(first[:1600], 0.25, atol=1e-4)
+
+
+# 3. webm and opus are decoded with ffmpeg
+def test_decode_webm_and_opus_with_ffmpeg():
+    opus = encode(np.zeros(48000), 48000, format="OGG", subtype="OPUS")
+    webm = b"\x1aE\xdf\xa3" + b"\x00" * 64
+
+    with patch.object(audio, "_decode_ffmpeg") as mock_ffmpeg:
+        mock_ffmpeg.return_value = np.ones(160, dtype=np.float32)
+        for audio_bytes, container in [(opus, "ogg"), (webm, "webm")]:
+            samples = audio.decode_audio(audio_bytes)
+            mock_ffmpeg.assert_called_with(audio_bytes, container)
+            assert len(samples) == 160 + int(audio.PAD_SECONDS * 16000)
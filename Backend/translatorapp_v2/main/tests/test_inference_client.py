@@ -0,0 +1,121 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+from django.test import override_settings
+from main import inference_client
+from main.utils import get_prediction
+
+
+@pytest.fixture(autouse=True)
+def clients():
+    inference_client.reset()
+    yield
+    inference_client.reset()
+
+
+def make_response(status_code, body=None):
+    response = MagicMock(status_code=status_code)
+    response.json.return_value = body
+    return response
+
+
+# 1. one pooled session per deployment
+def test_session_per_deployment():
+    a = inference_client.get_client("http://model-a:8015/v2/models/a/infer")
+    b = inference_client.get_client("http://model-b:8015/v2/models/b/infer")
+    assert a is inference_client.get_client("http://model-a:8015/v2/models/a2/infer")
+    assert a is not b
+
+
+# 2. connection errors and gateway errors are retried
+@override_settings(INFERENCE_MAX_RETRIES=2, INFERENCE_RETRY_BACKOFF=0)
+def test_retries_then_success():
+    with patch.object(
+        requests.Session,
+        "post",
+        side_effect=[requests.ConnectionError(), make_response(503), make_response(200)],
+    ) as mock_post:
+        response = inference_client.post("http://model:8015/infer", data="{}")
+
+    assert response.status_code == 200
+    assert mock_post.call_count == 3
+    # default timeouts are always set
+    assert mock_post.call_args.kwargs["timeout"] is not None
+
+
+# 3. retries are bounded
+@override_settings(INFERENCE_MAX_RETRIES=1, INFERENCE_RETRY_BACKOFF=0)
+def test_retries_bounded():
+    with patch.object(
+        requests.Session, "post", side_effect=requests.ConnectTimeout()
+    ) as mock_post:
+        with pytest.raises(requests.ConnectTimeout):
+            inference_client.post("http://model:8015/infer", data="{}")
+    assert mock_post.call_count == 2
+
+
+# 4. read timeouts are not retried, the model server may still be generating
+@override_settings(INFERENCE_MAX_RETRIES=2, INFERENCE_RETRY_BACKOFF=0)
+def test_read_timeout_not_retried():
+    url = "http://model:8015/infer"
+    with patch.object(
+        requests.Session, "post", side_effect=requests.ReadTimeout()
+    ) as mock_post:
+        with pytest.raises(requests.ReadTimeout):
+            inference_client.post(url, data="{}")
+    assert mock_post.call_count == 1
+    assert inference_client.get_client(url).breaker.failures == 1
+
+
+# 5. the circuit opens after consecutive failures and closes after the reset
+@override_settings(
+    INFERENCE_MAX_RETRIES=0, INFERENCE_CIRCUIT_FAILURES=2, INFERENCE_CIRCUIT_RESET=60
+)
+def test_circuit_breaker():
+    url = "http://model:8015/infer"
+    with patch.object(
+        requests.Session, "post", side_effect=requests.ConnectionError()
+    ) as mock_post:
+        for _ in range(2):
+            with pytest.raises(requests.ConnectionError):
+                inference_client.post(url)
+        with pytest.raises(inference_client.CircuitOpenError):
+            inference_client.post(url)
+    assert mock_post.call_count == 2
+
+    breaker = inference_client.get_client(url).breaker
+    breaker.opened_at -= 60
+    with patch.object(requests.Session, "post", return_value=make_response(200)):
+        assert inference_client.post(url).status_code == 200
+    assert breaker.opened_at is None
+
+
+# 6. predictions go through the pooled client
+def test_get_prediction_uses_client():
+    body = {
+        "model_name": "model",
+        "model_version": "1",
+        "outputs": [{"name": "translation", "data": ["Iorana"]}],
+    }
+    with patch.object(
+        requests.Session, "post", return_value=make_response(200, body)
+    ) as mock_post:
+        result = get_prediction("Hola", "spa_Latn", "rap_Latn", "http://model/infer")
+
+    assert result == ("Iorana", "model", "1")
+    mock_post.assert_called_once()
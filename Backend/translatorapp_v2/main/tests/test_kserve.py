@@ -0,0 +1,110 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from main import kserve
+from main.utils import get_asr_prediction, get_tts_prediction
+
+
+def binary_response(outputs, arrays):
+    header = json.dumps(
+        {"model_name": "model", "model_version": "1", "outputs": outputs}
+    ).encode("utf-8")
+    response = MagicMock(status_code=200)
+    response.headers = {kserve.HEADER_LENGTH: str(len(header))}
+    response.content = header + b"".join(array.tobytes() for array in arrays)
+    return response
+
+
+# 1. binary inputs are appended as raw bytes after the json header
+def test_encode_request():
+    audio = np.arange(4, dtype=np.float32).reshape(1, 4)
+    body, headers = kserve.encode_request(
+        [{"name": "lang_code", "shape": [1, 1], "datatype": "BYTES", "data": [["x"]]}],
+        binary_inputs={"audio": ("FP32", audio)},
+        binary_outputs=["waveform"],
+    )
+
+    header_length = int(headers[kserve.HEADER_LENGTH])
+    header = json.loads(body[:header_length])
+    assert [i["name"] for i in header["inputs"]] == ["audio", "lang_code"]
+    assert header["inputs"][0]["parameters"] == {"binary_data_size": 16}
+    assert header["outputs"] == [
+        {"name": "waveform", "parameters": {"binary_data": True}}
+    ]
+    assert np.array_equal(np.frombuffer(body[header_length:], np.float32), audio[0])
+
+
+# 2. binary outputs are decoded into numpy arrays, json outputs are kept
+def test_decode_response():
+    waveform = np.linspace(-1, 1, 6, dtype=np.float32).reshape(1, 6)
+    response = binary_response(
+        [
+            {"name": "text", "datatype": "BYTES", "shape": [1], "data": ["hola"]},
+            {
+                "name": "waveform",
+                "datatype": "FP32",
+                "shape": [1, 6],
+                "parameters": {"binary_data_size": waveform.nbytes},
+            },
+        ],
+        [waveform],
+    )
+    result = kserve.decode_response(response)
+
+    assert result["outputs"][0]["data"] == ["hola"]
+    assert np.array_equal(result["outputs"][1]["data"], waveform)
+
+
+# 3. ASR audio is sent as a binary tensor
+def test_get_asr_prediction_binary_audio():
+    response = MagicMock(headers={})
+    response.json.return_value = {
+        "model_name": "asr",
+        "model_version": "1",
+        "outputs": [{"name": "text", "data": ["iorana"]}],
+    }
+    audio = np.zeros(16000, dtype=np.float64)
+    with patch("main.utils.inference_client.post", return_value=response) as mock:
+        result = get_asr_prediction(audio, 16000, "rap", "http://asr/infer")
+
+    assert result == ("iorana", "asr", "1")
+    body = mock.call_args.kwargs["data"]
+    assert len(body) == int(mock.call_args.kwargs["headers"][kserve.HEADER_LENGTH]) + (
+        16000 * 4
+    )
+
+
+# 4. TTS waveform is received as a binary tensor
+def test_get_tts_prediction_binary_waveform():
+    waveform = np.array([[0.5, -0.5, 0.25]], dtype=np.float32)
+    response = binary_response(
+        [
+            {
+                "name": "waveform",
+                "datatype": "FP32",
+                "shape": [1, 3],
+                "parameters": {"binary_data_size": waveform.nbytes},
+            }
+        ],
+        [waveform],
+    )
+    with patch("main.utils.inference_client.post", return_value=response) as mock:
+        result = get_tts_prediction("Iorana", "rap_female", "http://tts/infer")
+
+    assert result == ([0.5, -0.5, 0.25], "model", "1")
+    assert kserve.HEADER_LENGTH in mock.call_args.kwargs["headers"]
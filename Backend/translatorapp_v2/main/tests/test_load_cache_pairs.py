@@ -0,0 +1,92 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+
+import pytest
+from django.core.management import call_command
+from fixtures import create_languages
+from main.models import TranslationMemory, TranslationPair
+
+
+def pair(src_text, dst_text, correct=True):
+    return {
+        "src_lang": "spa_Latn",
+        "dst_lang": "rap_Latn",
+        "src_text": src_text,
+        "dst_text": dst_text,
+        "correct": correct,
+    }
+
+
+# 1. JSON Lines are loaded in chunks, without duplicates nor unknown languages
+@pytest.mark.django_db
+def test_load_cache_pairs_jsonl(create_languages, tmp_path):
+    english, spanish, rapanui, french = create_languages
+    TranslationPair.objects.create(
+        src_text="Hola",
+        dst_text="Iorana",
+        src_lang=spanish,
+        dst_lang=rapanui,
+        correct=True,
+        validated=True,
+    )
+    rows = [
+        pair("Hola", "Iorana"),
+        pair("Gracias", "Maururu"),
+        pair("Gracias", "Maururu"),
+        pair("Adiós", "Ka oho", correct=False),
+        {**pair("Sí", "Ē"), "dst_lang": "xxx_Latn"},
+        pair("Buenas noches", "Pō nehenehe"),
+    ]
+    (tmp_path / "pairs.jsonl").write_text(
+        "\n".join(json.dumps(row) for row in rows), encoding="utf-8"
+    )
+
+    call_command(
+        "loadCachePairs",
+        "pairs.jsonl",
+        "--data-dir",
+        str(tmp_path),
+        "--chunk-size",
+        "2",
+    )
+
+    loaded = TranslationPair.objects.exclude(src_text="Hola")
+    assert sorted(loaded.values_list("src_text", "correct")) == [
+        ("Adiós", False),
+        ("Buenas noches", True),
+        ("Gracias", True),
+    ]
+    assert all(p.validated for p in loaded)
+    # incorrect pairs are not used as translations
+    assert TranslationMemory.objects.count() == 6
+
+
+# 2. CSV rows are read with their correct column as text
+@pytest.mark.django_db
+def test_load_cache_pairs_csv(create_languages, tmp_path):
+    (tmp_path / "pairs.csv").write_text(
+        "src_lang,dst_lang,src_text,dst_text,correct\n"
+        'spa_Latn,rap_Latn,"Hola, amigo",Iorana e hoa,true\n'
+        "spa_Latn,rap_Latn,Adiós,Ka oho,false\n",
+        encoding="utf-8",
+    )
+
+    call_command("loadCachePairs", "pairs.csv", "--data-dir", str(tmp_path))
+
+    assert sorted(TranslationPair.objects.values_list("src_text", "correct")) == [
+        ("Adiós", False),
+        ("Hola, amigo", True),
+    ]
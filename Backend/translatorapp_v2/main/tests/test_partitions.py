@@ -0,0 +1,94 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import gzip
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from fixtures import create_languages
+from main import partitions
+from main.models import TextToSpeechAudio, TranslationRequest
+
+
+def log_request(spanish, rapanui, created_at):
+    return TranslationRequest.objects.create(
+        src_text="Hola",
+        dst_text="Iorana",
+        src_lang=spanish,
+        dst_lang=rapanui,
+        created_at=created_at,
+    )
+
+
+# 1. partitions - months ahead are created and rows of the default partition moved
+@pytest.mark.django_db
+def test_partition_log_tables_create(create_languages):
+    english, spanish, rapanui, french = create_languages
+    request = log_request(spanish, rapanui, datetime(2030, 1, 9, tzinfo=timezone.utc))
+    table = TranslationRequest._meta.db_table
+    assert partitions.default_months(table) == [
+        datetime(2030, 1, 1, tzinfo=timezone.utc)
+    ]
+
+    call_command("partitionLogTables", "--months-ahead", "2")
+
+    current = partitions.month_start(datetime.now(timezone.utc))
+    for model in partitions.LOG_MODELS:
+        names = [name for name, _, _ in partitions.partitions(model._meta.db_table)]
+        assert partitions.partition_name(
+            model._meta.db_table, partitions.add_months(current, 2)
+        ) in names
+    assert f"{table}_p203001" in [name for name, _, _ in partitions.partitions(table)]
+    assert partitions.default_months(table) == []
+    assert TranslationRequest.objects.get(id=request.id).src_text == "Hola"
+
+
+# 2. partitions - old partitions are detached and archived
+@pytest.mark.django_db
+def test_partition_log_tables_retention(create_languages, tmp_path):
+    english, spanish, rapanui, french = create_languages
+    log_request(spanish, rapanui, datetime(2030, 1, 9, tzinfo=timezone.utc))
+    log_request(spanish, rapanui, datetime(2030, 3, 9, tzinfo=timezone.utc))
+    TextToSpeechAudio.objects.create(text="Iorana", language=rapanui)
+    call_command("partitionLogTables", "--months-ahead", "0")
+    # fires the deferred foreign key checks, tables with pending ones can't be dropped
+    connection.check_constraints()
+
+    with patch(
+        "main.management.commands.partitionLogTables.timezone.now",
+        return_value=datetime(2030, 4, 15, tzinfo=timezone.utc),
+    ):
+        call_command(
+            "partitionLogTables",
+            "--retention-months",
+            "1",
+            "--archive-dir",
+            str(tmp_path),
+        )
+
+    table = TranslationRequest._meta.db_table
+    assert [name for name, _, _ in partitions.partitions(table)][:2] == [
+        f"{table}_p203003",
+        f"{table}_p203004",
+    ]
+    assert TranslationRequest.objects.count() == 1
+    assert not TextToSpeechAudio.objects.exists()
+    with gzip.open(tmp_path / f"{table}_p203001.csv.gz", "rt") as file:
+        header, row = file.read().splitlines()
+    assert header.startswith("id,")
+    assert "Iorana" in row
+    assert (tmp_path / f"{table}_legacy.csv.gz").exists()
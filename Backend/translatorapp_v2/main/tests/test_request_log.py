@@ -0,0 +1,92 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import time
+
+import pytest
+from django.test import override_settings
+from fixtures import api_client, create_languages, mock_get_prediction
+from main import request_log
+from main.models import TranslationRequest
+from main.serializers import LanguageSerializer
+
+
+def translate(api_client, src_lang, dst_lang, src_text, request_id=None):
+    data = {
+        "src_text": src_text,
+        "src_lang": LanguageSerializer(src_lang).data,
+        "dst_lang": LanguageSerializer(dst_lang).data,
+    }
+    if request_id:
+        data["request_id"] = request_id
+    response = api_client.post("/api/translate/", data, format="json")
+    assert response.status_code == 200
+
+
+# 1. request log - a retried request_id is logged once
+@pytest.mark.django_db
+@override_settings(TRANSLATION_REQUIRES_AUTH=False)
+def test_request_log_idempotent(api_client, create_languages, mock_get_prediction):
+    english, spanish, rapanui, french = create_languages
+
+    translate(api_client, spanish, rapanui, "Hola", request_id="abc")
+    translate(api_client, spanish, rapanui, "Hola", request_id="abc")
+    translate(api_client, spanish, rapanui, "Hola")
+
+    assert TranslationRequest.objects.count() == 2
+    assert TranslationRequest.objects.filter(client_request_id="abc").count() == 1
+
+
+# 2. request log - async records are written in one batch when shut down
+@pytest.mark.django_db(transaction=True)
+@override_settings(
+    TRANSLATION_REQUIRES_AUTH=False,
+    REQUEST_LOG_ASYNC=True,
+    REQUEST_LOG_FLUSH_SECONDS=60,
+)
+def test_request_log_async_drained(api_client, create_languages, mock_get_prediction):
+    english, spanish, rapanui, french = create_languages
+
+    translate(api_client, spanish, rapanui, "Hola", request_id="abc")
+    translate(api_client, spanish, rapanui, "Hola", request_id="abc")
+    translate(api_client, rapanui, spanish, "Iorana")
+    assert not TranslationRequest.objects.exists()
+
+    request_log.shutdown()
+
+    assert sorted(
+        TranslationRequest.objects.values_list("src_text", "client_request_id")
+    ) == [("Hola", "abc"), ("Iorana", None)]
+
+
+# 3. request log - async records are written once a batch is full
+@pytest.mark.django_db(transaction=True)
+@override_settings(
+    TRANSLATION_REQUIRES_AUTH=False,
+    REQUEST_LOG_ASYNC=True,
+    REQUEST_LOG_BATCH_SIZE=2,
+    REQUEST_LOG_FLUSH_SECONDS=60,
+)
+def test_request_log_async_batch(api_client, create_languages, mock_get_prediction):
+    english, spanish, rapanui, french = create_languages
+
+    translate(api_client, spanish, rapanui, "Hola")
+    translate(api_client, rapanui, spanish, "Iorana")
+    for _ in range(50):
+        if TranslationRequest.objects.count() == 2:
+            break
+        time.sleep(0.1)
+
+    assert TranslationRequest.objects.count() == 2
+    request_log.shutdown()
@@ -12,13 +12,24 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import json
+import threading
 from unittest.mock import patch
 
 import pytest
+from asgiref.sync import async_to_sync
+from django.conf import settings
 from django.test import override_settings
-from fixtures import api_client, create_languages, mock_get_prediction, user_auth
-from main.models import TranslationPair
+from fixtures import (
+    api_client,
+    asgi_post,
+    create_languages,
+    mock_get_prediction,
+    user_auth,
+)
+from main.models import TranslationPair, TranslationRequest
 from main.serializers import LanguageSerializer
+from main.utils import get_prediction_stream
 from unittest.mock import call, ANY
 
 # 1. translate - base2native - Success (No Cache Hit)
@@ -342,4 +353,248 @@ def test_translate_max_words_fail_newlines(api_client, user_auth, create_languag
     
     response = api_client.post(url, data, format="json")
     assert response.status_code == 400
-    assert "src_text" in response.data # check that the error is in the src_text field
\ No newline at end of file
+    assert "src_text" in response.data # check that the error is in the src_text field
+
+def _read_stream(response):
+    """Body of a streaming response, read asynchronously as the ASGI server does."""
+
+    async def read():
+        return b"".join([chunk async for chunk in response])
+
+    return async_to_sync(read)()
+
+
+def _stream_events(response):
+    """Parses the Server-Sent Events of a streaming response."""
+    return _parse_events(_read_stream(response).decode("utf-8"))
+
+
+def _parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines.get("event", "message"), json.loads(lines["data"])))
+    return events
+
+
+# 17. translate stream - partial translations then done event with timings
+@pytest.mark.django_db
+@override_settings(TRANSLATION_REQUIRES_AUTH=False)
+def test_translate_stream_spanish_to_rapanui(api_client, create_languages):
+    english, spanish, rapanui, french = create_languages
+
+    partials = [
+        {"dst_text": text, "model_name": "test-model", "model_version": "v1"}
+        for text in ["Io", "Iorana"]
+    ]
+    with patch("main.views.translate_stream", return_value=iter(partials)) as mock:
+        response = api_client.post(
+            "/api/translate/stream/",
+            {
+                "src_text": "Hola",
+                "src_lang": LanguageSerializer(spanish).data,
+                "dst_lang": LanguageSerializer(rapanui).data,
+            },
+            format="json",
+        )
+        events = _stream_events(response)
+
+    assert response.status_code == 200
+    assert response["Content-Type"] == "text/event-stream"
+    mock.assert_called_once_with("Hola", spanish, rapanui)
+    assert events[:2] == [("message", {"dst_text": "Io"}), ("message", {"dst_text": "Iorana"})]
+    event, done = events[-1]
+    assert event == "done"
+    assert done["dst_text"] == "Iorana"
+    assert done["model_name"] == "test-model"
+    assert 0 <= done["ttft"] <= done["latency"]
+    assert TranslationRequest.objects.get(src_text="Hola").dst_text == "Iorana"
+
+
+# 18. translate stream - model error is sent as an error event
+@pytest.mark.django_db
+@override_settings(TRANSLATION_REQUIRES_AUTH=False)
+def test_translate_stream_model_error(api_client, create_languages):
+    english, spanish, rapanui, french = create_languages
+
+    def failing_stream(*args):
+        raise Exception("Error in model prediction")
+        yield
+
+    with patch("main.views.translate_stream", side_effect=failing_stream):
+        response = api_client.post(
+            "/api/translate/stream/",
+            {
+                "src_text": "Hola",
+                "src_lang": LanguageSerializer(spanish).data,
+                "dst_lang": LanguageSerializer(rapanui).data,
+            },
+            format="json",
+        )
+        events = _stream_events(response)
+
+    assert events == [("error", {"detail": "Error en la predicción del modelo"})]
+    assert not TranslationRequest.objects.exists()
+
+
+# 19. translate stream - get_prediction_stream parses generate_stream responses
+def test_get_prediction_stream_parses_events():
+    lines = [
+        'data: {"model_name": "m", "model_version": "1", "translation": "Io"}',
+        "",
+        'data: {"model_name": "m", "model_version": "1", "translation": "Iorana"}',
+    ]
+    with patch("main.utils.inference_client.post") as mock_post:
+        mock_post.return_value.__enter__.return_value.iter_lines.return_value = lines
+        results = list(get_prediction_stream("Hola", "spa_Latn", "rap_Latn", "url"))
+
+    assert [r["dst_text"] for r in results] == ["Io", "Iorana"]
+    assert results[0]["model_name"] == "m"
+
+
+# 20. translate - native2any - pivot latency is logged for the two hops
+@pytest.mark.django_db
+@override_settings(TRANSLATION_REQUIRES_AUTH=False)
+def test_translate_pivot_latency_logged(api_client, create_languages, mock_get_prediction):
+    english, spanish, rapanui, french = create_languages
+
+    response = api_client.post(
+        "/api/translate/",
+        {
+            "src_text": "Iorana",
+            "src_lang": LanguageSerializer(rapanui).data,
+            "dst_lang": LanguageSerializer(french).data,
+        },
+        format="json",
+    )
+    assert response.status_code == 200
+    assert "pivot_latency_ms" not in response.data
+    assert TranslationRequest.objects.get(src_text="Iorana").pivot_latency_ms >= 0
+
+
+# 21. translate - native2any - single call to the pivot deployment when configured
+@pytest.mark.django_db
+@override_settings(TRANSLATION_REQUIRES_AUTH=False)
+def test_translate_pivot_deployment(api_client, create_languages, mock_get_prediction):
+    english, spanish, rapanui, french = create_languages
+
+    with patch.object(
+        settings.APP_SETTINGS, "pivot_inference_model_name", "pivot-model"
+    ), patch.object(settings.APP_SETTINGS, "pivot_inference_model_url", "http://pivot"):
+        response = api_client.post(
+            "/api/translate/",
+            {
+                "src_text": "Iorana",
+                "src_lang": LanguageSerializer(rapanui).data,
+                "dst_lang": LanguageSerializer(french).data,
+            },
+            format="json",
+        )
+
+    assert response.status_code == 200
+    assert response.data["dst_text"] == "Bonjour"
+    mock_get_prediction.assert_called_once_with(
+        "Iorana",
+        rapanui.code,
+        french.code,
+        deployment="http://pivot/v2/models/pivot-model/infer",
+    )
+    assert TranslationRequest.objects.get(src_text="Iorana").pivot_latency_ms >= 0
+
+
+# 22. translate - any2any - no pivot latency without pivoting
+@pytest.mark.django_db
+@override_settings(TRANSLATION_REQUIRES_AUTH=False)
+def test_translate_no_pivot_latency(api_client, create_languages, mock_get_prediction):
+    english, spanish, rapanui, french = create_languages
+
+    api_client.post(
+        "/api/translate/",
+        {
+            "src_text": "Bonjour",
+            "src_lang": LanguageSerializer(french).data,
+            "dst_lang": LanguageSerializer(english).data,
+        },
+        format="json",
+    )
+    assert TranslationRequest.objects.get(src_text="Bonjour").pivot_latency_ms is None
+
+
+# 23. translate stream - a model stream without results is sent as an error event
+@pytest.mark.django_db
+@override_settings(TRANSLATION_REQUIRES_AUTH=False)
+def test_translate_stream_empty(api_client, create_languages):
+    english, spanish, rapanui, french = create_languages
+
+    with patch("main.views.translate_stream", return_value=iter([])):
+        response = api_client.post(
+            "/api/translate/stream/",
+            {
+                "src_text": "Hola",
+                "src_lang": LanguageSerializer(spanish).data,
+                "dst_lang": LanguageSerializer(rapanui).data,
+            },
+            format="json",
+        )
+        events = _stream_events(response)
+
+    assert events == [("error", {"detail": "Error en la predicción del modelo"})]
+    assert not TranslationRequest.objects.exists()
+
+
+# 24. translate stream - native2any - pivot latency is sent and logged
+@pytest.mark.django_db
+@override_settings(TRANSLATION_REQUIRES_AUTH=False)
+def test_translate_stream_pivot_latency(api_client, create_languages, mock_get_prediction):
+    english, spanish, rapanui, french = create_languages
+
+    partials = [{"dst_text": "Bonjour", "model_name": "raw", "model_version": "v1"}]
+    with patch("main.utils.get_prediction_stream", return_value=iter(partials)):
+        response = api_client.post(
+            "/api/translate/stream/",
+            {
+                "src_text": "Iorana",
+                "src_lang": LanguageSerializer(rapanui).data,
+                "dst_lang": LanguageSerializer(french).data,
+            },
+            format="json",
+        )
+        events = _stream_events(response)
+
+    event, done = events[-1]
+    assert event == "done"
+    assert done["pivot_latency_ms"] >= 0
+    logged = TranslationRequest.objects.get(src_text="Iorana")
+    assert logged.pivot_latency_ms == done["pivot_latency_ms"]
+
+
+# 25. translate stream - under ASGI the first event is sent before the model is done
+@pytest.mark.django_db(transaction=True)
+@override_settings(TRANSLATION_REQUIRES_AUTH=False)
+def test_translate_stream_asgi_not_buffered(asgi_post, create_languages):
+    english, spanish, rapanui, french = create_languages
+    first_sent = threading.Event()
+    sent_before_done = []
+
+    def slow_stream(*args):
+        yield {"dst_text": "Io", "model_name": "test-model", "model_version": "v1"}
+        # a buffered response would only be sent once this generator ends
+        sent_before_done.append(first_sent.wait(timeout=5))
+        yield {"dst_text": "Iorana", "model_name": "test-model", "model_version": "v1"}
+
+    with patch("main.views.translate_stream", side_effect=slow_stream):
+        status, chunks = asgi_post(
+            "/api/translate/stream/",
+            {
+                "src_text": "Hola",
+                "src_lang": LanguageSerializer(spanish).data,
+                "dst_lang": LanguageSerializer(rapanui).data,
+            },
+            on_body=lambda chunk: first_sent.set(),
+        )
+
+    assert status == 200
+    assert sent_before_done == [True]
+    events = _parse_events(b"".join(chunks).decode("utf-8"))
+    assert events[0] == ("message", {"dst_text": "Io"})
+    assert events[-1][0] == "done"
@@ -0,0 +1,106 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+from django.test import override_settings
+from fixtures import api_client, create_languages, mock_get_prediction
+from main.models import TranslationMemory, TranslationPair
+from main.serializers import LanguageSerializer
+from main.views import TranslateViewSet
+
+
+def translate(api_client, src_text, src_lang, dst_lang):
+    return api_client.post(
+        "/api/translate/",
+        {
+            "src_text": src_text,
+            "src_lang": LanguageSerializer(src_lang).data,
+            "dst_lang": LanguageSerializer(dst_lang).data,
+        },
+        format="json",
+    )
+
+
+# 1. validated pairs are found in both directions, ignoring case and spacing only
+@pytest.mark.django_db
+@override_settings(TRANSLATION_REQUIRES_AUTH=False)
+def test_translation_memory_hit(api_client, create_languages, mock_get_prediction):
+    english, spanish, rapanui, french = create_languages
+    TranslationPair.objects.create(
+        src_text="¿Cómo estás?",
+        dst_text="Pēhē koe?",
+        src_lang=spanish,
+        dst_lang=rapanui,
+        correct=True,
+        validated=True,
+    )
+
+    forward = translate(api_client, "¿CÓMO  estás?", spanish, rapanui)
+    backward = translate(api_client, "pēhē KOE?", rapanui, spanish)
+    other_language = translate(api_client, "¿Cómo estás?", spanish, french)
+    no_accents = translate(api_client, "¿Como estas?", spanish, rapanui)
+    no_punctuation = translate(api_client, "Pēhē koe", rapanui, spanish)
+
+    assert forward.data["dst_text"] == "Pēhē koe?"
+    assert backward.data["dst_text"] == "¿Cómo estás?"
+    assert other_language.data["dst_text"] == "Bonjour"
+    # accents and punctuation tell texts apart, so these reach the model
+    assert no_accents.data["dst_text"] == "Iorana"
+    assert no_punctuation.data["dst_text"] == "Hola"
+
+
+# 2. pairs only enter the memory once validated as correct, and leave it if not
+@pytest.mark.django_db
+def test_translation_memory_follows_validation(create_languages):
+    english, spanish, rapanui, french = create_languages
+    pair = TranslationPair.objects.create(
+        src_text="Hola", dst_text="Iorana", src_lang=spanish, dst_lang=rapanui
+    )
+    assert not TranslationMemory.objects.exists()
+
+    pair.correct, pair.validated = True, True
+    pair.save()
+    assert TranslationMemory.objects.count() == 2
+
+    pair.dst_text = "Iorana koe"
+    pair.save()
+    assert set(TranslationMemory.objects.values_list("dst_text", flat=True)) == {
+        "Hola",
+        "Iorana koe",
+    }
+
+    pair.correct = False
+    pair.save()
+    assert not TranslationMemory.objects.exists()
+
+
+# 3. the newest validated translation is returned with a single query
+@pytest.mark.django_db
+def test_translation_memory_single_query(create_languages, django_assert_num_queries):
+    english, spanish, rapanui, french = create_languages
+    for dst_text in ["Iorana", "Iorana koe"]:
+        TranslationPair.objects.create(
+            src_text="Hola",
+            dst_text=dst_text,
+            src_lang=spanish,
+            dst_lang=rapanui,
+            correct=True,
+            validated=True,
+            model_name="nllb",
+        )
+
+    with django_assert_num_queries(1):
+        result = TranslateViewSet().lookup_cache(spanish, rapanui, " HOLA ")
+
+    assert result == ("Iorana koe", rapanui, ("nllb", None))
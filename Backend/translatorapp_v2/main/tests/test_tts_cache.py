@@ -0,0 +1,214 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from datetime import timedelta
+from importlib import import_module
+from unittest.mock import patch
+
+import pytest
+from django.apps import apps
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.utils import timezone
+from fixtures import api_client, create_languages
+from main import tts_cache
+from main.models import CacheTTS
+from main.utils import find_cached_tts_normalized
+
+
+@pytest.fixture(autouse=True)
+def clear_sketch():
+    tts_cache.clear()
+    yield
+    tts_cache.clear()
+
+
+@pytest.fixture
+def write_through(settings):
+    settings.TTS_CACHE_WRITE_THROUGH = True
+    settings.TTS_CACHE_ADMIT_AFTER = 2
+    return settings
+
+
+def cache(text, language, gender="female", **fields):
+    cached = CacheTTS(text=text, language=language, gender=gender, **fields)
+    cached.set_waveform([0.0])
+    cached.save()
+    return cached
+
+
+# 1. lookups ignore case, diacritics and punctuation, in one query
+@pytest.mark.django_db
+def test_find_cached_tts_normalized(create_languages, django_assert_num_queries):
+    english, spanish, rapanui, french = create_languages
+    cached = cache("¿Pehē koe?", rapanui)
+
+    assert cached.normalized_text == "pehe koe"
+    with django_assert_num_queries(1):
+        assert find_cached_tts_normalized(rapanui, "pehe  KOE") == cached
+    assert find_cached_tts_normalized(rapanui, "pehe koe", gender="male") is None
+    assert find_cached_tts_normalized(spanish, "pehe koe") is None
+    assert find_cached_tts_normalized(rapanui, "?!") is None
+
+
+# 2. texts with the same normalized form cannot be cached twice
+@pytest.mark.django_db
+def test_normalized_hash_is_unique(create_languages):
+    english, spanish, rapanui, french = create_languages
+    cache("Iorana", rapanui)
+    cache("Iorana", rapanui, gender="male")
+
+    with pytest.raises(IntegrityError):
+        cache("iorana!", rapanui)
+
+
+# 3. the backfill fills rows without a key and never deletes colliding rows
+@pytest.mark.django_db
+def test_backfill_normalized_text(create_languages):
+    english, spanish, rapanui, french = create_languages
+    older = cache("Iorana", rapanui)
+    newer = cache("Maururu", rapanui)
+    other = cache("Hola", spanish)
+    CacheTTS.objects.filter(id=older.id).update(normalized_hash=None)
+    CacheTTS.objects.filter(id=newer.id).update(text="iorana!", normalized_hash=None)
+    CacheTTS.objects.filter(id=other.id).update(normalized_text="", normalized_hash=None)
+
+    call_command("backfillTTSNormalizedText", "--dry-run")
+    assert CacheTTS.objects.filter(normalized_hash=None).count() == 3
+
+    call_command("backfillTTSNormalizedText")
+
+    assert CacheTTS.objects.count() == 3
+    assert CacheTTS.objects.get(id=older.id).normalized_hash is None
+    assert find_cached_tts_normalized(rapanui, "Iorana").id == older.id
+    assert find_cached_tts_normalized(rapanui, "IORANA!").id == newer.id
+    assert find_cached_tts_normalized(spanish, "hola").normalized_text == "hola"
+
+
+# 4. the sketch never undercounts and halves its counters to forget old keys
+def test_count_min_sketch():
+    sketch = tts_cache.CountMinSketch(width=64, depth=4, reset_after=100)
+    counts = [sketch.add("iorana") for _ in range(10)]
+    for i in range(50):
+        sketch.add(f"key {i}")
+
+    assert counts == list(range(1, 11))
+    assert sketch.add("iorana") >= 11
+    for i in range(39):
+        sketch.add(f"other {i}")
+    assert sketch.add("iorana") <= 11
+
+
+def speak(api_client, text="Iorana"):
+    return api_client.post(
+        "/api/text-to-speech/",
+        {
+            "text": text,
+            "language": "rap_Latn",
+            "gender": "female",
+            "model_name": "tts",
+            "model_version": "1",
+        },
+        format="json",
+    )
+
+
+# 5. generated audio is stored once the phrase missed enough times, if enabled
+@pytest.mark.django_db
+def test_write_through(api_client, create_languages, settings):
+    def generate(text, lang_code):
+        return {"waveform": [0.5, -0.5], "model_name": "tts", "model_version": "1"}
+
+    with patch("main.views.generate_tts", side_effect=generate) as mock_tts:
+        speak(api_client)
+        speak(api_client)
+        assert not CacheTTS.objects.exists()
+
+        settings.TTS_CACHE_WRITE_THROUGH = True
+        settings.TTS_CACHE_ADMIT_AFTER = 2
+        speak(api_client)
+        assert not CacheTTS.objects.exists()
+        speak(api_client, "iorana!")
+        response = speak(api_client)
+
+    assert mock_tts.call_count == 4
+    assert response.data["model_name"] == "tts"
+    cached = CacheTTS.objects.get()
+    assert (cached.text, cached.source, cached.num_samples) == ("iorana!", "auto", 2)
+    assert cached.last_hit_at is not None
+
+
+# 6. auto rows expire and the least recently hit are evicted, curated rows never
+@pytest.mark.django_db
+def test_eviction(create_languages, write_through):
+    english, spanish, rapanui, french = create_languages
+    write_through.TTS_CACHE_MAX_ENTRIES = 2
+    now = timezone.now()
+    curated = cache("Maururu", rapanui, created_at=now - timedelta(days=365))
+    old = cache("Ka oho", rapanui, source="auto", last_hit_at=now - timedelta(hours=2))
+    hit = cache("Pehē koe", rapanui, source="auto", last_hit_at=now)
+    expired = cache(
+        "Iorana koe", rapanui, source="auto", created_at=now - timedelta(days=31)
+    )
+
+    assert tts_cache.get(rapanui, "iorana koe") is None
+    assert tts_cache.get(rapanui, "maururu") == curated
+    for _ in range(2):
+        tts_cache.record_miss(rapanui, "female", "Iorana koe", [0.1])
+
+    remaining = set(CacheTTS.objects.values_list("text", flat=True))
+    assert remaining == {"Maururu", "Pehē koe", "Iorana koe"}
+    assert CacheTTS.objects.get(text="Iorana koe").id != expired.id
+    assert not CacheTTS.objects.filter(id=old.id).exists()
+    assert CacheTTS.objects.get(id=hit.id).source == "auto"
+
+
+# 7. words told apart only by a glottal stop keep their own audio
+@pytest.mark.django_db
+def test_backfill_keeps_glottal_stops(create_languages):
+    english, spanish, rapanui, french = create_languages
+    curated = cache("Xiorana", rapanui)
+    CacheTTS.objects.filter(id=curated.id).update(text="'Iorana", normalized_hash=None)
+    auto = cache("Iorana", rapanui, source="auto")
+
+    call_command("backfillTTSNormalizedText")
+
+    assert CacheTTS.objects.filter(id__in=[curated.id, auto.id]).count() == 2
+    assert find_cached_tts_normalized(rapanui, "'Iorana").id == curated.id
+    assert find_cached_tts_normalized(rapanui, "'iorana").id == curated.id
+    assert find_cached_tts_normalized(rapanui, "Iorana").id == auto.id
+
+
+# 8. the migration fills the key of rows cached before it existed, deleting none
+@pytest.mark.django_db
+def test_migration_backfills_normalized_hash(create_languages):
+    english, spanish, rapanui, french = create_languages
+    older = cache("Iorana", rapanui)
+    newer = cache("iorana!", rapanui, gender="male")
+    curated = cache("maururu.", rapanui, gender="male")
+    auto = cache("Maururu", rapanui, source="auto")
+    CacheTTS.objects.filter(id__in=[older.id, newer.id, curated.id]).update(
+        gender="female", normalized_text="", normalized_hash=None
+    )
+
+    migration = import_module("main.migrations.0066_backfill_cachetts_normalized_hash")
+    migration.fill_normalized_hash(apps, None)
+
+    assert CacheTTS.objects.count() == 4
+    assert CacheTTS.objects.get(id=newer.id).normalized_text == "iorana"
+    assert CacheTTS.objects.filter(normalized_hash=None).count() == 2
+    assert find_cached_tts_normalized(rapanui, "Iorana").id == older.id
+    assert find_cached_tts_normalized(rapanui, "¡IORANA!").id == newer.id
+    assert find_cached_tts_normalized(rapanui, "Maururu").id == auto.id
+    assert find_cached_tts_normalized(rapanui, "maururu.").id == curated.id
@@ -0,0 +1,211 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import threading
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from asgiref.sync import async_to_sync
+from fixtures import api_client, asgi_post, create_languages
+from main import tts_cache
+from main.models import CacheTTS, TextToSpeechAudio
+from main.utils import split_sentences
+
+
+def synthesize(text, lang_code):
+    # one sample per character, so each chunk can be traced back to its sentence
+    return {
+        "waveform": [len(text) / 100] * len(text),
+        "model_name": "tts",
+        "model_version": "1",
+    }
+
+
+def read_stream(response):
+    """Body of a streaming response, read asynchronously as the ASGI server does."""
+
+    async def read():
+        return b"".join([chunk async for chunk in response])
+
+    return async_to_sync(read)()
+
+
+def stream(api_client, text, gender="male"):
+    return api_client.post(
+        "/api/text-to-speech/stream/",
+        {
+            "text": text,
+            "language": "rap_Latn",
+            "gender": gender,
+            "model_name": "tts",
+            "model_version": "1",
+        },
+        format="json",
+    )
+
+
+# 1. texts are split at sentence ends and line breaks, without empty sentences
+def test_split_sentences():
+    assert split_sentences("Iorana. ¿Pehē koe?\nMaururu !") == [
+        "Iorana.",
+        "¿Pehē koe?",
+        "Maururu !",
+    ]
+    assert split_sentences("...") == ["..."]
+
+
+# 2. every sentence is sent as a PCM16 chunk as soon as it is synthesized
+@pytest.mark.django_db
+def test_text_to_speech_stream(api_client, create_languages):
+    with patch("main.utils.generate_tts", side_effect=synthesize) as mock_tts:
+        response = stream(api_client, "Iorana koe. Maururu")
+        assert response.status_code == 200
+        assert response["Content-Type"] == "audio/L16;rate=16000"
+        assert response["X-Sampling-Rate"] == "16000"
+
+        async def read():
+            chunks = aiter(response)
+            first = await anext(chunks)
+            calls = mock_tts.call_count
+            return first, calls, b"".join([chunk async for chunk in chunks])
+
+        first, calls, rest = async_to_sync(read)()
+        assert calls == 1
+
+    assert [c.args for c in mock_tts.call_args_list] == [
+        ("Iorana koe.", "rap_male"),
+        ("Maururu", "rap_male"),
+    ]
+    assert np.frombuffer(first, dtype="<i2").tolist() == [3604] * 11
+    assert np.frombuffer(rest, dtype="<i2").tolist() == [2293] * 7
+    audio = TextToSpeechAudio.objects.get()
+    assert (audio.text, audio.model_name) == ("Iorana koe. Maururu", "tts")
+
+
+# 3. cached audio is streamed as stored, without calling the model
+@pytest.mark.django_db
+def test_text_to_speech_stream_cache_hit(api_client, create_languages):
+    english, spanish, rapanui, french = create_languages
+    cached = CacheTTS(text="Iorana", language=rapanui, gender="female")
+    cached.set_waveform([0.5, -0.5, 2.0], sampling_rate=22050)
+    cached.save()
+
+    with patch("main.utils.generate_tts") as mock_tts:
+        response = stream(api_client, "iorana", gender="female")
+        content = read_stream(response)
+
+    mock_tts.assert_not_called()
+    assert response["X-Sampling-Rate"] == "22050"
+    assert np.frombuffer(content, dtype="<i2").tolist() == [16383, -16383, 32767]
+    assert TextToSpeechAudio.objects.get().model_name == "tts"
+
+
+# 4. cached PCM16 is returned as a float waveform by the non streaming endpoint
+@pytest.mark.django_db
+def test_text_to_speech_cache_hit_waveform(api_client, create_languages):
+    english, spanish, rapanui, french = create_languages
+    cached = CacheTTS(text="Iorana", language=rapanui, gender="female")
+    cached.set_waveform([0.5, -0.5, 0.0])
+    cached.save()
+
+    with patch("main.utils.generate_tts") as mock_tts:
+        response = api_client.post(
+            "/api/text-to-speech/",
+            {
+                "text": "Iorana",
+                "language": "rap_Latn",
+                "gender": "female",
+                "model_name": "tts",
+                "model_version": "1",
+            },
+            format="json",
+        )
+
+    mock_tts.assert_not_called()
+    cached = CacheTTS.objects.get()
+    assert (cached.audio_format, cached.num_samples) == ("pcm16", 3)
+    assert np.allclose(response.data["waveform"], [0.5, -0.5, 0.0], atol=1e-4)
+
+
+# 5. under ASGI the first sentence is sent before the next one is synthesized
+@pytest.mark.django_db(transaction=True)
+def test_text_to_speech_stream_asgi_not_buffered(asgi_post, create_languages):
+    first_sent = threading.Event()
+    sent_before_done = []
+
+    def slow_synthesize(text, lang_code):
+        if text == "Maururu":
+            # a buffered response would only be sent once every sentence is done
+            sent_before_done.append(first_sent.wait(timeout=5))
+        return synthesize(text, lang_code)
+
+    with patch("main.utils.generate_tts", side_effect=slow_synthesize):
+        status, chunks = asgi_post(
+            "/api/text-to-speech/stream/",
+            {
+                "text": "Iorana koe. Maururu",
+                "language": "rap_Latn",
+                "gender": "male",
+                "model_name": "tts",
+                "model_version": "1",
+            },
+            on_body=lambda chunk: first_sent.set(),
+        )
+
+    assert status == 200
+    assert sent_before_done == [True]
+    assert len(chunks) == 2
+
+
+# 6. generated audio is cached by a background thread once the stream is sent
+@pytest.mark.django_db(transaction=True)
+def test_text_to_speech_stream_write_through(api_client, create_languages, settings):
+    settings.TTS_CACHE_WRITE_THROUGH = True
+    settings.TTS_CACHE_ADMIT_AFTER = 1
+    stream_read = threading.Event()
+    read_before_admit = []
+    admit = tts_cache.admit
+
+    def slow_admit(*args):
+        # admitting in the stream would keep it open until this times out
+        read_before_admit.append(stream_read.wait(timeout=5))
+        return admit(*args)
+
+    with patch("main.utils.generate_tts", side_effect=synthesize), patch.object(
+        tts_cache, "admit", side_effect=slow_admit
+    ):
+        content = read_stream(stream(api_client, "Iorana koe. Maururu"))
+        stream_read.set()
+        tts_cache.shutdown()
+    tts_cache.clear()
+
+    assert read_before_admit == [True]
+    cached = CacheTTS.objects.get()
+    assert (cached.source, cached.num_samples) == ("auto", len(content) // 2)
+
+
+# 7. a stream without chunks is closed without caching anything
+@pytest.mark.django_db
+def test_text_to_speech_stream_empty(api_client, create_languages, settings):
+    settings.TTS_CACHE_WRITE_THROUGH = True
+    settings.TTS_CACHE_ADMIT_AFTER = 1
+
+    with patch("main.views.generate_tts_stream", return_value=iter([])):
+        content = read_stream(stream(api_client, "Iorana"))
+    tts_cache.clear()
+
+    assert content == b""
+    assert not CacheTTS.objects.exists()
+    assert TextToSpeechAudio.objects.get().model_name == "tts"
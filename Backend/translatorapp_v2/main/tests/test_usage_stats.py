@@ -0,0 +1,143 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from datetime import datetime, timezone
+
+import pytest
+from django.core.management import call_command
+from django.test import override_settings
+from fixtures import (admin_auth, api_client, create_languages, mock_get_prediction,
+                      user, user_auth)
+from main.models import TranslationRequest, TranslationUsage
+from main.serializers import LanguageSerializer
+
+
+def usage(period):
+    return sorted(
+        TranslationUsage.objects.filter(period=period).values_list(
+            "src_lang", "dst_lang", "model_name", "from_cache", "authenticated", "count"
+        )
+    )
+
+
+# 1. usage stats - logged translations are added to the hourly and daily rollups
+@pytest.mark.django_db
+@override_settings(TRANSLATION_REQUIRES_AUTH=False)
+def test_usage_stats_logged(api_client, create_languages, mock_get_prediction):
+    english, spanish, rapanui, french = create_languages
+
+    for request_id in ["a", "a", "b"]:
+        response = api_client.post(
+            "/api/translate/",
+            {
+                "src_text": "Hola",
+                "src_lang": LanguageSerializer(spanish).data,
+                "dst_lang": LanguageSerializer(rapanui).data,
+                "request_id": request_id,
+            },
+            format="json",
+        )
+        assert response.status_code == 200
+
+    expected = [("spa_Latn", "rap_Latn", "NativeModel", False, False, 2)]
+    assert usage(TranslationUsage.HOUR) == expected
+    assert usage(TranslationUsage.DAY) == expected
+    hour = TranslationUsage.objects.get(period=TranslationUsage.HOUR)
+    created_at = TranslationRequest.objects.first().created_at
+    assert hour.period_start == created_at.replace(minute=0, second=0, microsecond=0)
+
+
+# 2. usage stats - the rollups are recomputed from the logged requests
+@pytest.mark.django_db
+def test_rollup_translation_usage(create_languages, user):
+    english, spanish, rapanui, french = create_languages
+    TranslationUsage.objects.create(
+        period=TranslationUsage.DAY,
+        period_start=datetime(2026, 10, 1, tzinfo=timezone.utc),
+        from_cache=False,
+        authenticated=False,
+        count=99,
+    )
+    for hour, from_cache, request_user in [
+        (9, False, None),
+        (9, True, None),
+        (9, True, None),
+        (15, True, user),
+    ]:
+        TranslationRequest.objects.create(
+            src_text="Hola",
+            dst_text="Iorana",
+            src_lang=spanish,
+            dst_lang=rapanui,
+            user=request_user,
+            model_name="NativeModel",
+            model_version="V1",
+            from_cache=from_cache,
+            created_at=datetime(2026, 10, 1, hour, 30, tzinfo=timezone.utc),
+        )
+
+    for _ in range(2):
+        call_command("rollupTranslationUsage", "--until", "2026-10-02")
+
+    assert usage(TranslationUsage.DAY) == [
+        ("spa_Latn", "rap_Latn", "NativeModel", False, False, 1),
+        ("spa_Latn", "rap_Latn", "NativeModel", True, False, 2),
+        ("spa_Latn", "rap_Latn", "NativeModel", True, True, 1),
+    ]
+    assert sorted(
+        TranslationUsage.objects.filter(period=TranslationUsage.HOUR).values_list(
+            "period_start__hour", "count"
+        )
+    ) == [(9, 1), (9, 2), (15, 1)]
+
+
+# 3. usage stats - admins read the statistics from the rollups
+@pytest.mark.django_db
+def test_usage_stats_endpoint(api_client, admin_auth):
+    for day, src_lang, from_cache, count in [
+        (1, "spa_Latn", False, 5),
+        (1, "spa_Latn", True, 3),
+        (2, "rap_Latn", False, 4),
+        (9, "spa_Latn", False, 7),
+    ]:
+        TranslationUsage.objects.create(
+            period=TranslationUsage.DAY,
+            period_start=datetime(2026, 10, day, tzinfo=timezone.utc),
+            src_lang=src_lang,
+            from_cache=from_cache,
+            authenticated=False,
+            count=count,
+        )
+
+    url = "/api/translation-requests/stats/"
+    response = api_client.get(url, {"since": "2026-10-01", "until": "2026-10-05"})
+    assert response.status_code == 200
+    assert response.data["total"] == 12
+    assert response.data["from_cache"] == 3
+    assert [row["count"] for row in response.data["results"]] == [5, 3, 4]
+
+    response = api_client.get(
+        url, {"since": "2026-10-01", "until": "2026-10-05", "src_lang": "spa_Latn"}
+    )
+    assert response.data["total"] == 8
+
+    response = api_client.get(url, {"period": "week"})
+    assert response.status_code == 400
+
+
+# 4. usage stats - other users cannot read the statistics
+@pytest.mark.django_db
+def test_usage_stats_endpoint_forbidden(api_client, user_auth):
+    response = api_client.get("/api/translation-requests/stats/")
+    assert response.status_code == 403
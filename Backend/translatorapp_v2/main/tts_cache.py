@@ -0,0 +1,234 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Write-through of generated TTS audio into CacheTTS, for phrases requested often.
+Misses are counted in a count-min sketch, and the audio of a phrase is stored
+once it has missed TTS_CACHE_ADMIT_AFTER times. Stored rows are marked as auto,
+expire after TTS_CACHE_TTL_DAYS and the least recently hit ones are evicted past
+TTS_CACHE_MAX_ENTRIES. Curated rows are never evicted.
+
+The sketch is kept per process, so with several workers a phrase may need up to
+TTS_CACHE_ADMIT_AFTER misses in each of them before it is stored. Streamed audio
+is stored by a background thread, so the stream does not wait for the write and
+the eviction that follows it.
+"""
+
+import atexit
+import hashlib
+import logging
+import queue
+import threading
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import CacheTTS
+from .normalization import normalize_text_for_cache, normalized_hash
+from .utils import find_cached_tts_normalized
+
+logger = logging.getLogger(__name__)
+
+# hits update last_hit_at at most this often, so hits rarely write
+TOUCH_INTERVAL = timedelta(minutes=1)
+
+
+class CountMinSketch:
+    """
+    Approximate counts of keys in `depth` rows of `width` counters. Estimates
+    never undercount; all counters are halved every `reset_after` additions, so
+    phrases that were popular a long time ago fade out.
+    """
+
+    def __init__(self, width, depth=4, reset_after=None):
+        self.width = width
+        self.depth = depth
+        self.reset_after = reset_after or 10 * width
+        self._counters = np.zeros((depth, width), dtype=np.uint32)
+        self._additions = 0
+        self._lock = threading.Lock()
+
+    def _indexes(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8 * self.depth)
+        return np.frombuffer(digest.digest(), dtype=np.uint64) % self.width
+
+    def add(self, key):
+        """Counts `key` once more and returns its estimated count."""
+        indexes = self._indexes(key)
+        rows = np.arange(self.depth)
+        with self._lock:
+            self._counters[rows, indexes] += 1
+            estimate = int(self._counters[rows, indexes].min())
+            self._additions += 1
+            if self._additions >= self.reset_after:
+                self._counters >>= 1
+                self._additions = 0
+        return estimate
+
+    def clear(self):
+        with self._lock:
+            self._counters[:] = 0
+            self._additions = 0
+
+
+_sketch = CountMinSketch(settings.TTS_CACHE_SKETCH_WIDTH)
+
+
+def _expiry():
+    return timezone.now() - timedelta(days=settings.TTS_CACHE_TTL_DAYS)
+
+
+def get(lang_obj, text, gender="female"):
+    """
+    Returns the CacheTTS of `text`, or `None` if there is none or it is an expired
+    auto row. Hits of auto rows are recorded for the least recently used eviction.
+    """
+    cached = find_cached_tts_normalized(lang_obj, text, gender=gender)
+    if cached is None or cached.source != CacheTTS.AUTO:
+        return cached
+    if cached.created_at < _expiry():
+        return None
+
+    now = timezone.now()
+    if cached.last_hit_at is None or now - cached.last_hit_at >= TOUCH_INTERVAL:
+        CacheTTS.objects.filter(id=cached.id).update(last_hit_at=now)
+    return cached
+
+
+def count_miss(lang_obj, gender, text):
+    """Counts a miss of `text` and returns whether its audio should be stored."""
+    if not settings.TTS_CACHE_WRITE_THROUGH:
+        return False
+    text_hash = normalized_hash(normalize_text_for_cache(text))
+    if text_hash is None:
+        return False
+
+    misses = _sketch.add(f"{lang_obj.id}:{gender}:{text_hash}")
+    return misses >= settings.TTS_CACHE_ADMIT_AFTER
+
+
+def record_miss(lang_obj, gender, text, waveform, sampling_rate=None):
+    """
+    Counts a miss of `text` and stores the generated `waveform` once the text is
+    popular enough. Returns the stored CacheTTS, or `None`.
+    """
+    if not count_miss(lang_obj, gender, text):
+        return None
+    return admit(lang_obj, gender, text, waveform, sampling_rate)
+
+
+def admit(lang_obj, gender, text, waveform, sampling_rate=None):
+    """
+    Stores the generated `waveform` of `text` as an auto row and evicts the rows
+    over the limit. Returns the stored CacheTTS, or `None` if it was already cached.
+    """
+    text_hash = normalized_hash(normalize_text_for_cache(text))
+    cached = CacheTTS(
+        text=text,
+        language=lang_obj,
+        gender=gender,
+        source=CacheTTS.AUTO,
+        last_hit_at=timezone.now(),
+    )
+    cached.set_waveform(waveform, sampling_rate or settings.TTS_SAMPLING_RATE)
+    try:
+        with transaction.atomic():
+            # an expired row of the same text is replaced
+            CacheTTS.objects.filter(
+                language=lang_obj,
+                gender=gender,
+                normalized_hash=text_hash,
+                source=CacheTTS.AUTO,
+                created_at__lt=_expiry(),
+            ).delete()
+            cached.save()
+    except IntegrityError:
+        # stored by another worker in the meantime, or a curated row exists
+        logger.debug("TTS audio already cached")
+        return None
+    logger.info("Cached TTS audio")
+    evict()
+    return cached
+
+
+def evict():
+    """Deletes expired auto rows and the least recently hit ones over the limit."""
+    auto = CacheTTS.objects.filter(source=CacheTTS.AUTO)
+    expired, _ = auto.filter(created_at__lt=_expiry()).delete()
+
+    excess = auto.count() - settings.TTS_CACHE_MAX_ENTRIES
+    evicted = 0
+    if excess > 0:
+        ids = list(auto.order_by("last_hit_at").values_list("id", flat=True)[:excess])
+        evicted, _ = CacheTTS.objects.filter(id__in=ids).delete()
+    if expired or evicted:
+        logger.info(f"Evicted {expired} expired and {evicted} TTS cache entries")
+
+
+_STOP = object()
+
+_admissions = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def admit_later(lang_obj, gender, text, waveform, sampling_rate=None):
+    """Queues `admit` for the background thread."""
+    _start_worker()
+    _admissions.put((lang_obj, gender, text, waveform, sampling_rate))
+
+
+def _run():
+    while True:
+        item = _admissions.get()
+        if item is _STOP:
+            break
+        try:
+            admit(*item)
+        except Exception as e:
+            logger.error(f"Failed to cache TTS audio: {e}")
+    connection.close()
+
+
+def _start_worker():
+    global _worker
+    with _worker_lock:
+        # also restarted in a forked process, where the thread does not exist
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(
+                target=_run, name="tts-cache-admission", daemon=True
+            )
+            _worker.start()
+
+
+def shutdown(timeout=None):
+    """Stores the queued audio and stops the worker."""
+    global _worker
+    with _worker_lock:
+        worker, _worker = _worker, None
+    if worker is None or not worker.is_alive():
+        return
+    _admissions.put(_STOP)
+    worker.join(timeout)
+
+
+atexit.register(shutdown, timeout=30)
+
+
+def clear():
+    _sketch.clear()
@@ -0,0 +1,93 @@
+# Copyright 2024 Centro Nacional de Inteligencia Artificial (CENIA, Chile).
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Hourly and daily counts of translation requests in TranslationUsage, so usage
+statistics are read from a few rollup rows instead of scanning TranslationRequest.
+Logged requests are added to the counters of their buckets with one upsert.
+"""
+
+from collections import Counter
+from datetime import timedelta
+from datetime import timezone as dt_timezone
+
+from django.db import connection
+
+from .models import TranslationUsage
+
+DIMENSIONS = [
+    "src_lang",
+    "dst_lang",
+    "model_name",
+    "model_version",
+    "from_cache",
+    "authenticated",
+]
+
+# range of the statistics when none is requested
+DEFAULT_RANGE = {
+    TranslationUsage.HOUR: timedelta(hours=48),
+    TranslationUsage.DAY: timedelta(days=30),
+}
+
+UPSERT_SQL = """
+    INSERT INTO {table} (period, period_start, {dimensions}, count)
+    VALUES {values}
+    ON CONFLICT (period, period_start, {dimensions})
+    DO UPDATE SET count = {table}.count + EXCLUDED.count
+"""
+
+
+def period_start(period, moment):
+    """Start of the UTC hour or day of `moment`."""
+    start = moment.astimezone(dt_timezone.utc).replace(
+        minute=0, second=0, microsecond=0
+    )
+    if period == TranslationUsage.DAY:
+        start = start.replace(hour=0)
+    return start
+
+
+def dimensions(request):
+    """Values of the rollup dimensions of a TranslationRequest."""
+    return (
+        request.src_lang.code if request.src_lang else "",
+        request.dst_lang.code if request.dst_lang else "",
+        request.model_name or "",
+        request.model_version or "",
+        request.from_cache,
+        request.user_id is not None,
+    )
+
+
+def record(requests):
+    """Adds `requests`, TranslationRequest rows just stored, to the rollups."""
+    counts = Counter(
+        (period, period_start(period, request.created_at), *dimensions(request))
+        for request in requests
+        for period, _ in TranslationUsage.PERIODS
+    )
+    if not counts:
+        return
+
+    sql = UPSERT_SQL.format(
+        table=TranslationUsage._meta.db_table,
+        dimensions=", ".join(DIMENSIONS),
+        values=", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(counts)),
+    )
+    # in a fixed order, so concurrent upserts lock the rows in the same order
+    params = [value for key, count in sorted(counts.items()) for value in (*key, count)]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
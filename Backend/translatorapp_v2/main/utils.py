@@ -14,51 +14,32 @@
 # limitations under the License.
 
 import hashlib
-import io
 import json
 import logging
 import re
-import unicodedata
+import time
 from datetime import datetime, timezone
 from functools import reduce
 from operator import or_
 from pathlib import Path
 
-import ffmpeg
 import numpy as np
-import requests
-import soundfile as sf
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.core.mail import EmailMultiAlternatives, send_mail
-from django.db.models import Q
+from django.db.models import Case, Q, Value, When
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
+from rest_framework.utils.encoders import JSONEncoder
 
+from . import asr_cache, inference_client, kserve
+from .audio import decode_audio
 from .models import CacheTTS, Word
+from .normalization import normalize_text_for_cache, normalized_hash
 
 logger = logging.getLogger(__name__)
 
 
-def filter_cache(src_lang, dst_lang, cache_results):
-    # standarized_query = standarize_text(user_query) NOT SURE WHY THIS IS NECESSARY
-    # verify if match is correct
-    for result in cache_results:  # from newest to oldest
-        # check match in user requested source lang to avoid duplicates
-        if (
-            src_lang.code == result.src_lang.code
-            or src_lang.code == result.dst_lang.code
-        ):
-            # the user requested dst text language guides the translation
-            if dst_lang.code == result.dst_lang.code:
-                return result.dst_text, result.dst_lang
-            else:
-                return result.src_text, result.src_lang
-        else:
-            continue
-
-    return None, None
-
-
 def generate_payload(text, source_lang, target_lang):
     payload = {
         "id": "0",
@@ -88,7 +69,7 @@ def generate_payload(text, source_lang, target_lang):
 
 def get_prediction(src_text, src_lang, dst_lang, deployment):
     payload = generate_payload(src_text, src_lang, dst_lang)
-    response = requests.post(url=deployment, data=json.dumps(payload))
+    response = inference_client.post(url=deployment, data=json.dumps(payload))
     response = response.json()
 
     # Process the response
@@ -129,6 +110,27 @@ def translate(src_text, src_lang, dst_lang):
     logger.debug(f"Src text paragraphs: {src_text_paragraphs}")
     logger.debug(f"Native deployment: {native_deployment}")
     logger.debug(f"Raw deployment: {raw_deployment}")
+    is_pivot = (src_lang.is_native and dst_lang.code != "spa_Latn") or (
+        src_lang.code != "spa_Latn" and dst_lang.is_native
+    )
+    start = time.perf_counter()
+    if is_pivot and settings.APP_SETTINGS.pivot_inference_model_name:
+        # both hops run in the model server, in a single call
+        pivot_deployment = (
+            f"{settings.APP_SETTINGS.pivot_inference_model_url}/v2/models/"
+            f"{settings.APP_SETTINGS.pivot_inference_model_name}/infer"
+        )
+        translation, model_name, model_version = get_prediction(
+            src_text, src_lang.code, dst_lang.code, deployment=pivot_deployment
+        )
+        logger.debug(f"{src_lang.code} -> spa_Latn -> {dst_lang.code} - {translation}")
+        return {
+            "dst_text": translation,
+            "model_name": model_name,
+            "model_version": model_version,
+            "pivot_latency_ms": (time.perf_counter() - start) * 1000,
+        }
+
     if src_lang.is_native and dst_lang.code != "spa_Latn":
         try:
             first_translation, model_name, model_version = get_prediction(
@@ -159,6 +161,7 @@ def translate(src_text, src_lang, dst_lang):
             "dst_text": final_translation,
             "model_name": model_name,
             "model_version": model_version,
+            "pivot_latency_ms": (time.perf_counter() - start) * 1000,
         }
 
     elif src_lang.code != "spa_Latn" and dst_lang.is_native:
@@ -195,6 +198,7 @@ def translate(src_text, src_lang, dst_lang):
             "dst_text": final_translation,
             "model_name": model_name,
             "model_version": model_version,
+            "pivot_latency_ms": (time.perf_counter() - start) * 1000,
         }
 
     elif not src_lang.is_native and not dst_lang.is_native:
@@ -235,36 +239,125 @@ def translate(src_text, src_lang, dst_lang):
         }
 
 
+async def iterate_in_thread(iterator):
+    """
+    Asynchronous iterator over a blocking `iterator`, advanced one item at a time in
+    the sync thread of the request. Under ASGI Django consumes a synchronous
+    streaming response whole before sending it, so streaming views wrap their
+    generators with this to send every item as soon as it is ready.
+    """
+    iterator = iter(iterator)
+    done = object()
+    while True:
+        item = await sync_to_async(next)(iterator, done)
+        if item is done:
+            return
+        yield item
+
+
+def sse_event(data, event=None):
+    """Formats `data` as a Server-Sent Event."""
+    message = f"data: {json.dumps(data, cls=JSONEncoder)}\n\n"
+    return f"event: {event}\n{message}" if event else message
+
+
+def get_prediction_stream(src_text, src_lang, dst_lang, deployment):
+    """
+    Streams a translation from a decoupled model `generate_stream` endpoint.
+    Yields a dict with the partial translation on every response of the model.
+    """
+    payload = {"input_text": src_text, "source_lang": src_lang, "target_lang": dst_lang}
+    with inference_client.post(
+        url=deployment, data=json.dumps(payload), stream=True
+    ) as response:
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = json.loads(line[len("data:") :])
+            if "error" in data:
+                logger.error(f"Error in model prediction: {data['error']}")
+                raise Exception("Error in model prediction")
+            yield {
+                "dst_text": data["translation"],
+                "model_name": data["model_name"],
+                "model_version": data["model_version"],
+            }
+
+
+def translate_stream(src_text, src_lang, dst_lang):
+    """
+    Same routing as `translate`, but the translation is streamed from the last
+    model. When pivoting through spanish the first hop is still a blocking call,
+    and every result has the `pivot_latency_ms` of both hops so far.
+    """
+    native_url = settings.APP_SETTINGS.inference_model_url
+    native_name = settings.APP_SETTINGS.inference_model_name
+    raw_url = settings.APP_SETTINGS.raw_inference_model_url
+    raw_name = settings.APP_SETTINGS.raw_inference_model_name
+
+    def stream_deployment(url, name):
+        return f"{url}/v2/models/{name}-stream/generate_stream"
+
+    start = time.perf_counter()
+    is_pivot = True
+    if src_lang.is_native and dst_lang.code != "spa_Latn":
+        src_text, _, _ = get_prediction(
+            src_text,
+            src_lang=src_lang.code,
+            dst_lang="spa_Latn",
+            deployment=f"{native_url}/v2/models/{native_name}/infer",
+        )
+        src_code, deployment = "spa_Latn", stream_deployment(raw_url, raw_name)
+    elif src_lang.code != "spa_Latn" and dst_lang.is_native:
+        src_text, _, _ = get_prediction(
+            src_text,
+            src_lang=src_lang.code,
+            dst_lang="spa_Latn",
+            deployment=f"{raw_url}/v2/models/{raw_name}/infer",
+        )
+        src_code, deployment = "spa_Latn", stream_deployment(native_url, native_name)
+    elif not src_lang.is_native and not dst_lang.is_native:
+        is_pivot = False
+        src_code, deployment = src_lang.code, stream_deployment(raw_url, raw_name)
+    # src lang or dst lang is native/spanish
+    else:
+        is_pivot = False
+        src_code, deployment = src_lang.code, stream_deployment(native_url, native_name)
+
+    logger.debug(f"Streaming {src_code} -> {dst_lang.code} from {deployment}")
+    for result in get_prediction_stream(src_text, src_code, dst_lang.code, deployment):
+        if is_pivot:
+            result["pivot_latency_ms"] = (time.perf_counter() - start) * 1000
+        yield result
+
+
 def get_tts_prediction(text, lang_code, deployment):
     """
     Send request to TTS model server and get audio waveform.
     """
-    payload = {
-        "id": "0",
-        "inputs": [
-            {
-                "name": "text",
-                "shape": [1, 1],
-                "datatype": "BYTES",
-                "data": [[text]],
-            },
-            {
-                "name": "lang_code",
-                "shape": [1, 1],
-                "datatype": "BYTES",
-                "data": [[lang_code]],
-            },
-        ],
-    }
+    inputs = [
+        {
+            "name": "text",
+            "shape": [1, 1],
+            "datatype": "BYTES",
+            "data": [[text]],
+        },
+        {
+            "name": "lang_code",
+            "shape": [1, 1],
+            "datatype": "BYTES",
+            "data": [[lang_code]],
+        },
+    ]
+    # the waveform comes back as raw float32 bytes instead of a JSON list
+    body, headers = kserve.encode_request(inputs, binary_outputs=["waveform"])
 
     try:
-        response = requests.post(
-            url=deployment, json=payload, headers={"Content-Type": "application/json"}
-        )
+        response = inference_client.post(url=deployment, data=body, headers=headers)
         if response.status_code != 200:
             logger.error(f"TTS API Error {response.status_code}: {response.text}")
             response.raise_for_status()
-        response = response.json()
+        response = kserve.decode_response(response)
     except Exception as e:
         logger.error(f"TTS API Request failed: {str(e)}")
         raise
@@ -273,7 +366,7 @@ def get_tts_prediction(text, lang_code, deployment):
     if "outputs" in response:
         logger.debug("TTS generation successful")
         return (
-            response["outputs"][0]["data"],  # waveform data
+            np.asarray(response["outputs"][0]["data"]).ravel().tolist(),  # waveform
             response["model_name"],
             response["model_version"],
         )
@@ -343,37 +436,55 @@ def generate_tts(src_text, src_lang):
         raise e
 
 
-def get_asr_prediction(audio_data, sampling_rate, lang_code, deployment):
+# same boundaries the TTS server splits on (Model/speech_models.py)
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;:])\s+|\n+")
 
-    audio_samples = audio_data.astype(np.float32).tolist()
 
-    payload = {
-        "id": "0",
-        "inputs": [
-            {
-                "name": "audio",
-                "shape": [1, len(audio_samples)],
-                "datatype": "FP32",
-                "data": [audio_samples],
-            },
-            {
-                "name": "sampling_rate",
-                "shape": [1, 1],
-                "datatype": "INT32",
-                "data": [[sampling_rate]],
-            },
-            {
-                "name": "lang_code",
-                "shape": [1, 1],
-                "datatype": "BYTES",
-                "data": [[lang_code]],
-            },
-        ],
-    }
+def split_sentences(text):
+    """
+    Splits a text in sentences, dropping the ones without any word (for example a
+    lone punctuation mark), which the model cannot synthesize.
+    """
+    sentences = [s.strip() for s in _SENTENCE_BOUNDARY.split(text)]
+    return [s for s in sentences if re.search(r"\w", s)] or [text]
+
+
+def generate_tts_stream(src_text, src_lang):
+    """
+    Generate text-to-speech audio one sentence at a time, yielding the result of
+    `generate_tts` for each sentence as soon as it is synthesized.
+    """
+    sentences = split_sentences(src_text)
+    logger.debug(f"Streaming TTS of {len(sentences)} sentences")
+    for sentence in sentences:
+        yield generate_tts(sentence, src_lang)
+
+
+def get_asr_prediction(audio_data, sampling_rate, lang_code, deployment):
+
+    inputs = [
+        {
+            "name": "sampling_rate",
+            "shape": [1, 1],
+            "datatype": "INT32",
+            "data": [[sampling_rate]],
+        },
+        {
+            "name": "lang_code",
+            "shape": [1, 1],
+            "datatype": "BYTES",
+            "data": [[lang_code]],
+        },
+    ]
+    # audio is sent as raw float32 bytes instead of a JSON list of floats
+    audio = np.asarray(audio_data, dtype=np.float32).reshape(1, -1)
+    body, headers = kserve.encode_request(
+        inputs, binary_inputs={"audio": ("FP32", audio)}
+    )
 
     logger.debug(f"Sending ASR request to {deployment}")
-    response = requests.post(url=deployment, data=json.dumps(payload))
-    response = response.json()
+    response = inference_client.post(url=deployment, data=body, headers=headers)
+    response = kserve.decode_response(response)
 
     # Process the response
     if "outputs" in response:
@@ -393,22 +504,6 @@ def get_asr_prediction(audio_data, sampling_rate, lang_code, deployment):
         raise Exception("Error in ASR transcription")
 
 
-def _sniff_container(b: bytes) -> str | None:
-    try:
-        if b.startswith(b"OggS"):
-            return "ogg"
-        if b.startswith(b"\x1aE\xdf\xa3") or b[0:64].find(b"webm") != -1:
-            return "webm"
-        if b.startswith(b"RIFF") and b[8:12] == b"WAVE":
-            return "wav"
-        # naive MP4/ISOBMFF check
-        if b[4:8] == b"ftyp":
-            return "mp4"
-    except Exception:
-        pass
-    return None
-
-
 # Add small helpers for debug saving
 def _asr_debug_dir() -> Path:
     base = (
@@ -425,81 +520,45 @@ def _slug(s: str) -> str:
     return re.sub(r"[^A-Za-z0-9_.-]+", "-", str(s))
 
 
-def normalize_text_for_cache(s: str) -> str:
-    """Lowercase, remove diacritics and punctuation, collapse whitespace."""
-    if not s:
-        return ""
-    s = s.lower()
-    s = unicodedata.normalize("NFD", s)
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))  # strip diacritics
-    s = re.sub(r"[^\w\s]", "", s, flags=re.UNICODE)  # strip punctuation
-    s = re.sub(r"\s+", " ", s, flags=re.UNICODE).strip()  # collapse spaces
-    return s
-
-
-def find_cached_tts_normalized(
-    lang_obj,
-    raw_text: str,
-    gender: str = "female",
-    max_token_candidates: int = 100,
-    max_fallback: int = 200,
-):
+def find_cached_tts_normalized(lang_obj, raw_text: str, gender: str = "female"):
     """
-    Find CacheTTS by normalized text without changing DB schema.
-    1) exact icase match
-    2) token-filtered candidates (icontains) then normalized compare
-    3) fallback: recent N rows normalized compare
-    Returns CacheTTS or None.
+    Find CacheTTS by its exact text, then ignoring case, then by normalized text
+    (lowercase, no diacritics nor punctuation) on the unique (language, gender,
+    normalized_hash) index, in a single query. The normalized text drops glottal
+    stops and macrons, so a row whose text matches is always preferred to one that
+    only shares its normalized form. Returns CacheTTS or None.
     """
     if not raw_text:
         return None
 
-    # 1) exact icase match (fast path)
-    try:
-        return CacheTTS.objects.get(
-            language=lang_obj, text__iexact=raw_text, gender=gender
-        )
-    except CacheTTS.MultipleObjectsReturned:
-        return CacheTTS.objects.filter(
-            language=lang_obj, text__iexact=raw_text, gender=gender
-        ).first()
-    except CacheTTS.DoesNotExist:
-        pass
-
-    norm = normalize_text_for_cache(raw_text)
-    tokens = re.findall(r"\w+", norm)
-
-    # 2) token-filtered candidates
-    q = Q()
-    for t in tokens[:5]:  # cap tokens to keep the query fast
-        q &= Q(text__icontains=t)
-
-    if q:
-        candidates = (
-            CacheTTS.objects.filter(language=lang_obj, gender=gender)
-            .filter(q)
-            .order_by("-id")[:max_token_candidates]
+    match = Q(text__iexact=raw_text)
+    text_hash = normalized_hash(normalize_text_for_cache(raw_text))
+    if text_hash is not None:
+        match |= Q(normalized_hash=text_hash)
+
+    return (
+        CacheTTS.objects.filter(match, language=lang_obj, gender=gender)
+        .annotate(
+            match_rank=Case(
+                When(text=raw_text, then=Value(0)),
+                When(text__iexact=raw_text, then=Value(1)),
+                default=Value(2),
+            )
         )
-        for c in candidates:
-            if normalize_text_for_cache(c.text) == norm:
-                return c
+        .order_by("match_rank", "-id")
+        .first()
+    )
 
-    # 3) small recent-window fallback
-    recent = CacheTTS.objects.filter(language=lang_obj, gender=gender).order_by("-id")[
-        :max_fallback
-    ]
-    for c in recent:
-        if normalize_text_for_cache(c.text) == norm:
-            return c
 
-    return None
+def asr_deployment():
+    base_url = settings.APP_SETTINGS.inference_asr_model_url
+    model_name = settings.APP_SETTINGS.inference_asr_model_name
+    return f"{base_url}/v2/models/{model_name}/infer"
 
 
 def generate_asr(audio_file, lang):
     lang_code = getattr(lang, "code", lang)
-    base_url = settings.APP_SETTINGS.inference_asr_model_url
-    model_name = settings.APP_SETTINGS.inference_asr_model_name
-    raw_deployment = f"{base_url}/v2/models/{model_name}/infer"
+    raw_deployment = asr_deployment()
     logger.debug(f"Generating ASR transcription for language: {lang_code}")
 
     try:
@@ -509,52 +568,20 @@ def generate_asr(audio_file, lang):
             raise TypeError("audio_file must be bytes or a file-like object")
 
         logger.debug(f"Received audio bytes: {len(audio_bytes)}")
-        container = _sniff_container(audio_bytes)
-        logger.debug(f"Detected container: {container}")
-
-        # Convert to WAV 16kHz mono using ffmpeg
-        try:
-            inp = ffmpeg.input(
-                "pipe:0",
-                **({"f": container} if container in ("webm", "ogg", "mp4") else {}),
-            )
-            out = ffmpeg.output(
-                inp,
-                "pipe:1",
-                ar=16000,
-                ac=1,
-                format="wav",
-                acodec="pcm_s16le",
-                # Add these options to preserve audio start
-                **{
-                    "af": "apad=pad_dur=0.1",  # Add 100ms padding at start
-                    "analyzeduration": "10M",  # Increase analysis duration
-                    "probesize": "10M",  # Increase probe size
-                },
-            )
-            wav_bytes, ff_err = ffmpeg.run(
-                out,
-                input=audio_bytes,
-                capture_stdout=True,
-                capture_stderr=True,
-                quiet=True,
-            )
-            if not wav_bytes:
-                logger.error(f"error{ff_err.decode(errors='ignore') if ff_err else ''}")
-                raise Exception("Empty WAV after ffmpeg conversion")
-        except Exception as e:
-            logger.error(f"FFmpeg conversion failed: {str(e)}")
-            raise
-
-        # Load PCM samples
-        samples, sample_rate = sf.read(io.BytesIO(wav_bytes), dtype="float32")
-        if samples is None or (hasattr(samples, "size") and samples.size == 0):
-            raise Exception("Decoded audio has zero length")
-
-        # Downmix to mono if needed
-        if hasattr(samples, "ndim") and samples.ndim > 1:
-            logger.debug(f"Downmixing from shape {samples.shape} to mono")
-            samples = samples.mean(axis=1)
+        # 16 kHz mono float32; WAV/FLAC/OGG are decoded in-process, webm/mp4 by
+        # an ffmpeg subprocess
+        samples = decode_audio(audio_bytes)
+
+        audio_hash = asr_cache.audio_hash(samples)
+        cached = asr_cache.get(audio_hash, lang_code)
+        if cached is not None:
+            logger.info("ASR result found in cache")
+            return {
+                **cached,
+                "audio_hash": audio_hash,
+                "cache_model": asr_cache.model_key(),
+                "from_cache": True,
+            }
 
         """
          # Save quick metadata
@@ -591,11 +618,18 @@ def generate_asr(audio_file, lang):
             samples, 16000, lang_code, deployment=raw_deployment
         )
 
-        return {
+        result = {
             "text": transcribed_text,
             "model_name": model_name,
             "model_version": model_version,
         }
+        asr_cache.put(audio_hash, lang_code, result)
+        return {
+            **result,
+            "audio_hash": audio_hash,
+            "cache_model": asr_cache.model_key(),
+            "from_cache": False,
+        }
 
     except Exception as e:
         logger.error(f"Failed to transcribe speech: {str(e)}")
@@ -12,16 +12,18 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import base64
 import logging
+import time
 from functools import reduce
 from operator import or_
 
 import numpy as np
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import IntegrityError
-from django.db.models import Q
+from django.db.models import Q, Sum
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import mixins, status, viewsets
 from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
@@ -33,6 +35,8 @@ from rest_framework.response import Response
 from rest_framework.status import HTTP_201_CREATED, HTTP_400_BAD_REQUEST
 from rest_framework.views import APIView
 
+from . import request_log, tts_cache, usage_stats
+from .audio import to_pcm16
 from .models import (
     CacheTTS,
     GeneralSuggestion,
@@ -42,11 +46,14 @@ from .models import (
     RequestAccess,
     SpeechToTextAudio,
     TextToSpeechAudio,
+    TranslationMemory,
     TranslationPair,
     TranslationRequest,
+    TranslationUsage,
     Word,
     WordInformation,
 )
+from .normalization import normalize_text_for_memory, normalized_hash
 from .roles import IsAdmin, IsNativeAdmin, TranslationRequiresAuth
 from .serializers import (
     FullUserSerializer,
@@ -61,20 +68,24 @@ from .serializers import (
     TextToSpeechSerializer,
     TranslationPairSerializer,
     TranslationRequestSerializer,
+    TranslationUsageQuerySerializer,
+    TranslationUsageSerializer,
     UserSerializer,
     WordInformationSerializer,
     WordSerializer,
 )
 from .utils import (
-    filter_cache,
-    find_cached_tts_normalized,
     generate_asr,
     generate_tts,
+    generate_tts_stream,
     get_word_candidates,
+    iterate_in_thread,
     send_invite_email,
     send_participate_email,
     send_recovery_email,
+    sse_event,
     translate,
+    translate_stream,
 )
 
 logger = logging.getLogger(__name__)
@@ -625,17 +636,17 @@ class TranslateViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
     serializer_class = TranslationPairSerializer
 
     def get_queryset(self, src_lang=None, dst_lang=None, src_text=None):
-        # get all texts matching src or dst lang and text (cache)
-        results = (
-            TranslationPair.objects.filter(
-                correct=True,
-                validated=True,
-                src_lang__code__in=[src_lang.code, dst_lang.code],
+        # validated translations of the text in the requested direction (cache)
+        text_hash = normalized_hash(normalize_text_for_memory(src_text))
+        if text_hash is None:
+            return TranslationMemory.objects.none()
+        return (
+            TranslationMemory.objects.filter(
+                src_hash=text_hash, src_lang=src_lang, dst_lang=dst_lang
             )
-            .filter(Q(src_text__iexact=src_text) | Q(dst_text__iexact=src_text))
+            .select_related("pair", "dst_lang")
             .order_by("-created_at")
         )
-        return [s for s in results]
 
     def create(self, request):
         logger.info(f"Received translation request: {request.data}")
@@ -657,6 +668,7 @@ class TranslateViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
             model_name = None
             model_version = None
             from_cache = False
+            pivot_latency_ms = None
 
             if src_lang == dst_lang:  # same lang return same text
                 logger.debug(
@@ -673,11 +685,8 @@ class TranslateViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
 
             else:
                 # check for cache hits
-                cache_results = self.get_queryset(
-                    src_lang=src_lang, dst_lang=dst_lang, src_text=src_text
-                )
-                cache_result, cache_dst_lang = filter_cache(
-                    src_lang, dst_lang, cache_results
+                cache_result, cache_dst_lang, cache_model = self.lookup_cache(
+                    src_lang, dst_lang, src_text
                 )
 
                 if cache_result is None:
@@ -690,6 +699,11 @@ class TranslateViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
                         dst_text = translation["dst_text"]
                         model_name = translation["model_name"]
                         model_version = translation["model_version"]
+                        pivot_latency_ms = translation.pop("pivot_latency_ms", None)
+                        if pivot_latency_ms is not None:
+                            logger.info(
+                                f"Pivot translation took {pivot_latency_ms:.1f}ms"
+                            )
 
                         serializer.save(**translation)
 
@@ -704,37 +718,23 @@ class TranslateViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
                     from_cache = True
                     dst_text = cache_result
 
-                    # Get model info from cached result if available
-                    if cache_results:
-                        cached_pair = cache_results[0]
-                        model_name = cached_pair.model_name
-                        model_version = cached_pair.model_version
+                    model_name, model_version = cache_model
 
                     serializer.save(dst_text=cache_result, dst_lang=cache_dst_lang)
 
             # SAVE TO TRACKING TABLE (every translation request)
-            idem_key = request.data.get("request_id")  # body-only
-            log_defaults = {
-                "src_text": src_text,
-                "dst_text": dst_text,
-                "src_lang": src_lang,
-                "dst_lang": dst_lang if src_lang != dst_lang else src_lang,
-                "user": user,
-                "model_name": model_name or "unknown",
-                "model_version": model_version or "unknown",
-                "from_cache": from_cache,
-            }
-            try:
-                if idem_key:
-                    TranslationRequest.objects.get_or_create(
-                        client_request_id=idem_key, defaults=log_defaults
-                    )
-                else:
-                    TranslationRequest.objects.create(**log_defaults)
-            except IntegrityError:
-                logger.info(f"Skip duplicate TranslationRequest key={idem_key}")
-            except Exception as e:
-                logger.error(f"Failed to log translation request: {e}")
+            self.log_request(
+                request,
+                src_text=src_text,
+                dst_text=dst_text,
+                src_lang=src_lang,
+                dst_lang=dst_lang,
+                user=user,
+                model_name=model_name,
+                model_version=model_version,
+                from_cache=from_cache,
+                pivot_latency_ms=pivot_latency_ms,
+            )
 
             logger.info(f"Translation response: {serializer.data}")
             return Response(serializer.data)
@@ -743,6 +743,127 @@ class TranslateViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
             logger.warning(f"Invalid translation request: {serializer.errors}")
             return Response(serializer.errors, HTTP_400_BAD_REQUEST)
 
+    def lookup_cache(self, src_lang, dst_lang, src_text):
+        """
+        Looks up validated translations of `src_text`. Returns the cached text, its
+        language and the (model_name, model_version) of the newest matching pair.
+        """
+        memory = self.get_queryset(
+            src_lang=src_lang, dst_lang=dst_lang, src_text=src_text
+        ).first()
+        if memory is None:
+            return None, None, (None, None)
+        return (
+            memory.dst_text,
+            memory.dst_lang,
+            (memory.pair.model_name, memory.pair.model_version),
+        )
+
+    def log_request(self, request, **fields):
+        """
+        Stores the translation request in the tracking table, once per `request_id`
+        of the body.
+        """
+        request_log.log(
+            **{
+                **fields,
+                "model_name": fields["model_name"] or "unknown",
+                "model_version": fields["model_version"] or "unknown",
+                "client_request_id": request.data.get("request_id") or None,
+            }
+        )
+
+    @action(detail=False, methods=["post"])
+    def stream(self, request):
+        """
+        Streams the translation as Server-Sent Events. Every `message` event has
+        the partial `dst_text`; a final `done` event has the same body as `create`
+        plus the time to first token (`ttft`) and total `latency` in seconds, and
+        the `pivot_latency_ms` of pivot translations.
+        """
+        logger.info(f"Received streaming translation request: {request.data}")
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            logger.warning(f"Invalid translation request: {serializer.errors}")
+            return Response(serializer.errors, HTTP_400_BAD_REQUEST)
+
+        src_lang = serializer.validated_data["src_lang"]
+        dst_lang = serializer.validated_data["dst_lang"]
+        src_text = serializer.validated_data["src_text"]
+        user = request.user if request.user.is_authenticated else None
+
+        def events():
+            start = time.perf_counter()
+            ttft = None
+            from_cache = False
+            pivot_latency_ms = None
+            if src_lang == dst_lang:
+                result = {
+                    "dst_text": src_text,
+                    "model_name": "no_translation",
+                    "model_version": "v1",
+                }
+            else:
+                cache_result, cache_dst_lang, cache_model = self.lookup_cache(
+                    src_lang, dst_lang, src_text
+                )
+                if cache_result is not None:
+                    from_cache = True
+                    result = {
+                        "dst_text": cache_result,
+                        "dst_lang": cache_dst_lang,
+                        "model_name": cache_model[0],
+                        "model_version": cache_model[1],
+                    }
+                else:
+                    result = None
+                    try:
+                        for result in translate_stream(src_text, src_lang, dst_lang):
+                            if ttft is None:
+                                ttft = time.perf_counter() - start
+                            yield sse_event({"dst_text": result["dst_text"]})
+                    except Exception as e:
+                        logger.error(f"Translation model error: {str(e)}")
+                        result = None
+                    if result is None:
+                        yield sse_event(
+                            {"detail": "Error en la predicción del modelo"},
+                            event="error",
+                        )
+                        return
+                    pivot_latency_ms = result.pop("pivot_latency_ms", None)
+
+            latency = time.perf_counter() - start
+            ttft = latency if ttft is None else ttft
+            logger.info(f"Streaming translation ttft={ttft:.3f}s total={latency:.3f}s")
+
+            serializer.save(**result)
+            self.log_request(
+                request,
+                src_text=src_text,
+                dst_text=result["dst_text"],
+                src_lang=src_lang,
+                dst_lang=dst_lang,
+                user=user,
+                model_name=result["model_name"],
+                model_version=result["model_version"],
+                from_cache=from_cache,
+                pivot_latency_ms=pivot_latency_ms,
+            )
+            done = {**serializer.data, "ttft": ttft, "latency": latency}
+            if pivot_latency_ms is not None:
+                logger.info(f"Pivot translation took {pivot_latency_ms:.1f}ms")
+                done["pivot_latency_ms"] = pivot_latency_ms
+            yield sse_event(done, event="done")
+
+        response = StreamingHttpResponse(
+            iterate_in_thread(events()), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        # disable proxy buffering so events reach the client as they are sent
+        response["X-Accel-Buffering"] = "no"
+        return response
+
 
 class ParticipateRequestEndpoint(APIView):
     permission_classes = [AllowAny]
@@ -804,27 +925,15 @@ class TextToSpeechViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
                 try:
                     actual_gender = gender or "female"
 
-                    cached_tts = find_cached_tts_normalized(
-                        lang_obj, text, gender=actual_gender
-                    )
+                    cached_tts = tts_cache.get(lang_obj, text, gender=actual_gender)
                     if not cached_tts:
                         raise CacheTTS.DoesNotExist()
 
                     logger.info("Cache hit for TTS request (normalized match)")
 
-                    # Decode base64 -> float32 waveform list
+                    # Decode PCM16 -> float32 waveform list
                     try:
-                        audio_bytes = base64.b64decode(cached_tts.audio_data)
-                        logger.debug(f"Decoded {len(audio_bytes)} bytes from cache")
-
-                        # Verify byte length is valid for float32
-                        if len(audio_bytes) % 4 != 0:
-                            logger.error("Invalid byte length")
-                            raise ValueError("Invalid cached audio data")
-
-                        # Convert bytes back to numpy array, then to list
-                        waveform_array = np.frombuffer(audio_bytes, dtype=np.float32)
-                        waveform_data = waveform_array.tolist()
+                        waveform_data = cached_tts.get_waveform().tolist()
                     except (ValueError, Exception):
                         logger.error("Failed to decode cached audio, model")
                         raise CacheTTS.DoesNotExist("Corrupted cache entry")
@@ -851,11 +960,9 @@ class TextToSpeechViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
                     return Response(response_data)
 
                 except CacheTTS.DoesNotExist:
-                    logger.warning(
-                        "Cache miss - calling model as fallback (no caching)"
-                    )
+                    logger.warning("Cache miss - calling model")
 
-                    # Generate new audio using the language code (FALLBACK ONLY)
+                    # Generate new audio using the language code
                     generated_audio = generate_tts(text, language_code)
 
                     # Extract data
@@ -867,7 +974,8 @@ class TextToSpeechViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
                         "model_version", model_version or "unknown"
                     )
 
-                    logger.info("TTS audio generated but NOT cached (inference mode)")
+                    # stored only for phrases requested often, if enabled
+                    tts_cache.record_miss(lang_obj, actual_gender, text, waveform_data)
 
                     # Create tracking record
                     audio_obj = TextToSpeechAudio.objects.create(
@@ -887,7 +995,7 @@ class TextToSpeechViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
                         "waveform": waveform_data,
                     }
 
-                    logger.info("TTS response generated (not cached)!")
+                    logger.info("TTS response generated!")
                     return Response(response_data)
 
             except Lang.DoesNotExist:
@@ -909,6 +1017,99 @@ class TextToSpeechViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
             logger.warning(f"Invalid text request: {serializer.errors}")
             return Response(serializer.errors, HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=["post"])
+    def stream(self, request):
+        """
+        Streams the speech as 16-bit little-endian mono PCM over chunked HTTP, one
+        sentence at a time, so playback can start as soon as the first sentence is
+        synthesized. The sampling rate is in the `X-Sampling-Rate` header; the
+        request body is the same as for `create`.
+        """
+        logger.info(f"Received streaming text request: {request.data}")
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            logger.warning(f"Invalid text request: {serializer.errors}")
+            return Response(serializer.errors, HTTP_400_BAD_REQUEST)
+
+        text = serializer.validated_data["text"]
+        base_language_code = serializer.validated_data["language"]
+        gender = serializer.validated_data.get("gender")
+        model_name = serializer.validated_data.get("model_name")
+        model_version = serializer.validated_data.get("model_version")
+        user = request.user if request.user.is_authenticated else None
+
+        tts_lang_prefix = base_language_code.split("_")[0]
+        language_code = f"{tts_lang_prefix}_{gender}" if gender else base_language_code
+
+        try:
+            lang_obj = Lang.objects.get(code=base_language_code)
+        except Lang.DoesNotExist:
+            logger.error(f"Language with code '{language_code}' not found")
+            return Response(
+                f"Language code '{language_code}' not supported",
+                status=HTTP_400_BAD_REQUEST,
+            )
+
+        cached_tts = tts_cache.get(lang_obj, text, gender=gender or "female")
+        sampling_rate = (
+            cached_tts.sampling_rate if cached_tts else settings.TTS_SAMPLING_RATE
+        )
+
+        def chunks():
+            start = time.perf_counter()
+            first_chunk = None
+            if cached_tts:
+                logger.info("Cache hit for streaming TTS request")
+                result = {
+                    "model_name": model_name or "cached",
+                    "model_version": model_version or "cached",
+                }
+                # stored as PCM16 already, sent without decoding or copying
+                yield cached_tts.get_audio_bytes()
+            else:
+                result, waveforms = {}, []
+                try:
+                    for result in generate_tts_stream(text, language_code):
+                        if first_chunk is None:
+                            first_chunk = time.perf_counter() - start
+                        waveforms.append(result["waveform"])
+                        yield to_pcm16(result["waveform"])
+                except Exception as e:
+                    # the status is already sent, closing the connection before the
+                    # last chunk is how the client learns the audio is incomplete
+                    logger.error(f"TTS model error: {str(e)}")
+                    raise
+                # stored by a background thread, as the write is followed by an
+                # eviction the client should not wait for
+                if waveforms and tts_cache.count_miss(
+                    lang_obj, gender or "female", text
+                ):
+                    tts_cache.admit_later(
+                        lang_obj, gender or "female", text, np.concatenate(waveforms)
+                    )
+
+            latency = time.perf_counter() - start
+            first_chunk = latency if first_chunk is None else first_chunk
+            logger.info(
+                f"Streaming TTS first chunk={first_chunk:.3f}s total={latency:.3f}s"
+            )
+            TextToSpeechAudio.objects.create(
+                text=text,
+                language=lang_obj,
+                model_name=result.get("model_name", model_name or "unknown"),
+                model_version=result.get("model_version", model_version or "unknown"),
+                user=user,
+            )
+
+        response = StreamingHttpResponse(
+            iterate_in_thread(chunks()), content_type=f"audio/L16;rate={sampling_rate}"
+        )
+        response["X-Sampling-Rate"] = str(sampling_rate)
+        response["Cache-Control"] = "no-cache"
+        # disable proxy buffering so chunks reach the client as they are sent
+        response["X-Accel-Buffering"] = "no"
+        return response
+
 
 class SpeechToTextViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
     """
@@ -976,6 +1177,9 @@ class SpeechToTextViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
                     validated=False,
                     validated_text=None,
                     user=request.user if request.user.is_authenticated else None,
+                    audio_hash=asr_result["audio_hash"],
+                    cache_model=asr_result["cache_model"],
+                    from_cache=asr_result["from_cache"],
                 )
 
                 response_data = {
@@ -990,6 +1194,7 @@ class SpeechToTextViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
                     "model_version": asr_result["model_version"],
                     "validated": False,
                     "validated_text": None,
+                    "from_cache": asr_result["from_cache"],
                 }
 
                 logger.info("ASR transcription complete")
@@ -1104,6 +1309,44 @@ class TranslationRequestViewSet(viewsets.ReadOnlyModelViewSet):
 
         return queryset.order_by("-created_at")
 
+    @action(detail=False, methods=["get"])
+    def stats(self, request):
+        """
+        Usage statistics read from the TranslationUsage rollups. Counts per `period`
+        (hour or day) from `since` until `until`, the last 30 days (or 48 hours)
+        by default, optionally filtered by every rollup dimension.
+        """
+        query = TranslationUsageQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, HTTP_400_BAD_REQUEST)
+        params = query.validated_data
+
+        period = params["period"]
+        until = params.get("until") or timezone.now()
+        since = params.get("since") or until - usage_stats.DEFAULT_RANGE[period]
+        usage = TranslationUsage.objects.filter(
+            period=period,
+            period_start__gte=usage_stats.period_start(period, since),
+            period_start__lt=until,
+        )
+        for dimension in usage_stats.DIMENSIONS:
+            if params.get(dimension) is not None:
+                usage = usage.filter(**{dimension: params[dimension]})
+
+        totals = usage.aggregate(
+            total=Sum("count"), from_cache=Sum("count", filter=Q(from_cache=True))
+        )
+        return Response(
+            {
+                "period": period,
+                "since": since,
+                "until": until,
+                "total": totals["total"] or 0,
+                "from_cache": totals["from_cache"] or 0,
+                "results": TranslationUsageSerializer(usage, many=True).data,
+            }
+        )
+
 
 class WordViewSet(viewsets.ModelViewSet):
     queryset = Word.objects.all().prefetch_related("definitions")
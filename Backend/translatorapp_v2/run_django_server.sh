@@ -1,5 +1,8 @@
 #!/bin/sh
 # run server commands
 python manage.py migrate &&
+# partitions of the coming months of the log tables, old ones are left as they are
+python manage.py partitionLogTables --retention-months 0 &&
 #python manage.py createsuperuser --noinput &&
-python manage.py runserver 0.0.0.0:$1
+# served through ASGI, so the speech-to-text WebSocket is available too
+uvicorn translatorapp.asgi:application --host 0.0.0.0 --port $1
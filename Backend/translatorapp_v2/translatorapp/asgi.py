@@ -4,4 +4,17 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "translatorapp.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# imported once Django is set up, it uses the models
+from main import asr_stream  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # WebSockets are not handled by Django, route them here
+    if scope["type"] == "websocket":
+        if scope["path"] == asr_stream.PATH:
+            return await asr_stream.speech_to_text_stream(scope, receive, send)
+        await receive()
+        return await send({"type": "websocket.close", "code": 1008})
+    return await django_application(scope, receive, send)
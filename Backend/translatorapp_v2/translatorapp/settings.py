@@ -57,6 +57,9 @@ class AppSettings(BaseSettings):
     raw_inference_model_name: str
     inference_model_url: str
     raw_inference_model_url: str
+    # optional model server that runs both hops of a pivot translation in one call
+    pivot_inference_model_name: str | None = None
+    pivot_inference_model_url: str | None = None
 
     inference_tts_model_url: str
     inference_tts_model_name: str
@@ -294,6 +297,61 @@ SUPPORT_EMAIL = os.environ.get("SUPPORT_EMAIL")
 VARIANT = os.environ.get("VARIANT")
 MAX_WORDS_TRANSLATION = int(os.environ.get("MAX_WORDS_TRANSLATION", 150))
 
+# HTTP client of the inference servers (main/inference_client.py)
+INFERENCE_CONNECT_TIMEOUT = float(os.environ.get("INFERENCE_CONNECT_TIMEOUT", 5))
+# long enough for a model server cold start
+INFERENCE_READ_TIMEOUT = float(os.environ.get("INFERENCE_READ_TIMEOUT", 300))
+INFERENCE_MAX_RETRIES = int(os.environ.get("INFERENCE_MAX_RETRIES", 2))
+INFERENCE_RETRY_BACKOFF = float(os.environ.get("INFERENCE_RETRY_BACKOFF", 0.5))
+INFERENCE_POOL_SIZE = int(os.environ.get("INFERENCE_POOL_SIZE", 10))
+INFERENCE_CIRCUIT_FAILURES = int(os.environ.get("INFERENCE_CIRCUIT_FAILURES", 5))
+INFERENCE_CIRCUIT_RESET = float(os.environ.get("INFERENCE_CIRCUIT_RESET", 30))
+
+# ASR results cached by audio hash (main/asr_cache.py): entries of the memory tier,
+# and model version whose stored transcriptions can be reused
+ASR_CACHE_SIZE = int(os.environ.get("ASR_CACHE_SIZE", 1024))
+ASR_MODEL_VERSION = os.environ.get("ASR_MODEL_VERSION", "1")
+
+# Streaming speech-to-text over WebSocket (main/asr_stream.py)
+# new audio needed before sending another partial transcription
+ASR_STREAM_PARTIAL_SECONDS = float(os.environ.get("ASR_STREAM_PARTIAL_SECONDS", 0.5))
+# a pause this long closes the current segment
+ASR_STREAM_SILENCE_SECONDS = float(os.environ.get("ASR_STREAM_SILENCE_SECONDS", 0.4))
+ASR_STREAM_SILENCE_DB = float(os.environ.get("ASR_STREAM_SILENCE_DB", -45))
+ASR_STREAM_MAX_SEGMENT_SECONDS = float(
+    os.environ.get("ASR_STREAM_MAX_SEGMENT_SECONDS", 15)
+)
+ASR_STREAM_MAX_SECONDS = float(os.environ.get("ASR_STREAM_MAX_SECONDS", 300))
+
+# sampling rate of the waveforms returned by the TTS server, sent with streamed audio
+TTS_SAMPLING_RATE = int(os.environ.get("TTS_SAMPLING_RATE", 16000))
+
+# Write-through of generated TTS audio into CacheTTS (main/tts_cache.py), off by
+# default: misses of a phrase before its audio is stored, maximum auto-cached rows
+# (curated rows are not counted), their lifetime and counters of the miss sketch
+TTS_CACHE_WRITE_THROUGH = (
+    os.environ.get("TTS_CACHE_WRITE_THROUGH", "false").lower() == "true"
+)
+TTS_CACHE_ADMIT_AFTER = int(os.environ.get("TTS_CACHE_ADMIT_AFTER", 3))
+TTS_CACHE_MAX_ENTRIES = int(os.environ.get("TTS_CACHE_MAX_ENTRIES", 10000))
+TTS_CACHE_TTL_DAYS = float(os.environ.get("TTS_CACHE_TTL_DAYS", 30))
+TTS_CACHE_SKETCH_WIDTH = int(os.environ.get("TTS_CACHE_SKETCH_WIDTH", 1 << 16))
+
+# Buffered TranslationRequest logging (main/request_log.py), off by default: rows
+# are written by a background thread in batches, or after a few seconds
+REQUEST_LOG_ASYNC = os.environ.get("REQUEST_LOG_ASYNC", "false").lower() == "true"
+REQUEST_LOG_BATCH_SIZE = int(os.environ.get("REQUEST_LOG_BATCH_SIZE", 100))
+REQUEST_LOG_FLUSH_SECONDS = float(os.environ.get("REQUEST_LOG_FLUSH_SECONDS", 2))
+# records queued beyond this are written synchronously
+REQUEST_LOG_MAX_QUEUE = int(os.environ.get("REQUEST_LOG_MAX_QUEUE", 10000))
+
+# Monthly partitions of the log tables (main/partitions.py): months created ahead by
+# partitionLogTables, months kept before the current one (0 keeps all) and
+# directory where detached partitions are archived (empty only detaches them)
+LOG_PARTITION_MONTHS_AHEAD = int(os.environ.get("LOG_PARTITION_MONTHS_AHEAD", 3))
+LOG_RETENTION_MONTHS = int(os.environ.get("LOG_RETENTION_MONTHS", 0))
+LOG_ARCHIVE_DIR = os.environ.get("LOG_ARCHIVE_DIR", "")
+
 # Convert string environment variable to boolean
 TRANSLATION_REQUIRES_AUTH = (
     os.environ.get("TRANSLATION_REQUIRES_AUTH", "false").lower() == "true"
@@ -0,0 +1,113 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class ASRBatcher:
+    """
+    Groups the clips of concurrent requests in process before they reach the model.
+    Triton's dynamic batcher only merges requests whose variable-length inputs have
+    the same shape, so clips of different lengths would reach `predict_batch` one
+    request at a time. Every Triton instance hands its clips to this queue instead,
+    and a single worker transcribes whatever is queued together, so clips of any
+    length are padded into the same forward passes.
+
+    Args:
+        asr_wrapper (`ASRModelWrapper`):
+            Model used to transcribe the batches, through `predict_batch`.
+        logger (`logging.Logger`):
+            Logger of the server.
+        max_batch_size (`int`, *optional*, defaults to 16):
+            Max number of clips transcribed in a single `predict_batch` call.
+        max_delay (`float`, *optional*, defaults to 0.005):
+            Max seconds the first queued clip waits for others to join its batch.
+    """
+
+    def __init__(
+        self,
+        asr_wrapper,
+        logger: logging.Logger,
+        max_batch_size: int = 16,
+        max_delay: float = 0.005,
+    ):
+        self.asr_wrapper = asr_wrapper
+        self.logger = logger
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def transcribe(
+        self, audios: list, sampling_rates: list[int], lang_codes: list[str]
+    ) -> list[str]:
+        """
+        Transcribes the clips of a request, waiting until the batch they were
+        added to is done. Errors of the batch are raised here.
+        """
+        future = Future()
+        self._queue.put((audios, sampling_rates, lang_codes, future))
+        return future.result()
+
+    def _take_batch(self) -> list:
+        """
+        Waits for a request, then keeps taking queued ones until `max_batch_size`
+        clips are taken or `max_delay` passes. A request is never split, so a batch
+        may go over `max_batch_size` with its last request.
+        """
+        pending = [self._queue.get()]
+        clips = len(pending[0][0])
+        deadline = time.monotonic() + self.max_delay
+        while clips < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            pending.append(item)
+            clips += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._take_batch()
+            audios, sampling_rates, lang_codes = [], [], []
+            for request_audios, request_rates, request_langs, _ in pending:
+                audios.extend(request_audios)
+                sampling_rates.extend(request_rates)
+                lang_codes.extend(request_langs)
+            self.logger.debug(
+                f"Batch of {len(audios)} clips from {len(pending)} requests, "
+                f"lengths {[len(audio) for audio in audios]}"
+            )
+            try:
+                texts = self.asr_wrapper.predict_batch(
+                    audios, sampling_rates, lang_codes
+                )
+            except Exception as e:
+                if len(pending) == 1:
+                    pending[0][3].set_exception(e)
+                else:
+                    # a bad request (e.g. an unsupported language) must not fail
+                    # the others, so they are transcribed one at a time
+                    self.logger.warning(f"Batch failed ({e}), retrying by request")
+                    for item in pending:
+                        self._transcribe_one(*item)
+                continue
+
+            start = 0
+            for request_audios, _, _, future in pending:
+                future.set_result(texts[start : start + len(request_audios)])
+                start += len(request_audios)
+
+    def _transcribe_one(self, audios, sampling_rates, lang_codes, future):
+        try:
+            future.set_result(
+                self.asr_wrapper.predict_batch(audios, sampling_rates, lang_codes)
+            )
+        except Exception as e:
+            future.set_exception(e)
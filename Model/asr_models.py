@@ -1,10 +1,14 @@
 import logging
 import os
+import threading
 from abc import ABC, abstractmethod
+from typing import Iterator
 
 import numpy as np
 import torch
 from dotenv import load_dotenv
+from safetensors.torch import load_file
+from segmentation import split_on_silence, stitch
 from transformers import AutoProcessor, Wav2Vec2ForCTC
 
 load_dotenv()
@@ -56,6 +60,58 @@ class ASRModelWrapper(ABC):
         inputs = self.process_audio(audio, sampling_rate)
         return self.transcribe(inputs, lang)
 
+    def predict_batch(
+        self, audios: list, sampling_rates: list[int], lang_codes: list[str]
+    ) -> list[str]:
+        """
+        Predict text for a batch of clips. Clips are grouped by language and
+        sampling rate, and each group is transcribed with `transcribe_batch`.
+        """
+        groups = {}
+        for idx, (sampling_rate, lang_code) in enumerate(
+            zip(sampling_rates, lang_codes)
+        ):
+            if lang_code not in nllb_language_token_map:
+                raise ValueError(f"Unsupported language: {lang_code}")
+            lang = nllb_language_token_map[lang_code]
+            groups.setdefault((lang, sampling_rate), []).append(idx)
+
+        texts = [None] * len(audios)
+        for (lang, sampling_rate), idxs in groups.items():
+            self.logger.debug(f"Transcribing {len(idxs)} clips in {lang}")
+            group_texts = self.transcribe_batch(
+                [audios[idx] for idx in idxs], sampling_rate, lang
+            )
+            for idx, text in zip(idxs, group_texts):
+                texts[idx] = text
+        return texts
+
+    def predict_long(self, audio, sampling_rate: int, lang_code: str):
+        """
+        Predict text from a long recording, yielding the text transcribed so far.
+        """
+        if lang_code not in nllb_language_token_map:
+            raise ValueError(f"Unsupported language: {lang_code}")
+        lang = nllb_language_token_map[lang_code]
+        yield from self.transcribe_long(audio, sampling_rate, lang)
+
+    def transcribe_long(self, audio, sampling_rate: int, lang: str):
+        """
+        Transcribe a long recording incrementally. By default it is transcribed
+        in a single step.
+        """
+        yield self.transcribe(self.process_audio(audio, sampling_rate), lang)
+
+    def transcribe_batch(self, audios: list, sampling_rate: int, lang: str):
+        """
+        Transcribe several clips of the same language. By default clips are
+        transcribed one at a time.
+        """
+        return [
+            self.transcribe(self.process_audio(audio, sampling_rate), lang)
+            for audio in audios
+        ]
+
     def optimize(self, tf32: bool = True):
         """
         Optimize the model for inference.
@@ -90,6 +146,10 @@ class OptimizedASRWrapper(ASRModelWrapper):
         use_bf16: bool = False,
         use_tf32: bool = True,
         hf_token: str = None,
+        max_batch_seconds: float = None,
+        max_segment_seconds: float = 30,
+        overlap_seconds: float = 1,
+        segment_batch_size: int = 4,
     ):
         self.mms_base_path = model_base_path or "facebook/mms-1b-all"
         self.rap_adapter_path = rap_adapter_path
@@ -97,10 +157,33 @@ class OptimizedASRWrapper(ASRModelWrapper):
         self.use_bf16 = use_bf16 and gpu and torch.cuda.is_available()
         self.use_tf32 = use_tf32
         self.hf_token = hf_token
+        # max padded audio per forward pass, summed over the clips of a batch.
+        # Batching pays off on GPU; on CPU a single clip already uses all cores
+        # and padding only adds work, so by default clips run one at a time.
+        if max_batch_seconds is None:
+            max_batch_seconds = 240 if gpu and torch.cuda.is_available() else 0
+        self.max_batch_seconds = max_batch_seconds
+        # recordings longer than this are split at pauses and transcribed in
+        # batches of `segment_batch_size` segments
+        if max_segment_seconds <= overlap_seconds:
+            raise ValueError(
+                f"max_segment_seconds ({max_segment_seconds}) must be longer than "
+                f"overlap_seconds ({overlap_seconds})"
+            )
+        self.max_segment_seconds = max_segment_seconds
+        self.overlap_seconds = overlap_seconds
+        self.segment_batch_size = segment_batch_size
 
         # Internal state
         self.mms_model = None
         self.mms_processor = None
+        # adapter weights of each language, on the model device and dtype
+        self.adapters = {}
+        self.active_adapter = None
+        self._adapter_params = None
+        # model copies share the wrapper, so adapter swaps and forward passes
+        # must not interleave
+        self._lock = threading.Lock()
 
         super().__init__(logger, gpu, model_base_path)
 
@@ -142,20 +225,8 @@ class OptimizedASRWrapper(ASRModelWrapper):
                 device_map=device_map,
             )
 
-            # Load Adapters
-            self.logger.info("Loading Rapa Nui adapter...")
-            try:
-                self.mms_model.load_adapter("rap")
-                self.logger.info("MMS Rapa Nui adapter loaded.")
-            except Exception as e:
-                self.logger.warning(f"Could not load rap adapter: {e}")
-
-            self.logger.info("Loading Spanish adapter...")
-            try:
-                self.mms_model.load_adapter("spa")
-                self.logger.info("MMS Spanish adapter loaded.")
-            except Exception as e:
-                self.logger.warning(f"Could not load spa adapter: {e}")
+            # Keep the weights of every adapter in memory
+            self._preload_adapters()
 
             self.mms_model.eval()
 
@@ -190,11 +261,7 @@ class OptimizedASRWrapper(ASRModelWrapper):
             self.logger.info("Warming up MMS model...")
             dummy_audio = np.zeros(16000, dtype=np.float32)
             # Use 'spa' as default warmup lang
-            self.mms_processor.tokenizer.set_target_lang("spa")
-
-            # CHANGED: load_adapter instead of set_adapter
-            if hasattr(self.mms_model, "load_adapter"):
-                self.mms_model.load_adapter("spa")
+            self._set_language("spa")
 
             processed = self.mms_processor(
                 dummy_audio, sampling_rate=16000, return_tensors="pt"
@@ -213,38 +280,195 @@ class OptimizedASRWrapper(ASRModelWrapper):
         return {"audio": audio, "sampling_rate": sampling_rate}
 
     def transcribe(self, inputs, lang: str) -> str:
-        audio = inputs["audio"]
-        sampling_rate = inputs["sampling_rate"]
+        audio, sampling_rate = inputs["audio"], inputs["sampling_rate"]
+        return self.transcribe_batch([audio], sampling_rate, lang)[0]
+
+    def _adapter_path(self, lang: str):
+        """Local adapter file of `lang`, if one was given."""
+        path = {"rap": self.rap_adapter_path, "spa": self.spa_adapter_path}.get(lang)
+        if path and os.path.isdir(path):
+            for filename in [f"adapter.{lang}.safetensors", f"adapter.{lang}.bin"]:
+                if os.path.exists(os.path.join(path, filename)):
+                    return os.path.join(path, filename)
+        return path
+
+    def _preload_adapters(self):
+        """
+        Loads the adapter of every supported language once, from the given adapter
+        path or else from the base checkpoint, and keeps its weights as tensors.
+        """
+        for lang in sorted(set(nllb_language_token_map.values())):
+            path = self._adapter_path(lang)
+            self.logger.info(f"Loading {lang} adapter from {path or 'base model'}...")
+            try:
+                if path is None:
+                    self.mms_model.load_adapter(lang)
+                    state_dict = {
+                        name: param.detach().clone()
+                        for name, param in self.mms_model._get_adapters().items()
+                    }
+                elif path.endswith(".safetensors"):
+                    state_dict = load_file(path)
+                else:
+                    state_dict = torch.load(path, map_location="cpu", weights_only=True)
+            except Exception as e:
+                self.logger.warning(f"Could not load {lang} adapter: {e}")
+                continue
+
+            self.adapters[lang] = {
+                name: tensor.to(device=self._device, dtype=self.mms_model.dtype)
+                for name, tensor in state_dict.items()
+            }
+            self.logger.info(f"MMS {lang} adapter loaded.")
+
+        # the weights in the model belong to the last adapter loaded from the hub
+        self.active_adapter = None
+
+    def _activate_adapter(self, lang: str):
+        """Copies the weights of the `lang` adapter into the adapter layers."""
+        if lang == self.active_adapter:
+            return
+        if lang not in self.adapters:
+            self.logger.warning(f"CRITICAL: No adapter loaded for {lang}")
+            return
+
+        weights = self.adapters[lang]
+        # adapters have their own vocabulary, so the lm head may change size
+        vocab_size = weights["lm_head.weight"].shape[0]
+        if vocab_size != self.mms_model.lm_head.out_features:
+            self.mms_model.lm_head = torch.nn.Linear(
+                self.mms_model.config.output_hidden_size,
+                vocab_size,
+                device=self._device,
+                dtype=self.mms_model.dtype,
+            )
+            self.mms_model.config.vocab_size = vocab_size
+            self._adapter_params = None
 
-        # Basic sanitization
-        if isinstance(audio, np.ndarray):
-            if np.isnan(audio).any() or np.isinf(audio).any():
-                audio = np.nan_to_num(audio)
-            audio = audio.astype(np.float32, copy=False)
+        if self._adapter_params is None:
+            self._adapter_params = self.mms_model._get_adapters()
+        with torch.no_grad():
+            for name, param in self._adapter_params.items():
+                param.copy_(weights[name])
+
+        self.mms_model.target_lang = lang
+        self.active_adapter = lang
+        self.logger.debug(f"Switched MMS adapter to {lang}")
 
+    def _set_language(self, lang: str):
         self.logger.info(f"Inference: Invoking MMS model for {lang}")
 
         # Set target language for tokenizer
         self.mms_processor.tokenizer.set_target_lang(lang)
+        self._activate_adapter(lang)
 
-        # PYTRITON FIX: Force the worker process to load the adapter from disk
-        # before trying to set it, curing the "memory loss" from multiprocessing.
-        try:
-            self.mms_model.load_adapter(lang)
-            self.mms_model.set_adapter(lang)
-        except Exception as e:
-            self.logger.warning(f"CRITICAL: Could not load/set adapter for {lang}: {e}")
+    def length_batches(self, lengths: list[int], sampling_rate: int):
+        """
+        Groups clip indices sorted by length, so each group fits the padded audio
+        budget of `max_batch_seconds`. A longer clip is always alone in its group.
+        """
+        max_samples = self.max_batch_seconds * sampling_rate
+        batches = []
+        current = []
+        for idx in sorted(range(len(lengths)), key=lambda idx: lengths[idx]):
+            # sorted ascending, so the new clip sets the padded length
+            if current and lengths[idx] * (len(current) + 1) > max_samples:
+                batches.append(current)
+                current = []
+            current.append(idx)
+        if current:
+            batches.append(current)
+        return batches
+
+    def transcribe_batch(self, audios: list, sampling_rate: int, lang: str):
+        """
+        Transcribe clips of the same language, padded together with an attention
+        mask so each batch runs a single forward pass and a single `batch_decode`.
+        """
+        # Basic sanitization
+        audios = [
+            np.nan_to_num(np.asarray(audio)).astype(np.float32, copy=False)
+            for audio in audios
+        ]
+
+        # long recordings are transcribed by segments, see `transcribe_long`
+        max_samples = self.max_segment_seconds * sampling_rate
+        short_idxs = [idx for idx, a in enumerate(audios) if len(a) <= max_samples]
+
+        texts = [""] * len(audios)
+        with self._lock:
+            # the adapter is set once for the whole group
+            self._set_language(lang)
+            short_texts = self._transcribe_batches(
+                [audios[idx] for idx in short_idxs], sampling_rate
+            )
+        for idx, text in zip(short_idxs, short_texts):
+            texts[idx] = text
+
+        for idx in set(range(len(audios))) - set(short_idxs):
+            for text in self.transcribe_long(audios[idx], sampling_rate, lang):
+                texts[idx] = text
+        return texts
 
-        processed = self.mms_processor(
-            audio, sampling_rate=sampling_rate, return_tensors="pt"
+    def transcribe_long(self, audio, sampling_rate: int, lang: str) -> Iterator[str]:
+        """
+        Transcribe a long recording split in segments at pauses, yielding the text
+        transcribed so far after every `segment_batch_size` segments. Only one
+        batch of segments goes through the model at a time, so memory does not
+        grow with the length of the recording.
+        """
+        audio = np.nan_to_num(np.asarray(audio)).astype(np.float32, copy=False)
+        segments = split_on_silence(
+            audio,
+            sampling_rate,
+            max_segment_seconds=self.max_segment_seconds,
+            overlap_seconds=self.overlap_seconds,
         )
-        input_values = processed.input_values.to(self._device)
+        self.logger.debug(f"Transcribing long recording in {len(segments)} segments")
+
+        text = ""
+        for i in range(0, len(segments), self.segment_batch_size):
+            batch = segments[i : i + self.segment_batch_size]
+            with self._lock:
+                self._set_language(lang)
+                segment_texts = self._transcribe_batches(
+                    [audio[start:end] for start, end, _ in batch], sampling_rate
+                )
+            for (_, _, overlaps), segment_text in zip(batch, segment_texts):
+                text = stitch(text, segment_text, overlaps)
+            yield text
 
-        if self.use_bf16:
-            input_values = input_values.to(torch.bfloat16)
+    def _transcribe_batches(self, audios: list, sampling_rate: int):
+        pad_token_id = self.mms_processor.tokenizer.pad_token_id
 
-        with torch.no_grad():
-            logits = self.mms_model(input_values).logits
+        texts = [None] * len(audios)
+        for idxs in self.length_batches([len(a) for a in audios], sampling_rate):
+            processed = self.mms_processor(
+                [audios[idx] for idx in idxs],
+                sampling_rate=sampling_rate,
+                padding=True,
+                return_attention_mask=True,
+                return_tensors="pt",
+            )
+            input_values = processed.input_values.to(self._device)
+            attention_mask = processed.attention_mask.to(self._device)
+
+            if self.use_bf16:
+                input_values = input_values.to(torch.bfloat16)
+
+            with torch.no_grad():
+                logits = self.mms_model(
+                    input_values, attention_mask=attention_mask
+                ).logits
+
+            # frames computed from padding are decoded as blanks
+            output_lengths = self.mms_model._get_feat_extract_output_lengths(
+                attention_mask.sum(-1)
+            )
+            pred_ids = torch.argmax(logits, dim=-1)
+            frames = torch.arange(pred_ids.shape[1], device=pred_ids.device)
+            pred_ids[frames[None, :] >= output_lengths[:, None]] = pad_token_id
 
-        pred_ids = torch.argmax(logits, dim=-1)
-        return self.mms_processor.batch_decode(pred_ids)[0]
+            for idx, text in zip(idxs, self.mms_processor.batch_decode(pred_ids)):
+                texts[idx] = text
+        return texts
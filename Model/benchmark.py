@@ -0,0 +1,99 @@
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from client import generate_payload
+
+SENTENCES = [
+    "Hola",
+    "¿Cómo estás?",
+    "Mañana vamos a ir a la playa con toda la familia.",
+    "El pescador salió temprano en su bote para recoger las redes.",
+    "Buenos días, ¿me puedes decir dónde queda la escuela?",
+    "La isla tiene muchas historias que los abuelos cuentan a los niños "
+    "durante las noches de invierno, cuando el viento sopla desde el mar.",
+    "Gracias",
+    "Necesito comprar pan, leche y frutas antes de que cierre la tienda.",
+]
+
+
+def _count_tokens(texts, tokenizer=None):
+    if tokenizer is None:
+        return sum(len(text.split()) for text in texts)
+    return sum(len(ids) for ids in tokenizer(texts)["input_ids"])
+
+
+def _request(session, url, text, source_lang, target_lang):
+    payload = generate_payload(text, source_lang, target_lang)
+    response = session.post(url=url, data=json.dumps(payload)).json()
+    if "outputs" not in response:
+        raise Exception(f"Error in the response: {response}")
+    return response["outputs"][0]["data"][0]
+
+
+def run(url, concurrency, num_requests, source_lang, target_lang, tokenizer=None):
+    """Sends `num_requests` translations with `concurrency` parallel clients."""
+    texts = [SENTENCES[i % len(SENTENCES)] for i in range(num_requests)]
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        translations = list(
+            executor.map(
+                lambda text: _request(session, url, text, source_lang, target_lang),
+                texts,
+            )
+        )
+    elapsed = time.perf_counter() - start
+
+    tokens = _count_tokens(translations, tokenizer)
+    return {
+        "concurrency": concurrency,
+        "requests": num_requests,
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(num_requests / elapsed, 2),
+        "tokens_per_sec": round(tokens / elapsed, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Translation server throughput at several concurrency levels."
+    )
+    parser.add_argument("--model-name", type=str, required=True)
+    parser.add_argument("--port", type=int, default=8015)
+    parser.add_argument("--source-lang", type=str, default="spa_Latn")
+    parser.add_argument("--target-lang", type=str, default="rap_Latn")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests-per-client", type=int, default=4)
+    parser.add_argument(
+        "--tokenizer",
+        type=str,
+        default=None,
+        help="Tokenizer used to count output tokens. Defaults to whitespace words.",
+    )
+    args = parser.parse_args()
+
+    tokenizer = None
+    if args.tokenizer:
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+
+    url = f"http://localhost:{args.port}/v2/models/{args.model_name}/infer"
+    # warmup request so model loading is not measured
+    _request(requests.Session(), url, SENTENCES[0], args.source_lang, args.target_lang)
+    for concurrency in args.concurrency:
+        result = run(
+            url,
+            concurrency,
+            concurrency * args.requests_per_client,
+            args.source_lang,
+            args.target_lang,
+            tokenizer,
+        )
+        print(json.dumps(result))
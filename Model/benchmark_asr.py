@@ -0,0 +1,135 @@
+import argparse
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def _clips(batch_size, min_seconds, max_seconds, sampling_rate, seed=0):
+    """Noise clips of random length, so batches need padding."""
+    rng = np.random.default_rng(seed)
+    return [
+        rng.uniform(
+            -0.1, 0.1, int(rng.uniform(min_seconds, max_seconds) * sampling_rate)
+        ).astype(np.float32)
+        for _ in range(batch_size)
+    ]
+
+
+def run(model, batch_size, lang_code, min_seconds, max_seconds, repeat):
+    """Transcribes `batch_size` clips one at a time and in a single batch."""
+    audios = _clips(batch_size, min_seconds, max_seconds, 16000)
+    audio_seconds = sum(len(audio) for audio in audios) / 16000
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for audio in audios:
+            model.predict(audio, 16000, lang_code)
+    sequential = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        model.predict_batch(audios, [16000] * batch_size, [lang_code] * batch_size)
+    batched = (time.perf_counter() - start) / repeat
+
+    return {
+        "batch_size": batch_size,
+        "audio_seconds": round(audio_seconds, 1),
+        "sequential_clips_per_sec": round(batch_size / sequential, 2),
+        "batched_clips_per_sec": round(batch_size / batched, 2),
+        "batched_realtime_factor": round(audio_seconds / batched, 2),
+        "speedup": round(sequential / batched, 2),
+    }
+
+
+def run_endpoint(
+    url, model_name, concurrency, lang_code, min_seconds, max_seconds, repeat
+):
+    """
+    Sends `concurrency * repeat` clips of random length to a running server, with
+    `concurrency` requests in flight, so the batching of the server is measured.
+    """
+    from asr_client import send_audio_to_server
+    from tritonclient.http import InferenceServerClient
+
+    audios = _clips(concurrency * repeat, min_seconds, max_seconds, 16000)
+    audio_seconds = sum(len(audio) for audio in audios) / 16000
+    local = threading.local()
+
+    def send(audio):
+        if not hasattr(local, "client"):
+            local.client = InferenceServerClient(url=url)
+        start = time.perf_counter()
+        send_audio_to_server(local.client, audio, 16000, lang_code, model_name)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(send, audios))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "audio_seconds": round(audio_seconds, 1),
+        "clips_per_sec": round(len(audios) / elapsed, 2),
+        "realtime_factor": round(audio_seconds / elapsed, 2),
+        "p50_latency": round(latencies[len(latencies) // 2], 3),
+        "p99_latency": round(latencies[int(len(latencies) * 0.99)], 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="ASR throughput on CPU transcribing clips one at a time and "
+        "batched with padding. With --url, clips are sent to a running server "
+        "instead, with --batch-sizes requests in flight."
+    )
+    parser.add_argument("--url", type=str, default=None)
+    parser.add_argument("--model-name", type=str, default="asr-model")
+    parser.add_argument("--mms-base-path", type=str, default=None)
+    parser.add_argument("--lang-code", type=str, default="spa_Latn")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--min-seconds", type=float, default=2)
+    parser.add_argument("--max-seconds", type=float, default=8)
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--max-batch-seconds", type=float, default=240)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logger = logging.getLogger("benchmark_asr")
+
+    if args.url:
+        for concurrency in args.batch_sizes:
+            result = run_endpoint(
+                args.url,
+                args.model_name,
+                concurrency,
+                args.lang_code,
+                args.min_seconds,
+                args.max_seconds,
+                args.repeat,
+            )
+            print(json.dumps(result))
+        raise SystemExit
+
+    from asr_models import OptimizedASRWrapper
+
+    model = OptimizedASRWrapper(
+        logger=logger,
+        gpu=False,
+        model_base_path=args.mms_base_path,
+        max_batch_seconds=args.max_batch_seconds,
+    )
+    for batch_size in args.batch_sizes:
+        result = run(
+            model,
+            batch_size,
+            args.lang_code,
+            args.min_seconds,
+            args.max_seconds,
+            args.repeat,
+        )
+        print(json.dumps(result))
@@ -0,0 +1,104 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import resource
+import time
+
+import numpy as np
+
+
+def _speech_like(seconds, sampling_rate, seed=0):
+    """Bursts of noise of 0.5 to 3 seconds separated by 0.2 to 1 second pauses."""
+    rng = np.random.default_rng(seed)
+    audio = np.zeros(int(seconds * sampling_rate), dtype=np.float32)
+    position = 0
+    while position < len(audio):
+        burst = int(rng.uniform(0.5, 3) * sampling_rate)
+        audio[position : position + burst] = rng.uniform(-0.3, 0.3, burst)[
+            : len(audio) - position
+        ]
+        position += burst + int(rng.uniform(0.2, 1) * sampling_rate)
+    return audio
+
+
+def _max_rss_mb():
+    # kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run(mms_base_path, minutes, max_segment_seconds, lang, queue):
+    # imported here so every run loads the model in a fresh process
+    from asr_models import OptimizedASRWrapper
+
+    logger = logging.getLogger("benchmark_asr_longform")
+    model = OptimizedASRWrapper(
+        logger=logger,
+        gpu=False,
+        model_base_path=mms_base_path,
+        max_segment_seconds=max_segment_seconds,
+    )
+    audio = _speech_like(minutes * 60, 16000)
+    base_rss = _max_rss_mb()
+
+    start = time.perf_counter()
+    first = None
+    updates = 0
+    for _ in model.transcribe_long(audio, 16000, lang):
+        first = first or time.perf_counter() - start
+        updates += 1
+    queue.put(
+        {
+            "minutes": minutes,
+            "max_segment_seconds": max_segment_seconds,
+            "seconds": round(time.perf_counter() - start, 2),
+            "first_text_seconds": round(first or 0, 2),
+            "updates": updates,
+            "audio_mb": round(audio.nbytes / 1024 / 1024, 1),
+            "peak_rss_increase_mb": round(_max_rss_mb() - base_rss, 1),
+        }
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Peak memory and latency of long-form ASR on synthetic "
+        "recordings, each measured in a fresh process."
+    )
+    parser.add_argument("--mms-base-path", type=str, default=None)
+    parser.add_argument("--lang", type=str, default="spa")
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--max-segment-seconds", type=float, default=30)
+    parser.add_argument(
+        "--compare-single-pass",
+        action="store_true",
+        help="Also transcribe each recording in a single forward pass.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    context = multiprocessing.get_context("spawn")
+    segment_lengths = [args.max_segment_seconds]
+    if args.compare_single_pass:
+        segment_lengths.append(max(args.minutes) * 60 + 1)
+
+    for max_segment_seconds in segment_lengths:
+        for minutes in args.minutes:
+            queue = context.Queue()
+            process = context.Process(
+                target=_run,
+                args=(
+                    args.mms_base_path,
+                    minutes,
+                    max_segment_seconds,
+                    args.lang,
+                    queue,
+                ),
+            )
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                raise SystemExit(
+                    f"Run of {minutes} minutes failed with exit code {process.exitcode}"
+                )
+            print(json.dumps(queue.get()))
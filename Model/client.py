@@ -49,6 +49,25 @@ def predict(text, source_lang, target_lang, model_name, port=8015):
         return response
 
 
+def stream_predict(text, source_lang, target_lang, model_name, port=8015):
+    """Yields partial translations from the `<model_name>-stream` model."""
+    response = requests.post(
+        url=f"http://localhost:{port}/v2/models/{model_name}-stream/generate_stream",
+        json={
+            "input_text": text,
+            "source_lang": source_lang,
+            "target_lang": target_lang,
+        },
+        stream=True,
+    )
+    for line in response.iter_lines(decode_unicode=True):
+        if line and line.startswith("data:"):
+            event = json.loads(line[len("data:") :])
+            if "error" in event:
+                raise Exception(f"Error in the response: {event}")
+            yield event["translation"]
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--text", type=str, default="Hola como estas")
@@ -56,10 +75,21 @@ if __name__ == "__main__":
     parser.add_argument("--target-lang", type=str, default="arn_Latn")
     parser.add_argument("--model-name", type=str, required=True)
     parser.add_argument("--port", type=int, default=8015)
+    parser.add_argument("--stream", action="store_true", default=False)
     args = parser.parse_args()
 
-    print(
-        predict(
+    if args.stream:
+        for partial in stream_predict(
             args.text, args.source_lang, args.target_lang, args.model_name, args.port
+        ):
+            print(partial)
+    else:
+        print(
+            predict(
+                args.text,
+                args.source_lang,
+                args.target_lang,
+                args.model_name,
+                args.port,
+            )
         )
-    )
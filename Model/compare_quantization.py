@@ -0,0 +1,117 @@
+import argparse
+import json
+import logging
+import time
+from difflib import SequenceMatcher
+
+from model import QUANTIZATION_MODES, MadLadWrapper, NLLBModelWrapper
+
+SPA_SENTENCES = [
+    "Hola, ¿cómo estás?",
+    "Muchas gracias por tu ayuda.",
+    "Mañana vamos a ir a la playa con toda la familia.",
+    "El pescador salió temprano en su bote para recoger las redes.",
+    "¿Dónde queda la escuela?",
+    "La isla tiene muchas historias que los abuelos cuentan a los niños.",
+    "Necesito comprar pan y frutas antes de que cierre la tienda.",
+    "Me gusta mucho bailar y cantar.",
+]
+
+RAP_SENTENCES = [
+    "'Iorana koe",
+    "Pēhē koe?",
+    "Māuru-uru",
+    "Ko au ko Maria",
+    "He aha te me'e nei?",
+    "He oho au ki te kainga",
+    "Ka oho mai",
+    "Ko te ingoa o tō'oku matu'a ko Pedro",
+]
+
+
+def _similarity(a, b):
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def run_mode(model_path, model_type, quantize, logger, max_new_tokens):
+    model_cls = NLLBModelWrapper if model_type == "nllb" else MadLadWrapper
+    model = model_cls(
+        model_path,
+        logger=logger,
+        gpu=False,
+        max_new_tokens=max_new_tokens,
+        quantize=quantize,
+    )
+
+    results = {}
+    for source_lang, target_lang, sentences in [
+        ("spa_Latn", "rap_Latn", SPA_SENTENCES),
+        ("rap_Latn", "spa_Latn", RAP_SENTENCES),
+    ]:
+        # warmup so the first call does not count allocation costs
+        model.predict(sentences[:1], source_lang, target_lang)
+        latencies = []
+        translations = []
+        for sentence in sentences:
+            start = time.perf_counter()
+            translations.extend(model.predict([sentence], source_lang, target_lang))
+            latencies.append(time.perf_counter() - start)
+        results[f"{source_lang}->{target_lang}"] = {
+            "translations": translations,
+            "mean_latency": sum(latencies) / len(latencies),
+            "max_latency": max(latencies),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare accuracy and CPU latency of quantization modes, taking "
+        "`none` (float32) translations as reference."
+    )
+    parser.add_argument("--model-name", "-m", type=str, required=True)
+    parser.add_argument(
+        "--model-type", "-t", type=str, default="nllb", choices=["nllb", "madlad"]
+    )
+    parser.add_argument(
+        "--modes", type=str, nargs="+", default=list(QUANTIZATION_MODES)
+    )
+    parser.add_argument("--max-new-tokens", type=int, default=256)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logger = logging.getLogger("compare_quantization")
+
+    modes = ["none"] + [mode for mode in args.modes if mode != "none"]
+    results = {
+        mode: run_mode(
+            args.model_name, args.model_type, mode, logger, args.max_new_tokens
+        )
+        for mode in modes
+    }
+
+    for mode in modes:
+        for direction, result in results[mode].items():
+            reference = results["none"][direction]["translations"]
+            translations = result["translations"]
+            exact = sum(a == b for a, b in zip(reference, translations))
+            similarity = sum(
+                _similarity(a, b) for a, b in zip(reference, translations)
+            ) / len(reference)
+            print(
+                json.dumps(
+                    {
+                        "mode": mode,
+                        "direction": direction,
+                        "mean_latency": round(result["mean_latency"], 3),
+                        "max_latency": round(result["max_latency"], 3),
+                        "speedup": round(
+                            results["none"][direction]["mean_latency"]
+                            / result["mean_latency"],
+                            2,
+                        ),
+                        "exact_match": exact / len(reference),
+                        "similarity": round(similarity, 3),
+                    }
+                )
+            )
@@ -2,12 +2,15 @@ import json
 import logging
 import os
 from abc import ABC, abstractmethod
-from typing import Optional, Union
+from queue import Empty
+from threading import Lock, Thread
+from typing import Iterator, Optional, Union
 
 import torch
 from dotenv import load_dotenv
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, TextIteratorStreamer
 from transformers.tokenization_utils import BatchEncoding
+from translation_cache import TranslationCache
 
 load_dotenv()
 HF_TOKEN = os.getenv("HF_TOKEN")
@@ -19,6 +22,8 @@ nllb_language_token_map = {
     "arn_u0_n": "fra_Latn",
 }
 
+QUANTIZATION_MODES = ("none", "int8-dynamic", "bf16")
+
 madlad_language_token_map = {
     "arn_a0_n": "<2arn>",
     "arn_r0_n": "<2ape>",
@@ -35,6 +40,10 @@ class ModelWrapper(ABC):
         optimize: bool = False,
         gpu: bool = True,
         max_new_tokens: int = 256,
+        max_batch_size: Optional[int] = None,
+        max_batch_tokens: Optional[int] = None,
+        cache: Optional[TranslationCache] = None,
+        quantize: str = "none",
     ):
         """
         Wrapper for prediction models.
@@ -44,6 +53,21 @@ class ModelWrapper(ABC):
                 Model directory path.
             optimize (`bool`, *optional*, defaults to `True`):
                 Optimize model inference.
+            max_batch_size (`int`, *optional*):
+                Max number of sentences passed to a single `generate` call. If not
+                set, all sentences of a request batch are generated together.
+            max_batch_tokens (`int`, *optional*):
+                Max number of input tokens (including padding) of a single
+                `generate` call. Sentences are grouped in length buckets that fit
+                this budget. If not set, only `max_batch_size` bounds a batch.
+            cache (`TranslationCache`, *optional*):
+                Sentence-level translation cache. Only sentences not found in the
+                cache are passed to `generate`.
+            quantize (`str`, *optional*, defaults to `"none"`):
+                One of `QUANTIZATION_MODES`. `int8-dynamic` applies dynamic int8
+                quantization to the Linear layers (CPU only), `bf16` loads the
+                weights in bfloat16. With `none`, weights are float16 on GPU and
+                float32 on CPU.
         """
         self.logger = logger
         if gpu:
@@ -57,24 +81,63 @@ class ModelWrapper(ABC):
             self.logger.info("CPU mode")
             self._device = torch.device("cpu")
 
+        if quantize not in QUANTIZATION_MODES:
+            raise ValueError(f"Quantization mode {quantize} not supported")
+        if quantize == "int8-dynamic" and self._device.type != "cpu":
+            self.logger.warning(
+                "int8 dynamic quantization is only supported on CPU. Ignoring it."
+            )
+            quantize = "none"
+        self.quantize = quantize
+
         self.tokenizer = AutoTokenizer.from_pretrained(model_path, token=HF_TOKEN)
         self.model = AutoModelForSeq2SeqLM.from_pretrained(
             model_path,
-            torch_dtype=torch.float16,
+            torch_dtype=self.get_dtype(),
             device_map=self._device,
             token=HF_TOKEN,
         )
+        if self.quantize == "int8-dynamic":
+            self.logger.info("Applying int8 dynamic quantization to Linear layers...")
+            self.model = torch.ao.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        self.logger.info(f"Quantization mode: {self.quantize}")
+        self.model_id = getattr(self.model.config, "_name_or_path", model_path)
+        # quantization modes translate differently, and the disk cache outlives
+        # restarts with another mode, so their translations are cached apart
+        self.cache_model_id = f"{self.model_id}@{self.quantize}"
+        # tokenizers keep the languages as state, so the batched and the streaming
+        # models must not tokenize at the same time
+        self._tokenize_lock = Lock()
+        self.cache = cache
         model_info = self.get_model_info()
         self.logger.info(f"Model info: {json.dumps(model_info, indent=2)}")
         self.model.eval()
         self.logger.debug(f"Model loaded on device: {self._device}")
         self.max_new_tokens = max_new_tokens
         self.logger.info(f"Max new tokens set to: {self.max_new_tokens}")
+        self.max_batch_size = max_batch_size
+        self.logger.info(f"Max batch size set to: {self.max_batch_size}")
+        self.max_batch_tokens = max_batch_tokens
+        self.logger.info(f"Max batch tokens set to: {self.max_batch_tokens}")
         if optimize:
             self.logger.debug("Optimizing model...")
             self.optimize()
             self.logger.debug("Model optimized!")
 
+    def get_dtype(self) -> torch.dtype:
+        """
+        Returns the dtype of the model weights for the quantization mode and device.
+        float16 is only used on GPU, since on CPU most kernels fall back to float32
+        emulation. int8 dynamic quantization is applied over float32 weights.
+        """
+        if self.quantize == "bf16":
+            return torch.bfloat16
+        if self._device.type == "cuda" and self.quantize == "none":
+            return torch.float16
+        return torch.float32
+
     def get_model_info(self):
         """
         Returns model configuration information including model architecture,
@@ -166,12 +229,7 @@ class ModelWrapper(ABC):
         ]
         self.logger.debug(f"Sentences after dividing by newlines: {sentences}")
 
-        inputs = self.tokenize(sentences, target_lang, source_lang)
-
-        self.logger.debug(f"Inputs Shape: {inputs['input_ids'].shape}")
-        prediction = self.generate(inputs, target_lang=target_lang)
-        self.logger.debug(f"Prediction Shape: {prediction.shape}")
-        translation = self.tokenizer.batch_decode(prediction, skip_special_tokens=True)
+        translation = self.translate_cached(sentences, source_lang, target_lang)
         self.logger.debug(f"Translation: {translation}")
 
         if any(empty_sentences_mask):
@@ -211,6 +269,213 @@ class ModelWrapper(ABC):
 
         return translation
 
+    def translate_cached(
+        self, sentences: list[str], source_lang: str, target_lang: str
+    ) -> list[str]:
+        """
+        Translates a list of non-empty sentences, looking up each one in the
+        translation cache first. Only missing sentences (deduplicated) are
+        translated by the model, and their translations are stored in the cache.
+        """
+        if self.cache is None:
+            return self.translate_sentences(sentences, source_lang, target_lang)
+
+        keys = [
+            self.cache.make_key(sentence, source_lang, target_lang, self.cache_model_id)
+            for sentence in sentences
+        ]
+        translations = [self.cache.get(key) for key in keys]
+
+        # map each missing key to the indices of the sentences that share it
+        missing = {}
+        for idx, (key, translation) in enumerate(zip(keys, translations)):
+            if translation is None:
+                missing.setdefault(key, []).append(idx)
+
+        if len(missing) > 0:
+            missing_idxs = list(missing.values())
+            new_translations = self.translate_sentences(
+                [sentences[idxs[0]] for idxs in missing_idxs], source_lang, target_lang
+            )
+            for key, idxs, translation in zip(
+                missing.keys(), missing_idxs, new_translations
+            ):
+                self.cache.put(key, translation)
+                for idx in idxs:
+                    translations[idx] = translation
+
+        self.logger.debug(f"Translation cache stats: {self.cache.stats()}")
+        return translations
+
+    def stream_predict(
+        self,
+        text: str,
+        source_lang: str,
+        target_lang: str,
+        timeout: Optional[float] = 60.0,
+    ) -> Iterator[str]:
+        """
+        Translates a text sentence by sentence (split by newlines), yielding the
+        partial translation of the whole text every time new tokens are decoded.
+        Cached sentences are yielded at once.
+
+        Args:
+            text (`str`):
+                Text to be translated.
+            source_lang (`str`):
+                Associated language of the given text.
+            target_lang (`str`):
+                Target language to translate the given text.
+            timeout (`float`, *optional*, defaults to 60.0):
+                Max seconds to wait for the next decoded tokens. A `TimeoutError`
+                is raised if `generate` produces nothing in that time.
+
+        Yields:
+            translation (`str`): Translation of the text decoded so far.
+
+        Raises:
+            Any exception raised by `generate`, once the tokens decoded before it
+            have been yielded.
+        """
+        translated = []
+        for sentence in text.split("\n"):
+            if sentence in {"", " "}:
+                translated.append("")
+                yield "\n".join(translated)
+                continue
+
+            key = None
+            if self.cache is not None:
+                key = self.cache.make_key(
+                    sentence, source_lang, target_lang, self.cache_model_id
+                )
+                translation = self.cache.get(key)
+                if translation is not None:
+                    translated.append(translation)
+                    yield "\n".join(translated)
+                    continue
+
+            with self._tokenize_lock:
+                inputs = self.tokenize([sentence], target_lang, source_lang)
+            streamer = TextIteratorStreamer(
+                self.tokenizer,
+                skip_prompt=True,
+                skip_special_tokens=True,
+                timeout=timeout,
+            )
+            errors = []
+
+            def generate():
+                try:
+                    self.generate(inputs, target_lang=target_lang, streamer=streamer)
+                except Exception as e:
+                    errors.append(e)
+                    # the streamer is only ended by a finished generate
+                    streamer.end()
+
+            # generate runs in background and pushes decoded text to the streamer
+            thread = Thread(target=generate, daemon=True)
+            thread.start()
+            partial = ""
+            try:
+                for new_text in streamer:
+                    if len(new_text) == 0:
+                        continue
+                    partial += new_text
+                    yield "\n".join(translated + [partial])
+            except Empty:
+                raise TimeoutError(f"No tokens generated in {timeout} seconds")
+            thread.join()
+            if errors:
+                raise errors[0]
+
+            partial = partial.strip()
+            if key is not None:
+                self.cache.put(key, partial)
+            translated.append(partial)
+
+        yield "\n".join(translated)
+
+    def length_buckets(self, lengths: list[int]) -> list[list[int]]:
+        """
+        Groups sentences of similar length in micro-batches. Sentences are sorted by
+        token length and added to the current bucket until the padded size of the
+        bucket (`len(bucket) * longest`) exceeds `max_batch_tokens` or the bucket
+        reaches `max_batch_size` sentences. A sentence longer than the token budget
+        gets a bucket on its own.
+
+        Args:
+            lengths (`list`):
+                Token length of each sentence.
+
+        Returns:
+            buckets (`list`): Lists of sentence indices, shortest sentences first.
+        """
+        order = sorted(range(len(lengths)), key=lambda idx: lengths[idx])
+        buckets = []
+        bucket = []
+        for idx in order:
+            # sentences are sorted, so the current one is the longest of the bucket
+            padded_tokens = lengths[idx] * (len(bucket) + 1)
+            exceeds_tokens = (
+                self.max_batch_tokens is not None
+                and padded_tokens > self.max_batch_tokens
+            )
+            exceeds_size = (
+                self.max_batch_size is not None and len(bucket) >= self.max_batch_size
+            )
+            if len(bucket) > 0 and (exceeds_tokens or exceeds_size):
+                buckets.append(bucket)
+                bucket = []
+            bucket.append(idx)
+
+        if len(bucket) > 0:
+            buckets.append(bucket)
+
+        return buckets
+
+    def translate_sentences(
+        self, sentences: list[str], source_lang: str, target_lang: str
+    ) -> list[str]:
+        """
+        Translates a list of non-empty sentences. Sentences are grouped in length
+        buckets (see `length_buckets`) which are generated in turn, so short
+        sentences are neither padded nor decoded up to the longest one. Translations
+        are scattered back to the original order.
+
+        Args:
+            sentences (`list`):
+                List of non-empty sentences to be translated.
+            source_lang (`str`):
+                Associated language of the given sentences.
+            target_lang (`str`):
+                Target language to translate the given sentences.
+
+        Returns:
+            translations (`list`): Translations in the same order as `sentences`.
+        """
+        if len(sentences) == 0:
+            return []
+
+        lengths = [len(ids) for ids in self.tokenizer(sentences)["input_ids"]]
+        buckets = self.length_buckets(lengths)
+        self.logger.debug(f"Bucket sizes: {[len(bucket) for bucket in buckets]}")
+
+        translations = [None] * len(sentences)
+        for bucket in buckets:
+            with self._tokenize_lock:
+                inputs = self.tokenize(
+                    [sentences[idx] for idx in bucket], target_lang, source_lang
+                )
+            self.logger.debug(f"Inputs Shape: {inputs['input_ids'].shape}")
+            prediction = self.generate(inputs, target_lang=target_lang)
+            self.logger.debug(f"Prediction Shape: {prediction.shape}")
+            decoded = self.tokenizer.batch_decode(prediction, skip_special_tokens=True)
+            for idx, text in zip(bucket, decoded):
+                translations[idx] = text
+
+        return translations
+
     def optimize(
         self, tf32: bool = True, torch_compile: bool = True, n_warmup: int = 5
     ):
@@ -269,6 +534,7 @@ class NLLBModelWrapper(ModelWrapper):
         self,
         inputs: Union[BatchEncoding, dict[str, torch.Tensor]],
         target_lang: Optional[str] = None,
+        **generate_kwargs,
     ):
         if target_lang is None:
             raise ValueError("`target_lang` is required in NLLB models.")
@@ -285,6 +551,7 @@ class NLLBModelWrapper(ModelWrapper):
             **inputs,
             forced_bos_token_id=forced_bos_token_id,
             max_new_tokens=self.max_new_tokens,
+            **generate_kwargs,
         )
         return prediction
 
@@ -315,10 +582,11 @@ class MadLadWrapper(ModelWrapper):
     def generate(
         self,
         inputs: Union[BatchEncoding, dict[str, torch.Tensor]],
-        **kwargs,  # ignore any extra arguments like `target_lang`
+        target_lang: Optional[str] = None,  # ignored, it's part of the input text
+        **generate_kwargs,
     ):
         prediction = self.model.generate(
-            **inputs, max_new_tokens=self.max_new_tokens
+            **inputs, max_new_tokens=self.max_new_tokens, **generate_kwargs
         )  # start with `<unk>` token
         return prediction
 
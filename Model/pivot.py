@@ -0,0 +1,115 @@
+import logging
+from queue import Queue
+from threading import Thread
+
+from model import ModelWrapper
+
+
+class PivotTranslator:
+    """
+    Translates between a native language and a language only known by the raw model
+    in a single call, pivoting through `pivot_lang`. The first hop runs in a
+    background thread in chunks of `chunk_size` sentences, so the second hop of a
+    chunk overlaps with the first hop of the next one.
+
+    Args:
+        native_model (`ModelWrapper`):
+            Model that translates between the native languages and `pivot_lang`.
+        raw_model (`ModelWrapper`):
+            Model that translates between `pivot_lang` and any other language.
+        native_langs (`list[str]`):
+            Language codes handled by `native_model`.
+        logger (`logging.Logger`):
+            Logger of the server.
+        pivot_lang (`str`, *optional*, defaults to `spa_Latn`):
+            Language both models share.
+        chunk_size (`int`, *optional*, defaults to 8):
+            Number of sentences translated per hop before handing them over.
+    """
+
+    def __init__(
+        self,
+        native_model: ModelWrapper,
+        raw_model: ModelWrapper,
+        native_langs: list[str],
+        logger: logging.Logger,
+        pivot_lang: str = "spa_Latn",
+        chunk_size: int = 8,
+    ):
+        self.native_model = native_model
+        self.raw_model = raw_model
+        self.native_langs = set(native_langs)
+        self.logger = logger
+        self.pivot_lang = pivot_lang
+        self.chunk_size = chunk_size
+
+    def hops(self, source_lang: str, target_lang: str):
+        """Returns the models of the first and second hop."""
+        if source_lang in self.native_langs:
+            return self.native_model, self.raw_model
+        if target_lang in self.native_langs:
+            return self.raw_model, self.native_model
+        raise ValueError(
+            f"Pivot translation needs a native language: {source_lang} -> "
+            f"{target_lang}"
+        )
+
+    def predict(
+        self, texts: list[str], source_lang: str, target_lang: str
+    ) -> list[str]:
+        """
+        Translates `texts` from `source_lang` to `target_lang` through `pivot_lang`.
+        Texts are split by newlines so both hops work on single sentences.
+        """
+        first_model, second_model = self.hops(source_lang, target_lang)
+
+        # (text index, line index) of every non empty line
+        positions = []
+        sentences = []
+        lines = [text.split("\n") for text in texts]
+        for text_idx, text_lines in enumerate(lines):
+            for line_idx, line in enumerate(text_lines):
+                if line in {"", " "}:
+                    text_lines[line_idx] = ""
+                else:
+                    positions.append((text_idx, line_idx))
+                    sentences.append(line)
+
+        chunks = [
+            sentences[i : i + self.chunk_size]
+            for i in range(0, len(sentences), self.chunk_size)
+        ]
+        pivot_chunks = Queue()
+
+        def first_hop():
+            try:
+                for chunk in chunks:
+                    pivot_chunks.put(
+                        first_model.translate_cached(
+                            chunk, source_lang, self.pivot_lang
+                        )
+                    )
+            except Exception as e:
+                pivot_chunks.put(e)
+
+        thread = Thread(target=first_hop, daemon=True)
+        thread.start()
+
+        translations = []
+        for _ in chunks:
+            pivot_chunk = pivot_chunks.get()
+            if isinstance(pivot_chunk, Exception):
+                raise pivot_chunk
+            translations.extend(
+                second_model.translate_cached(pivot_chunk, self.pivot_lang, target_lang)
+            )
+        thread.join()
+
+        self.logger.debug(
+            f"Pivot {source_lang} -> {self.pivot_lang} -> {target_lang}: "
+            f"{len(sentences)} sentences in {len(chunks)} chunks"
+        )
+
+        for (text_idx, line_idx), translation in zip(positions, translations):
+            lines[text_idx][line_idx] = translation
+        return ["\n".join(text_lines) for text_lines in lines]
@@ -0,0 +1,102 @@
+import numpy as np
+
+
+def split_on_silence(
+    audio: np.ndarray,
+    sampling_rate: int,
+    max_segment_seconds: float = 20,
+    overlap_seconds: float = 1,
+    min_silence_seconds: float = 0.3,
+    silence_db: float = -35,
+    frame_seconds: float = 0.025,
+) -> list[tuple[int, int, bool]]:
+    """
+    Splits a long recording in segments of at most `max_segment_seconds`, cutting
+    at pauses found with frame energy. Frames more than `silence_db` below the
+    loudest frame are silent, and a pause is a run of `min_silence_seconds` of
+    silent frames. Segments are cut at the middle of the last pause that fits; if
+    there is none, the cut is forced and the next segment starts `overlap_seconds`
+    earlier, so a word cut in half is fully heard in one of them. Fully silent
+    segments are dropped.
+
+    Returns:
+        segments (`list[tuple[int, int, bool]]`): Start and end sample of each
+        segment, and whether it overlaps the previous one.
+
+    Raises:
+        ValueError: If segments are not longer than the overlap, since a forced
+        cut would then never move forward.
+    """
+    max_samples = int(max_segment_seconds * sampling_rate)
+    overlap = int(overlap_seconds * sampling_rate)
+    if max_samples <= overlap:
+        raise ValueError(
+            f"max_segment_seconds ({max_segment_seconds}) must be longer than "
+            f"overlap_seconds ({overlap_seconds})"
+        )
+
+    frame = max(1, int(frame_seconds * sampling_rate))
+    num_frames = len(audio) // frame
+    if num_frames == 0:
+        return [(0, len(audio), False)] if len(audio) else []
+
+    # frame energy in dB below the loudest frame
+    frames = audio[: num_frames * frame].reshape(num_frames, frame)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    db = 20 * np.log10(rms / (rms.max() + 1e-10) + 1e-10)
+    silent = db < silence_db
+
+    # middle of every pause, in samples
+    min_silence = max(1, int(min_silence_seconds / frame_seconds))
+    cuts = []
+    run_start = None
+    for idx, is_silent in enumerate(np.append(silent, False)):
+        if is_silent and run_start is None:
+            run_start = idx
+        elif not is_silent and run_start is not None:
+            if idx - run_start >= min_silence:
+                cuts.append((run_start + idx) // 2 * frame)
+            run_start = None
+    cuts = np.array(cuts, dtype=np.int64)
+
+    segments = []
+    start = 0
+    overlaps_previous = False
+    while start < len(audio):
+        end = start + max_samples
+        next_overlap = False
+        if end >= len(audio):
+            end = len(audio)
+            next_start = end
+        else:
+            window = cuts[(cuts > start) & (cuts <= end)]
+            if len(window):
+                end = next_start = int(window[-1])
+            else:
+                next_start = end - overlap
+                next_overlap = True
+
+        if not silent[start // frame : max(start // frame + 1, end // frame)].all():
+            segments.append((start, end, overlaps_previous))
+            overlaps_previous = next_overlap
+        else:
+            # nothing was said, the next segment has nothing to overlap
+            overlaps_previous = False
+        start = next_start
+    return segments
+
+
+def stitch(text: str, segment_text: str, overlaps: bool, max_words: int = 8) -> str:
+    """
+    Appends the transcription of a segment. If the segment overlaps the previous
+    one, the longest run of up to `max_words` words that ends `text` and starts
+    `segment_text` is only kept once.
+    """
+    words = segment_text.split()
+    if overlaps:
+        previous = text.split()
+        for size in range(min(max_words, len(previous), len(words)), 0, -1):
+            if previous[-size:] == words[:size]:
+                words = words[size:]
+                break
+    return " ".join([text, *words]).strip() if words else text
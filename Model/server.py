@@ -1,13 +1,16 @@
 # server
 import argparse
 import logging
+from typing import Union
 
 import numpy as np
 from dotenv import load_dotenv
-from model import MadLadWrapper, ModelWrapper, NLLBModelWrapper
+from model import QUANTIZATION_MODES, MadLadWrapper, ModelWrapper, NLLBModelWrapper
+from pivot import PivotTranslator
 from pytriton.decorators import batch, first_value, group_by_values
 from pytriton.model_config import DynamicBatcher, ModelConfig, Tensor
 from pytriton.triton import Triton, TritonConfig, TritonLifecyclePolicy
+from translation_cache import TranslationCache
 
 load_dotenv()
 
@@ -17,7 +20,7 @@ class _InferFuncWrapper:
     Class wrapper of inference func for triton. Used to also store the model variable
     """
 
-    def __init__(self, model: ModelWrapper, logger):
+    def __init__(self, model: Union[ModelWrapper, PivotTranslator], logger):
         self._model = model
         self._logger = logger
 
@@ -39,8 +42,9 @@ class _InferFuncWrapper:
         Returns
             image: Batch of generated images
         """
+        # texts of every queued request with the same language pair are translated
+        # together, so a single `generate` call pads the whole group
         texts, source_lang, target_lang = inputs.values()
-        # For now, we only support batch size 1
 
         self._logger.debug(f"texts: {texts}")
         self._logger.debug(f"source_lang: {source_lang}")
@@ -64,10 +68,64 @@ class _InferFuncWrapper:
         return {"translation": translations}
 
 
-def _infer_function_factory(
-    num_copies, logger, folder_path, optimize, gpu, model_type, max_new_tokens
+class _StreamInferFuncWrapper:
+    """
+    Class wrapper of the streaming inference func for triton. The model is decoupled,
+    so several responses are sent for a single request: one every time new tokens
+    are decoded, each one with the translation of the whole text decoded so far.
+    """
+
+    def __init__(self, model: ModelWrapper, logger, timeout=None):
+        self._model = model
+        self._logger = logger
+        self._timeout = timeout
+
+    def __call__(self, requests):
+        # batching is disabled, so inputs have no batch dimension
+        for request in requests:
+            text, source_lang, target_lang = (
+                np.char.decode(request[name].astype("bytes"), "utf-8").item()
+                for name in ("input_text", "source_lang", "target_lang")
+            )
+            text = text.replace("\\n", "\n")
+            self._logger.debug(f"Streaming {source_lang} -> {target_lang}: {text}")
+
+            # errors of generate are raised here, which ends the request with them
+            for partial in self._model.stream_predict(
+                text, source_lang, target_lang, timeout=self._timeout
+            ):
+                yield [{"translation": np.char.encode(np.array([partial]), "utf-8")}]
+
+
+def _load_models(
+    num_copies,
+    logger,
+    folder_path,
+    optimize,
+    gpu,
+    model_type,
+    max_new_tokens,
+    generate_batch_size=None,
+    max_batch_tokens=None,
+    cache_size_mb=0,
+    cache_db=None,
+    cache_disk_size_mb=None,
+    quantize="none",
 ):
-    infer_fns = []
+    # a single cache is shared by all model copies
+    cache = None
+    if cache_size_mb > 0:
+        logger.info(f"Sentence translation cache enabled ({cache_size_mb} MB)")
+        cache = TranslationCache(
+            max_bytes=cache_size_mb * 1024 * 1024,
+            logger=logger,
+            db_path=cache_db,
+            max_disk_bytes=(
+                cache_disk_size_mb * 1024 * 1024 if cache_disk_size_mb else None
+            ),
+        )
+
+    models = []
     for _ in range(num_copies):
         logger.info(f"Loading model at {folder_path}")
         # TO DO: CHECK IF MODEL NAME IN FOLDER PATH
@@ -80,10 +138,14 @@ def _infer_function_factory(
             optimize=optimize,
             gpu=gpu,
             max_new_tokens=max_new_tokens,
+            max_batch_size=generate_batch_size,
+            max_batch_tokens=max_batch_tokens,
+            cache=cache,
+            quantize=quantize,
         )
         logger.info("Model loaded!")
-        infer_fns.append(_InferFuncWrapper(model=model, logger=logger))
-    return infer_fns
+        models.append(model)
+    return models
 
 
 def _parse_args():
@@ -144,6 +206,102 @@ def _parse_args():
         default=256,
         help="Max new tokens to generate",
     )
+    parser.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=16,
+        help="Max number of requests grouped by the Triton dynamic batcher.",
+    )
+    parser.add_argument(
+        "--max-queue-delay",
+        type=int,
+        default=1000,
+        help="Max time in microseconds a request waits in queue to be batched.",
+    )
+    parser.add_argument(
+        "--generate-batch-size",
+        type=int,
+        default=None,
+        help="Max sentences per generate call. Defaults to the whole request batch.",
+    )
+    parser.add_argument(
+        "--max-batch-tokens",
+        type=int,
+        default=4096,
+        help="Max padded input tokens per generate call. Sentences are grouped in "
+        "length buckets that fit this budget.",
+    )
+    parser.add_argument(
+        "--quantize",
+        type=str,
+        default="none",
+        choices=QUANTIZATION_MODES,
+        help="Quantization mode. int8-dynamic is meant for CPU-only deployments.",
+    )
+    parser.add_argument(
+        "--cache-size-mb",
+        type=int,
+        default=64,
+        help="Size in MB of the in-memory sentence translation cache. 0 disables it.",
+    )
+    parser.add_argument(
+        "--cache-db",
+        type=str,
+        default=None,
+        help="SQLite file where cached translations are persisted across restarts.",
+    )
+    parser.add_argument(
+        "--cache-disk-size-mb",
+        type=int,
+        default=None,
+        help="Max size in MB of the persisted cache. Unbounded by default.",
+    )
+    parser.add_argument(
+        "--enable-streaming",
+        action="store_true",
+        default=False,
+        help="Also serve a decoupled `<model-name>-stream` model that streams "
+        "partial translations.",
+    )
+    parser.add_argument(
+        "--stream-timeout",
+        type=float,
+        default=60.0,
+        help="Max seconds a streaming request waits for the next decoded tokens.",
+    )
+    parser.add_argument(
+        "--pivot-model-name",
+        type=str,
+        default=None,
+        help="Raw model loaded next to the main one to serve a `<model-name>-pivot` "
+        "model, which translates native languages through `--pivot-lang` in one call.",
+    )
+    parser.add_argument(
+        "--pivot-model-type",
+        type=str,
+        default="nllb",
+        choices=["nllb", "madlad"],
+    )
+    parser.add_argument(
+        "--pivot-lang",
+        type=str,
+        default="spa_Latn",
+        help="Language shared by the main and pivot models.",
+    )
+    parser.add_argument(
+        "--native-langs",
+        type=str,
+        nargs="+",
+        default=["rap_Latn", "arn_Latn"],
+        help="Languages translated by the main model when pivoting.",
+    )
+    parser.add_argument(
+        "--pivot-chunk-size",
+        type=int,
+        default=8,
+        help="Sentences per pivot hop. The second hop of a chunk runs while the "
+        "first hop of the next one is generated.",
+    )
     return parser.parse_args()
 
 
@@ -170,19 +328,54 @@ def main():
         cache_config=[f"local,size={10 * 1024 * 1024}"],
     )
     policy = TritonLifecyclePolicy(launch_triton_on_startup=False)
+    models = _load_models(
+        num_copies=args.copies,
+        logger=logger,
+        folder_path=args.model_name,
+        optimize=args.optimize,
+        gpu=args.gpu,
+        model_type=args.model_type,
+        max_new_tokens=args.max_new_tokens,
+        generate_batch_size=args.generate_batch_size,
+        max_batch_tokens=args.max_batch_tokens,
+        cache_size_mb=args.cache_size_mb,
+        cache_db=args.cache_db,
+        cache_disk_size_mb=args.cache_disk_size_mb,
+        quantize=args.quantize,
+    )
+    pivots = []
+    if args.pivot_model_name:
+        raw_models = _load_models(
+            num_copies=args.copies,
+            logger=logger,
+            folder_path=args.pivot_model_name,
+            optimize=args.optimize,
+            gpu=args.gpu,
+            model_type=args.pivot_model_type,
+            max_new_tokens=args.max_new_tokens,
+            generate_batch_size=args.generate_batch_size,
+            max_batch_tokens=args.max_batch_tokens,
+            cache_size_mb=args.cache_size_mb,
+            quantize=args.quantize,
+        )
+        pivots = [
+            PivotTranslator(
+                native_model=model,
+                raw_model=raw_model,
+                native_langs=args.native_langs,
+                logger=logger,
+                pivot_lang=args.pivot_lang,
+                chunk_size=args.pivot_chunk_size,
+            )
+            for model, raw_model in zip(models, raw_models)
+        ]
     with Triton(config=config, triton_lifecycle_policy=policy) as triton:
         # bind the model with its inference call and configuration
         triton.bind(
             model_name=model_name.replace("/", "--"),
-            infer_func=_infer_function_factory(
-                num_copies=args.copies,
-                logger=logger,
-                folder_path=args.model_name,
-                optimize=args.optimize,
-                gpu=args.gpu,
-                model_type=args.model_type,
-                max_new_tokens=args.max_new_tokens,
-            ),
+            infer_func=[
+                _InferFuncWrapper(model=model, logger=logger) for model in models
+            ],
             inputs=[
                 Tensor(name="input_text", dtype=np.bytes_, shape=(1,)),
                 Tensor(name="source_lang", dtype=np.bytes_, shape=(1,)),
@@ -192,14 +385,58 @@ def main():
                 Tensor(name="translation", dtype=np.bytes_, shape=(1,)),
             ],
             config=ModelConfig(
-                max_batch_size=4,
+                max_batch_size=args.max_batch_size,
                 batcher=DynamicBatcher(
-                    max_queue_delay_microseconds=100,
+                    max_queue_delay_microseconds=args.max_queue_delay,
                 ),
                 response_cache=True,
             ),
             strict=True,
         )
+        if args.enable_streaming:
+            # streaming shares the loaded models, served through `generate_stream`
+            triton.bind(
+                model_name=f"{model_name.replace('/', '--')}-stream",
+                infer_func=[
+                    _StreamInferFuncWrapper(
+                        model=model, logger=logger, timeout=args.stream_timeout
+                    )
+                    for model in models
+                ],
+                inputs=[
+                    Tensor(name="input_text", dtype=np.bytes_, shape=(1,)),
+                    Tensor(name="source_lang", dtype=np.bytes_, shape=(1,)),
+                    Tensor(name="target_lang", dtype=np.bytes_, shape=(1,)),
+                ],
+                outputs=[
+                    Tensor(name="translation", dtype=np.bytes_, shape=(1,)),
+                ],
+                config=ModelConfig(batching=False, decoupled=True),
+                strict=True,
+            )
+        if pivots:
+            triton.bind(
+                model_name=f"{model_name.replace('/', '--')}-pivot",
+                infer_func=[
+                    _InferFuncWrapper(model=pivot, logger=logger) for pivot in pivots
+                ],
+                inputs=[
+                    Tensor(name="input_text", dtype=np.bytes_, shape=(1,)),
+                    Tensor(name="source_lang", dtype=np.bytes_, shape=(1,)),
+                    Tensor(name="target_lang", dtype=np.bytes_, shape=(1,)),
+                ],
+                outputs=[
+                    Tensor(name="translation", dtype=np.bytes_, shape=(1,)),
+                ],
+                config=ModelConfig(
+                    max_batch_size=args.max_batch_size,
+                    batcher=DynamicBatcher(
+                        max_queue_delay_microseconds=args.max_queue_delay,
+                    ),
+                    response_cache=True,
+                ),
+                strict=True,
+            )
         # serve the model for inference
         triton.serve()
 
@@ -5,8 +5,8 @@ import os
 
 import numpy as np
 import torch
+from asr_batcher import ASRBatcher
 from asr_models import OptimizedASRWrapper
-from pytriton.decorators import batch
 from pytriton.model_config import DynamicBatcher, ModelConfig, Tensor
 from pytriton.triton import Triton, TritonConfig
 
@@ -19,52 +19,77 @@ class _ASRInferFuncWrapper:
     Class wrapper for ASR inference in Triton.
     """
 
-    def __init__(self, asr_wrapper, logger):
-        self._asr_wrapper = asr_wrapper
+    def __init__(self, batcher, logger):
+        self._batcher = batcher
         self._logger = logger
 
-    @batch
-    def __call__(self, **inputs) -> dict:
-        """Main inference function for ASR."""
-        # The @batch decorator provides inputs as numpy arrays with a batch dimension.
-        audio_arrays, sampling_rates, lang_codes = inputs.values()
+    def __call__(self, requests) -> list:
+        """
+        Main inference function for ASR. Triton only groups requests whose clips
+        have the same length, so clips are handed to the in-process batcher,
+        which transcribes them together with those of the other instances. The
+        texts are split back by request.
+        """
+        audios, sampling_rates, lang_codes = [], [], []
+        request_sizes = []
+        for request in requests:
+            batch_size = request["audio"].shape[0]
+            request_sizes.append(batch_size)
+            for i in range(batch_size):
+                audios.append(request["audio"][i])  # Shape: (num_samples,)
+                sampling_rates.append(int(request["sampling_rate"][i, 0]))
+                lang_codes.append(request["lang_code"][i, 0].decode("utf-8"))
+
+        self._logger.debug(
+            f"Request of {len(audios)} clips, lengths {[len(a) for a in audios]}, "
+            f"languages {lang_codes}"
+        )
+        transcribed_texts = self._batcher.transcribe(audios, sampling_rates, lang_codes)
+
+        # The output tensor shape is (-1,), so we need a flat array of bytes.
+        responses = []
+        start = 0
+        for batch_size in request_sizes:
+            texts = transcribed_texts[start : start + batch_size]
+            responses.append(
+                {"text": np.array([s.encode("utf-8") for s in texts], dtype=np.object_)}
+            )
+            start += batch_size
+        return responses
 
-        batch_size = audio_arrays.shape[0]
-        transcribed_texts = []
 
-        for i in range(batch_size):
-            # Extract single item from the batch
-            audio = audio_arrays[i]  # Shape: (num_samples,)
-            # Correctly index the single value from the (1,) shaped array
-            sampling_rate = int(sampling_rates[i, 0])
-            lang_code = lang_codes[i, 0].decode("utf-8")
+class _ASRStreamInferFuncWrapper:
+    """
+    Class wrapper for streaming ASR inference in Triton. The model is decoupled,
+    so a long recording gets several responses, each one with the text
+    transcribed so far.
+    """
 
-            self._logger.debug(
-                f" {audio.shape}, sampling rate {sampling_rate}, language {lang_code}"
-            )
+    def __init__(self, asr_wrapper, logger):
+        self._asr_wrapper = asr_wrapper
+        self._logger = logger
 
-            # Call ASR predict
-            transcription = self._asr_wrapper.predict(audio, sampling_rate, lang_code)
-            transcribed_texts.append(transcription)
+    def __call__(self, requests):
+        # batching is disabled, so inputs have no batch dimension
+        for request in requests:
+            audio = request["audio"]
+            sampling_rate = int(request["sampling_rate"][0])
+            lang_code = request["lang_code"][0].decode("utf-8")
+            self._logger.debug(f"Streaming {audio.shape[0]} samples in {lang_code}")
 
-        # Return batch of results
-        # The output tensor shape is (-1,), so we need a flat array of bytes.
-        return {
-            "text": np.array(
-                [s.encode("utf-8") for s in transcribed_texts], dtype=np.object_
-            )
-        }
+            for text in self._asr_wrapper.predict_long(audio, sampling_rate, lang_code):
+                yield [{"text": np.array([text.encode("utf-8")], dtype=np.object_)}]
 
 
-def _asr_infer_function_factory(num_copies, logger, asr_wrapper):
+def _asr_infer_function_factory(num_copies, logger, batcher):
     """
     Factory for ASR inference function, supporting multiple copies.
-    It uses a pre-initialized asr_wrapper.
+    All copies share the batcher of the pre-initialized asr_wrapper.
     """
     infer_fns = []
     for i in range(num_copies):
         logger.info(f"Creating inference function copy {i + 1}/{num_copies}")
-        infer_fns.append(_ASRInferFuncWrapper(asr_wrapper=asr_wrapper, logger=logger))
+        infer_fns.append(_ASRInferFuncWrapper(batcher=batcher, logger=logger))
 
     return infer_fns
 
@@ -123,9 +148,11 @@ def _parse_args():
     parser.add_argument(
         "--copies",
         type=int,
-        default=1,
+        default=None,
         required=False,
-        help="Number of copies of the model to load",
+        help="Number of Triton instances of the model. They share the loaded "
+        "model and each one holds a request while it waits in the in-process "
+        "batcher, so it defaults to --max-batch-size.",
     )
 
     parser.add_argument(
@@ -149,7 +176,51 @@ def _parse_args():
         help="Use bfloat16 precision for model weights (if supported)",
     )
 
-    return parser.parse_args()
+    parser.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=16,
+        help="Max number of clips transcribed together by the in-process batcher.",
+    )
+
+    parser.add_argument(
+        "--max-queue-delay",
+        type=int,
+        default=5000,
+        help="Max time in microseconds a clip waits in the in-process batcher for "
+        "others to join its batch.",
+    )
+
+    parser.add_argument(
+        "--max-batch-seconds",
+        type=float,
+        default=None,
+        help="Max padded seconds of audio per forward pass. Larger batches are "
+        "split in groups of clips with similar length. Defaults to 240 on GPU and "
+        "0 (one clip per pass) on CPU.",
+    )
+
+    parser.add_argument(
+        "--max-segment-seconds",
+        type=float,
+        default=30,
+        help="Recordings longer than this are split at pauses in segments of at "
+        "most this length, transcribed a few at a time. Must be longer than the "
+        "1 second overlap of segments cut without a pause.",
+    )
+
+    parser.add_argument(
+        "--enable-streaming",
+        action="store_true",
+        default=False,
+        help="Also serve a decoupled `<model-name>-stream` model that returns the "
+        "text of long recordings incrementally.",
+    )
+
+    args = parser.parse_args()
+    if args.max_segment_seconds <= 1:
+        parser.error("--max-segment-seconds must be longer than 1 second")
+    return args
 
 
 def main():
@@ -184,13 +255,24 @@ def main():
         use_bf16=use_bf16,
         use_tf32=use_tf32,
         hf_token=hf_token,
+        max_batch_seconds=args.max_batch_seconds,
+        max_segment_seconds=args.max_segment_seconds,
     )
 
     logger.info("ASR model loaded successfully!")
 
+    # clips of every instance are transcribed together, whatever their length
+    batcher = ASRBatcher(
+        asr_wrapper,
+        logger=logger,
+        max_batch_size=args.max_batch_size,
+        max_delay=args.max_queue_delay / 1e6,
+    )
+    copies = args.copies or args.max_batch_size
+
     # Create inference functions from the single loaded wrapper
     infer_fns = _asr_infer_function_factory(
-        num_copies=args.copies, logger=logger, asr_wrapper=asr_wrapper
+        num_copies=copies, logger=logger, batcher=batcher
     )
 
     config = TritonConfig(
@@ -217,10 +299,28 @@ def main():
                 Tensor(name="text", dtype=np.bytes_, shape=(-1,)),
             ],
             config=ModelConfig(
-                max_batch_size=4,
-                batcher=DynamicBatcher(max_queue_delay_microseconds=100),
+                max_batch_size=args.max_batch_size,
+                # requests are not delayed here, the in-process batcher waits
+                batcher=DynamicBatcher(max_queue_delay_microseconds=0),
             ),
         )
+        if args.enable_streaming:
+            triton.bind(
+                model_name=f"{model_name}-stream",
+                infer_func=[
+                    _ASRStreamInferFuncWrapper(asr_wrapper=asr_wrapper, logger=logger)
+                    for _ in range(args.copies or 1)
+                ],
+                inputs=[
+                    Tensor(name="audio", dtype=np.float32, shape=(-1,)),
+                    Tensor(name="sampling_rate", dtype=np.int32, shape=(1,)),
+                    Tensor(name="lang_code", dtype=np.bytes_, shape=(1,)),
+                ],
+                outputs=[
+                    Tensor(name="text", dtype=np.bytes_, shape=(1,)),
+                ],
+                config=ModelConfig(batching=False, decoupled=True),
+            )
         logger.info("Model bound successfully. Starting server...")
         triton.serve()
 
@@ -5,7 +5,6 @@ import logging
 import numpy as np
 import torch
 from dotenv import load_dotenv
-from pytriton.decorators import batch
 from pytriton.model_config import DynamicBatcher, ModelConfig, Tensor
 from pytriton.triton import Triton, TritonConfig, TritonLifecyclePolicy
 from speech_models import MMSTTSWrapper
@@ -22,41 +21,51 @@ class _TTSInferFuncWrapper:
         self._tts_wrapper = tts_wrapper
         self._logger = logger
 
-    @batch
-    def __call__(self, **inputs) -> np.ndarray:
+    def __call__(self, requests) -> list:
         """
-        Main inference function for TTS.
+        Main inference function for TTS. Receives the requests grouped by the
+        dynamic batcher without merging them, since waveforms have different
+        lengths. All texts are synthesized together and the waveforms are split
+        back by request, padded with zeros to the longest one of each request.
         """
-        texts, lang_codes = inputs.values()
-
-        self._logger.debug(f"texts: {texts}")
-        self._logger.debug(f"lang_codes: {lang_codes}")
-
-        texts = [
-            np.char.decode(t.astype("bytes"), "utf-8").item().replace("\\n", "\n")
-            for t in texts
-        ]
-        lang_codes = [
-            np.char.decode(lc.astype("bytes"), "utf-8").item() for lc in lang_codes
-        ]
-
-        self._logger.debug(f"Texts: {texts}")
-        self._logger.debug(f"Lang codes: {lang_codes}")
-
-        # For simplicity, assume batch size 1; process first item
-        text = texts[0]
-        lang_code = lang_codes[0]
-
-        # Call TTS predict
-        waveform = self._tts_wrapper.predict(text, lang_code)
-        # Convert torch tensor to numpy
+        texts, lang_codes = [], []
+        request_sizes = []
+        for request in requests:
+            batch_size = request["text"].shape[0]
+            request_sizes.append(batch_size)
+            for i in range(batch_size):
+                texts.append(request["text"][i, 0].decode("utf-8").replace("\\n", "\n"))
+                lang_codes.append(request["lang_code"][i, 0].decode("utf-8"))
+
+        self._logger.debug(f"Batch of {len(texts)} texts, languages {lang_codes}")
         # Cast to float32 because numpy doesn't support bfloat16
-        waveform_np = waveform.to(torch.float32).cpu().numpy()
-
-        return {"waveform": waveform_np}
-
+        waveforms = [
+            waveform.to(torch.float32).cpu().numpy()
+            for waveform in self._tts_wrapper.predict_batch(texts, lang_codes)
+        ]
 
-def _tts_infer_function_factory(num_copies, logger, gpu, model_base_path=None):
+        responses = []
+        start = 0
+        for batch_size in request_sizes:
+            request_waveforms = waveforms[start : start + batch_size]
+            output = np.zeros(
+                (batch_size, max(len(w) for w in request_waveforms)), dtype=np.float32
+            )
+            for i, waveform in enumerate(request_waveforms):
+                output[i, : len(waveform)] = waveform
+            responses.append({"waveform": output})
+            start += batch_size
+        return responses
+
+
+def _tts_infer_function_factory(
+    num_copies,
+    logger,
+    gpu,
+    model_base_path=None,
+    max_batch_sentences=16,
+    crossfade_seconds=0.02,
+):
     """
     Factory for TTS inference function. Creates multiple copies of the model.
 
@@ -65,6 +74,8 @@ def _tts_infer_function_factory(num_copies, logger, gpu, model_base_path=None):
         logger: Logger instance
         gpu (bool): Whether to use GPU
         model_base_path (str): Base path to model directory
+        max_batch_sentences (int): Max sentences per forward pass
+        crossfade_seconds (float): Crossfade between the sentences of a text
 
     Returns:
         list: List of inference function wrappers
@@ -72,7 +83,9 @@ def _tts_infer_function_factory(num_copies, logger, gpu, model_base_path=None):
     infer_fns = []
     for i in range(num_copies):
         logger.info(f"Loading TTS model copy {i+1}/{num_copies}")
-        tts_wrapper = MMSTTSWrapper(logger, gpu, model_base_path)
+        tts_wrapper = MMSTTSWrapper(
+            logger, gpu, model_base_path, max_batch_sentences, crossfade_seconds
+        )
         logger.info(f"TTS model copy {i+1} loaded!")
         infer_fns.append(_TTSInferFuncWrapper(tts_wrapper=tts_wrapper, logger=logger))
     return infer_fns
@@ -140,6 +153,30 @@ def _parse_args():
         default=None,
         help="Base path to the model directory in GCP bucket",
     )
+    parser.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=8,
+        help="Max number of requests grouped by the Triton dynamic batcher.",
+    )
+    parser.add_argument(
+        "--max-queue-delay",
+        type=int,
+        default=100,
+        help="Max time in microseconds a request waits in queue to be batched.",
+    )
+    parser.add_argument(
+        "--max-batch-sentences",
+        type=int,
+        default=16,
+        help="Max sentences synthesized in a single padded forward pass.",
+    )
+    parser.add_argument(
+        "--crossfade-seconds",
+        type=float,
+        default=0.02,
+        help="Crossfade between the sentences of a text.",
+    )
     return parser.parse_args()
 
 
@@ -177,6 +214,8 @@ def main():
                 logger=logger,
                 gpu=args.gpu,
                 model_base_path=args.model_base_path,
+                max_batch_sentences=args.max_batch_sentences,
+                crossfade_seconds=args.crossfade_seconds,
             ),
             inputs=[
                 Tensor(name="text", dtype=np.bytes_, shape=(1,)),
@@ -188,9 +227,9 @@ def main():
                 ),  # Variable length
             ],
             config=ModelConfig(
-                max_batch_size=1,
+                max_batch_size=args.max_batch_size,
                 batcher=DynamicBatcher(
-                    max_queue_delay_microseconds=100,
+                    max_queue_delay_microseconds=args.max_queue_delay,
                 ),
             ),
             strict=True,
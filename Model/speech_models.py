@@ -1,6 +1,8 @@
 import logging
 import os
+import re
 from abc import ABC, abstractmethod
+from collections import defaultdict
 
 import torch
 from dotenv import load_dotenv
@@ -11,6 +13,35 @@ HF_TOKEN = os.getenv("HF_TOKEN")
 
 nllb_language_token_map = {"rap_female": "rap/female", "rap_male": "rap/male"}
 
+# sentence ends followed by whitespace, and line breaks
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;:])\s+|\n+")
+
+
+def split_sentences(text: str) -> list[str]:
+    """
+    Splits a text in sentences, dropping the ones without any word (for example a
+    lone punctuation mark), which the model cannot synthesize.
+    """
+    sentences = [s.strip() for s in _SENTENCE_BOUNDARY.split(text)]
+    return [s for s in sentences if re.search(r"\w", s)] or [text]
+
+
+def crossfade(waveforms: list[torch.Tensor], overlap: int) -> torch.Tensor:
+    """
+    Concatenates waveforms, mixing the last `overlap` samples of each one with the
+    first ones of the next with a linear fade, so there are no clicks in between.
+    """
+    waveform = waveforms[0]
+    for following in waveforms[1:]:
+        size = min(overlap, len(waveform), len(following))
+        if size == 0:
+            waveform = torch.cat([waveform, following])
+            continue
+        fade_in = torch.linspace(0, 1, size, device=waveform.device)
+        mixed = waveform[-size:] * (1 - fade_in) + following[:size] * fade_in
+        waveform = torch.cat([waveform[:-size], mixed, following[size:]])
+    return waveform
+
 
 class SpeechModelWrapper(ABC):
     """
@@ -23,13 +54,20 @@ class SpeechModelWrapper(ABC):
     _tokenizer_cache = {}
 
     def __init__(
-        self, logger: logging.Logger, gpu: bool = True, model_base_path: str = None
+        self,
+        logger: logging.Logger,
+        gpu: bool = True,
+        model_base_path: str = None,
+        max_batch_sentences: int = 16,
+        crossfade_seconds: float = 0.02,
     ):
         self.logger = logger
         self._device = torch.device(
             "cuda" if gpu and torch.cuda.is_available() else "cpu"
         )
         self.model_base_path = model_base_path
+        self.max_batch_sentences = max_batch_sentences
+        self.crossfade_seconds = crossfade_seconds
         self._preload_models()
 
     def _preload_models(self):
@@ -88,22 +126,68 @@ class SpeechModelWrapper(ABC):
         self.logger.info("All TTS models preloaded.")
 
     @abstractmethod
-    def tokenize(self, text: str, lang: str):
+    def tokenize(self, texts: list[str], lang: str):
         pass
 
     @abstractmethod
-    def synthesize(self, inputs, lang: str):
+    def synthesize(self, inputs, lang: str) -> list[torch.Tensor]:
+        """Returns the waveform of each text, without padding."""
         pass
 
     def predict(self, text: str, lang_code: str) -> torch.Tensor:
         """
         Predict speech waveform from text and language code.
         """
-        if lang_code not in nllb_language_token_map:
-            raise ValueError(f"Unsupported language: {lang_code}")
-        lang = nllb_language_token_map[lang_code]
-        inputs = self.tokenize(text, lang)
-        return self.synthesize(inputs, lang)
+        return self.predict_batch([text], [lang_code])[0]
+
+    def predict_batch(
+        self, texts: list[str], lang_codes: list[str]
+    ) -> list[torch.Tensor]:
+        """
+        Synthesizes several texts. Texts are split in sentences, and the sentences
+        of every text in the same language are synthesized together in padded
+        batches of up to `max_batch_sentences`, sorted by length so similar
+        sentences share a batch. The sentences of each text are joined back with a
+        short crossfade.
+
+        Args:
+            texts (`list[str]`): Texts to synthesize.
+            lang_codes (`list[str]`): Language code of each text.
+
+        Returns:
+            waveforms (`list[torch.Tensor]`): 1D waveform of each text.
+        """
+        sentences = defaultdict(list)  # lang -> [(text index, sentence)]
+        for idx, (text, lang_code) in enumerate(zip(texts, lang_codes)):
+            if lang_code not in nllb_language_token_map:
+                raise ValueError(f"Unsupported language: {lang_code}")
+            lang = nllb_language_token_map[lang_code]
+            sentences[lang].extend((idx, s) for s in split_sentences(text))
+
+        waveforms = [None] * len(texts)
+        for lang, items in sentences.items():
+            order = sorted(range(len(items)), key=lambda i: len(items[i][1]))
+            results = [None] * len(items)
+            for start in range(0, len(order), self.max_batch_sentences):
+                batch = order[start : start + self.max_batch_sentences]
+                inputs = self.tokenize([items[i][1] for i in batch], lang)
+                for i, waveform in zip(batch, self.synthesize(inputs, lang)):
+                    results[i] = waveform
+
+            by_text = defaultdict(list)
+            for (idx, _), waveform in zip(items, results):
+                by_text[idx].append(waveform)
+            overlap = int(
+                self.crossfade_seconds * self.models[lang].config.sampling_rate
+            )
+            for idx, parts in by_text.items():
+                waveforms[idx] = crossfade(parts, overlap)
+
+        self.logger.debug(
+            f"Synthesized {len(texts)} texts, "
+            f"{sum(len(items) for items in sentences.values())} sentences"
+        )
+        return waveforms
 
 
 class MMSTTSWrapper(SpeechModelWrapper):
@@ -112,15 +196,27 @@ class MMSTTSWrapper(SpeechModelWrapper):
     """
 
     def __init__(
-        self, logger: logging.Logger, gpu: bool = True, model_base_path: str = None
+        self,
+        logger: logging.Logger,
+        gpu: bool = True,
+        model_base_path: str = None,
+        max_batch_sentences: int = 16,
+        crossfade_seconds: float = 0.02,
     ):
-        super().__init__(logger, gpu, model_base_path)
+        super().__init__(
+            logger, gpu, model_base_path, max_batch_sentences, crossfade_seconds
+        )
 
-    def tokenize(self, text: str, lang: str):
+    def tokenize(self, texts: list[str], lang: str):
         tokenizer = self.tokenizers[lang]
-        return tokenizer(text, return_tensors="pt").to(self._device)
+        return tokenizer(texts, return_tensors="pt", padding=True).to(self._device)
 
-    def synthesize(self, inputs, lang: str):
+    def synthesize(self, inputs, lang: str) -> list[torch.Tensor]:
         model = self.models[lang]
         with torch.no_grad():
-            return model(**inputs).waveform
+            outputs = model(**inputs)
+        # sequence_lengths comes from the predicted durations, the rest is padding
+        return [
+            waveform[:length]
+            for waveform, length in zip(outputs.waveform, outputs.sequence_lengths)
+        ]
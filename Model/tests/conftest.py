@@ -0,0 +1,5 @@
+import os
+import sys
+
+# modules of the model servers import each other from the Model folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,60 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from asr_batcher import ASRBatcher
+
+
+class FakeASR:
+    """Transcribes a clip as its length, recording the clips of every call."""
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def predict_batch(self, audios, sampling_rates, lang_codes):
+        with self.lock:
+            self.calls.append([len(audio) for audio in audios])
+        if "xxx" in lang_codes:
+            raise ValueError("Unsupported language: xxx")
+        return [str(len(audio)) for audio in audios]
+
+
+def transcribe(batcher, length, lang_code="spa_Latn"):
+    return batcher.transcribe([np.zeros(length, np.float32)], [16000], [lang_code])
+
+
+# 1. clips of different lengths from concurrent requests share a batch
+def test_batches_concurrent_requests():
+    model = FakeASR()
+    batcher = ASRBatcher(model, logging.getLogger(), max_batch_size=4, max_delay=5)
+    lengths = [16000, 8000, 32000, 4000]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        texts = list(executor.map(lambda n: transcribe(batcher, n), lengths))
+
+    assert texts == [[str(n)] for n in lengths]
+    assert len(model.calls) == 1
+    assert sorted(model.calls[0]) == sorted(lengths)
+
+
+# 2. a lone request waits at most max_delay
+def test_single_request_not_held():
+    model = FakeASR()
+    batcher = ASRBatcher(model, logging.getLogger(), max_batch_size=16, max_delay=0)
+    assert transcribe(batcher, 1600) == ["1600"]
+    assert transcribe(batcher, 3200) == ["3200"]
+    assert model.calls == [[1600], [3200]]
+
+
+# 3. a failing request does not fail the others of its batch
+def test_failing_request_isolated():
+    model = FakeASR()
+    batcher = ASRBatcher(model, logging.getLogger(), max_batch_size=2, max_delay=5)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        ok = executor.submit(transcribe, batcher, 1600)
+        bad = executor.submit(transcribe, batcher, 3200, "xxx")
+        assert ok.result() == ["1600"]
+        with pytest.raises(ValueError):
+            bad.result()
@@ -0,0 +1,74 @@
+import logging
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from model import NLLBModelWrapper
+from translation_cache import TranslationCache
+
+
+def length_buckets(lengths, max_batch_tokens=None, max_batch_size=None):
+    # only the batch limits are read, so no model has to be loaded
+    wrapper = SimpleNamespace(
+        max_batch_tokens=max_batch_tokens, max_batch_size=max_batch_size
+    )
+    return NLLBModelWrapper.length_buckets(wrapper, lengths)
+
+
+# 1. buckets are filled shortest first, within the padded token budget
+def test_length_buckets_token_budget():
+    lengths = [30, 5, 12, 6, 11, 29]
+    buckets = length_buckets(lengths, max_batch_tokens=36)
+
+    assert buckets == [[1, 3, 4], [2], [5], [0]]
+    for bucket in buckets:
+        assert len(bucket) * max(lengths[idx] for idx in bucket) <= 36
+
+
+# 2. buckets never have more than max_batch_size sentences
+def test_length_buckets_batch_size():
+    buckets = length_buckets([4] * 7, max_batch_tokens=1000, max_batch_size=3)
+
+    assert [len(bucket) for bucket in buckets] == [3, 3, 1]
+    assert sorted(idx for bucket in buckets for idx in bucket) == list(range(7))
+
+
+# 3. a sentence longer than the budget gets a bucket on its own
+def test_length_buckets_long_sentence():
+    assert length_buckets([3, 50, 4], max_batch_tokens=16) == [[0, 2], [1]]
+
+
+# 4. without limits all sentences are generated together
+def test_length_buckets_unbounded():
+    assert length_buckets([9, 1, 5]) == [[1, 2, 0]]
+    assert length_buckets([]) == []
+
+
+def load_wrapper(quantize, cache):
+    config = SimpleNamespace(
+        model_type="m2m_100", hidden_size=8, vocab_size=8, _name_or_path="nllb"
+    )
+    fake_model = SimpleNamespace(config=config, eval=lambda: None)
+    with patch("model.AutoTokenizer.from_pretrained"), patch(
+        "model.AutoModelForSeq2SeqLM.from_pretrained", return_value=fake_model
+    ):
+        wrapper = NLLBModelWrapper(
+            "nllb", logging.getLogger(), gpu=False, cache=cache, quantize=quantize
+        )
+    wrapper.translate_sentences = lambda sentences, src, tgt: [
+        f"{quantize}: {sentence}" for sentence in sentences
+    ]
+    return wrapper
+
+
+# 5. translations of a quantization mode are not served to the others
+def test_translation_cache_key_quantization(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    logger = logging.getLogger()
+    cache = TranslationCache(1 << 20, logger, db_path=db_path)
+    bf16 = load_wrapper("bf16", cache).translate_cached(["Hola"], "spa", "rap")
+    # a restart with another mode, the translations are only found on disk
+    cache = TranslationCache(1 << 20, logger, db_path=db_path)
+    none = load_wrapper("none", cache).translate_cached(["Hola"], "spa", "rap")
+    again = load_wrapper("bf16", cache).translate_cached(["Hola"], "spa", "rap")
+
+    assert (bf16, none, again) == (["bf16: Hola"], ["none: Hola"], ["bf16: Hola"])
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from segmentation import split_on_silence, stitch
+
+SAMPLING_RATE = 16000
+
+
+def speech(seconds, seed=0):
+    """Noise without pauses, so every cut is forced."""
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-1, 1, int(seconds * SAMPLING_RATE)).astype(np.float32)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * SAMPLING_RATE), dtype=np.float32)
+
+
+# 1. segments are cut at the middle of a pause
+def test_split_at_pause():
+    audio = np.concatenate([speech(4), silence(1), speech(4, seed=1)])
+    segments = split_on_silence(audio, SAMPLING_RATE, max_segment_seconds=6)
+
+    assert len(segments) == 2
+    (start, cut, overlaps), (next_start, end, next_overlaps) = segments
+    assert start == 0 and end == len(audio)
+    assert cut == next_start
+    assert 4 * SAMPLING_RATE < cut < 5 * SAMPLING_RATE
+    assert not overlaps and not next_overlaps
+
+
+# 2. without pauses the cut is forced and the next segment overlaps it
+def test_forced_cut_overlaps():
+    segments = split_on_silence(
+        speech(5), SAMPLING_RATE, max_segment_seconds=2, overlap_seconds=0.5
+    )
+
+    assert segments[0] == (0, 2 * SAMPLING_RATE, False)
+    assert segments[1][0] == int(1.5 * SAMPLING_RATE)
+    assert all(overlaps for _, _, overlaps in segments[1:])
+    assert segments[-1][1] == 5 * SAMPLING_RATE
+
+
+# 3. segments not longer than the overlap would never move forward
+@pytest.mark.parametrize("max_segment_seconds", [1, 0.5])
+def test_segment_not_longer_than_overlap(max_segment_seconds):
+    with pytest.raises(ValueError):
+        split_on_silence(
+            speech(5),
+            SAMPLING_RATE,
+            max_segment_seconds=max_segment_seconds,
+            overlap_seconds=1,
+        )
+
+
+# 4. silent segments are dropped
+def test_silent_segments_dropped():
+    audio = np.concatenate([speech(1), silence(6), speech(1, seed=1)])
+    segments = split_on_silence(audio, SAMPLING_RATE, max_segment_seconds=2)
+
+    for start, end, _ in segments:
+        assert np.abs(audio[start:end]).max() > 0
+
+
+# 5. words repeated by an overlapping segment are kept once
+def test_stitch_overlap():
+    assert stitch("ka ora koe", "ora koe e hoa", overlaps=True) == "ka ora koe e hoa"
+    assert stitch("ka ora koe", "koe e hoa", overlaps=False) == "ka ora koe koe e hoa"
@@ -0,0 +1,87 @@
+import itertools
+import logging
+import sqlite3
+from unittest.mock import patch
+
+from translation_cache import TranslationCache
+
+
+def key(sentence, model_id="nllb"):
+    return TranslationCache.make_key(sentence, "spa_Latn", "rap_Latn", model_id)
+
+
+def entry_size(sentence, translation):
+    return TranslationCache._entry_size(key(sentence), translation)
+
+
+# 1. keys are normalized, and hits and misses are counted
+def test_cache_key_and_stats():
+    cache = TranslationCache(1 << 20, logging.getLogger())
+    cache.put(key(" Hola   mundo "), "Iorana")
+
+    assert key("Hola mundo") == key(" Hola   mundo ")
+    assert cache.get(key("Hola mundo")) == "Iorana"
+    assert cache.get(key("Hola mundo", model_id="madlad")) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+# 2. the least recently used entries are evicted past max_bytes
+def test_memory_eviction_by_bytes():
+    size = entry_size("uno", "tahi")
+    cache = TranslationCache(2 * size, logging.getLogger())
+    cache.put(key("uno"), "tahi")
+    cache.put(key("dos"), "rua")
+    cache.get(key("uno"))
+    cache.put(key("tre"), "toru")
+
+    assert cache.get(key("dos")) is None
+    assert cache.get(key("uno")) == "tahi"
+    assert cache.get(key("tre")) == "toru"
+    assert cache.size_bytes == size + entry_size("tre", "toru") <= cache.max_bytes
+
+
+# 3. entries larger than the cache are not kept in memory
+def test_memory_skips_large_entries():
+    cache = TranslationCache(entry_size("uno", "tahi"), logging.getLogger())
+    cache.put(key("uno"), "tahi")
+    cache.put(key("dos"), "rua" * 10)
+
+    assert cache.get(key("uno")) == "tahi"
+    assert cache.get(key("dos")) is None
+
+
+# 4. entries evicted from memory or kept before a restart are read from disk
+def test_disk_round_trip(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    cache = TranslationCache(entry_size("uno", "tahi"), logging.getLogger(), db_path)
+    cache.put(key("uno"), "tahi")
+    cache.put(key("dos"), "rua")
+
+    assert list(cache._entries) == [key("dos")]
+    assert cache.get(key("uno")) == "tahi"
+    assert list(cache._entries) == [key("uno")]
+
+    restarted = TranslationCache(1 << 20, logging.getLogger(), db_path)
+    assert restarted.stats()["disk_bytes"] == cache.stats()["disk_bytes"]
+    assert restarted.get(key("dos")) == "rua"
+    assert restarted.stats()["hits"] == 1
+
+
+# 5. the least recently accessed rows are deleted past max_disk_bytes
+def test_disk_eviction_by_access(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    size = entry_size("uno", "tahi")
+    cache = TranslationCache(0, logging.getLogger(), db_path, max_disk_bytes=2 * size)
+    # one tick per access, so accessed_at never ties
+    with patch("translation_cache.time.time", side_effect=itertools.count()):
+        cache.put(key("uno"), "tahi")
+        cache.put(key("dos"), "tahi")
+        # read from disk, as nothing fits in memory, which updates accessed_at
+        assert cache.get(key("uno")) == "tahi"
+        cache.put(key("tre"), "tahi")
+
+    with sqlite3.connect(db_path) as db:
+        rows = db.execute("SELECT sentence FROM translations ORDER BY sentence")
+        assert [row[0] for row in rows] == ["tre", "uno"]
+    assert cache.stats()["disk_bytes"] == 2 * size
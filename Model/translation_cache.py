@@ -0,0 +1,167 @@
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+_CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS translations (
+    sentence TEXT NOT NULL,
+    source_lang TEXT NOT NULL,
+    target_lang TEXT NOT NULL,
+    model_id TEXT NOT NULL,
+    translation TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (sentence, source_lang, target_lang, model_id)
+)
+"""
+
+
+def normalize_sentence(sentence: str) -> str:
+    """Unicode NFC normalization, stripped and with collapsed whitespace."""
+    return " ".join(unicodedata.normalize("NFC", sentence).split())
+
+
+class TranslationCache:
+    """
+    In-process LRU cache of sentence translations, keyed on
+    `(normalized sentence, source_lang, target_lang, model_id)`.
+
+    The in-memory tier is bounded by `max_bytes` (UTF-8 size of keys and values).
+    If `db_path` is given, every entry is also written to a SQLite file so the
+    cache survives restarts; entries evicted from memory are loaded back from disk
+    on the next lookup. The disk tier is bounded by `max_disk_bytes`, evicting the
+    least recently accessed rows.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        logger: logging.Logger,
+        db_path: Optional[str] = None,
+        max_disk_bytes: Optional[int] = None,
+    ):
+        self.logger = logger
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self.size_bytes = 0
+        self._entries = OrderedDict()
+        # shared by all model copies, which run in different threads
+        self._lock = threading.Lock()
+
+        self._db = None
+        self._disk_bytes = 0
+        if db_path:
+            self.logger.info(f"Loading translation cache from {db_path}")
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(_CREATE_TABLE)
+            self._db.commit()
+            self._disk_bytes = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM translations"
+            ).fetchone()[0]
+
+    @staticmethod
+    def make_key(sentence: str, source_lang: str, target_lang: str, model_id: str):
+        return (normalize_sentence(sentence), source_lang, target_lang, model_id)
+
+    @staticmethod
+    def _entry_size(key, translation: str) -> int:
+        return sum(len(part.encode("utf-8")) for part in key) + len(
+            translation.encode("utf-8")
+        )
+
+    def get(self, key) -> Optional[str]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+            translation = self._get_from_disk(key)
+            if translation is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._put_in_memory(key, translation)
+            return translation
+
+    def put(self, key, translation: str):
+        with self._lock:
+            self._put_in_memory(key, translation)
+            self._put_on_disk(key, translation)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "disk_bytes": self._disk_bytes,
+        }
+
+    def _put_in_memory(self, key, translation: str):
+        size = self._entry_size(key, translation)
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self.size_bytes -= self._entry_size(key, self._entries.pop(key))
+        self._entries[key] = translation
+        self.size_bytes += size
+
+        while self.size_bytes > self.max_bytes:
+            old_key, old_translation = self._entries.popitem(last=False)
+            self.size_bytes -= self._entry_size(old_key, old_translation)
+
+    def _get_from_disk(self, key) -> Optional[str]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT translation FROM translations WHERE sentence = ? AND "
+            "source_lang = ? AND target_lang = ? AND model_id = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            return None
+        self._db.execute(
+            "UPDATE translations SET accessed_at = ? WHERE sentence = ? AND "
+            "source_lang = ? AND target_lang = ? AND model_id = ?",
+            (time.time(), *key),
+        )
+        self._db.commit()
+        return row[0]
+
+    def _put_on_disk(self, key, translation: str):
+        if self._db is None:
+            return
+        size = self._entry_size(key, translation)
+        previous = self._db.execute(
+            "SELECT size FROM translations WHERE sentence = ? AND "
+            "source_lang = ? AND target_lang = ? AND model_id = ?",
+            key,
+        ).fetchone()
+        self._db.execute(
+            "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (*key, translation, size, time.time()),
+        )
+        self._disk_bytes += size - (previous[0] if previous else 0)
+
+        if self.max_disk_bytes is not None:
+            while self._disk_bytes > self.max_disk_bytes:
+                row = self._db.execute(
+                    "SELECT rowid, size FROM translations "
+                    "ORDER BY accessed_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    break
+                self._db.execute("DELETE FROM translations WHERE rowid = ?", (row[0],))
+                self._disk_bytes -= row[1]
+        self._db.commit()
@@ -1,10 +1,20 @@
-import base64
+import argparse
 import json
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 import librosa
 import numpy as np
 import psycopg2
+from psycopg2.extras import execute_values
+
+# cache keys are normalized as the backend does
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "Backend", "translatorapp_v2")
+)
+from main.normalization import normalize_text_for_cache, normalized_hash  # noqa: E402
 
 DB_HOST = "127.0.0.1"
 DB_PORT = "5432"
@@ -16,8 +26,117 @@ DB_PASSWORD = ""
 JSON_FILE = "sample_json.json"
 AUDIO_DIR = "RECORDED_AUDIOS_CLONE"
 
+LANGUAGE_CODE = "rap_Latn"
+SAMPLING_RATE = 16000
+BATCH_SIZE = 200
+
+# curated audio replaces audio generated by the backend for the same text
+INSERT_SQL = """
+    INSERT INTO main_cachetts
+    (text, normalized_text, normalized_hash, audio, audio_format, sampling_rate,
+     num_samples, language_id, gender, source, created_at)
+    VALUES %s
+    ON CONFLICT (language_id, gender, normalized_hash) DO UPDATE SET
+        text = EXCLUDED.text,
+        audio = EXCLUDED.audio,
+        audio_format = EXCLUDED.audio_format,
+        sampling_rate = EXCLUDED.sampling_rate,
+        num_samples = EXCLUDED.num_samples,
+        source = 'curated',
+        created_at = EXCLUDED.created_at,
+        last_hit_at = NULL
+    WHERE main_cachetts.source = 'auto'
+"""
+INSERT_TEMPLATE = "(%s, %s, %s, %s, 'pcm16', %s, %s, %s, %s, 'curated', now())"
+
+
+def decode_audio(audio_path):
+    """
+    Loads, downmixes and resamples an audio file, in a worker process.
+    Returns the 16-bit little-endian PCM bytes and the number of samples.
+    """
+    audio_data, _ = librosa.load(
+        audio_path, sr=SAMPLING_RATE, mono=True, dtype=np.float32
+    )
+    audio_data = np.clip(audio_data, -1.0, 1.0)
+    return (audio_data * 32767).astype("<i2").tobytes(), len(audio_data)
+
+
+def _decode_entry(audio_path):
+    try:
+        return decode_audio(audio_path), None
+    except FileNotFoundError:
+        return None, f"Audio file not found: {audio_path}"
+    except Exception as e:
+        return None, f"Error decoding {audio_path}: {e}"
+
+
+def get_language_id(conn, code):
+    with conn.cursor() as cur:
+        cur.execute("SELECT id FROM main_lang WHERE code = %s", (code,))
+        row = cur.fetchone()
+    return row[0] if row else None
+
+
+def get_ingested_keys(conn, language_id):
+    """(normalized hash, gender) of the curated rows already in the cache."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT text, normalized_hash, gender FROM main_cachetts
+            WHERE language_id = %s AND source = 'curated'
+            """,
+            (language_id,),
+        )
+        return {
+            # rows inserted before normalized_hash was filled have it null
+            (text_hash or normalized_hash(normalize_text_for_cache(text)), gender)
+            for text, text_hash, gender in cur
+        }
+
 
-def upload_data():
+def get_pending_entries(data, ingested):
+    entries, skipped = [], 0
+    for entry in data:
+        normalized_text = normalize_text_for_cache(entry.get("text"))
+        key = (normalized_hash(normalized_text), entry.get("gender"))
+        if key[0] is None or key in ingested:
+            skipped += 1
+            continue
+        # repeated texts in the file are ingested once
+        ingested.add(key)
+        entries.append((entry, normalized_text, key[0]))
+    return entries, skipped
+
+
+def write_batch(conn, language_id, batch, decoded):
+    rows, seconds = [], 0
+    for (entry, normalized_text, text_hash), (audio, error) in zip(batch, decoded):
+        if error:
+            print(f"Warning: {error}")
+            continue
+        pcm16, num_samples = audio
+        rows.append(
+            (
+                entry["text"],
+                normalized_text,
+                text_hash,
+                psycopg2.Binary(pcm16),
+                SAMPLING_RATE,
+                num_samples,
+                language_id,
+                entry["gender"],
+            )
+        )
+        seconds += num_samples / SAMPLING_RATE
+
+    with conn.cursor() as cur:
+        execute_values(cur, INSERT_SQL, rows, template=INSERT_TEMPLATE)
+    conn.commit()
+    return len(rows), seconds
+
+
+def upload_data(json_file, audio_dir, language_code, workers, batch_size):
     print(f"Connecting to database at {DB_HOST}:{DB_PORT} via proxy...")
     try:
         conn = psycopg2.connect(
@@ -26,61 +145,82 @@ def upload_data():
             dbname=DB_NAME,
             user=DB_USER,
             password=DB_PASSWORD,
+            client_encoding="utf8",
         )
     except Exception as e:
         print(f"Error connecting to database: {e}")
         return
 
     try:
-        with open(JSON_FILE, "r", encoding="utf-8") as f:
+        with open(json_file, "r", encoding="utf-8") as f:
             data = json.load(f)
     except Exception as e:
-        print(f"Error reading {JSON_FILE}: {e}")
+        print(f"Error reading {json_file}: {e}")
         conn.close()
         return
 
-    for entry in data:
-        text = entry.get("text")
-        audio_filename = entry.get("audio")
-        gender = entry.get("gender")
-
-        # Hardcoding default values
-        audio_format = "wav"
-        language_id = 163
-
-        audio_path = os.path.join(AUDIO_DIR, audio_filename)
-
-        try:
-            with conn.cursor() as cur:
-                audio_data, _ = librosa.load(
-                    audio_path, sr=16000, mono=True, dtype=np.float32
-                )
-
-                # Extract contiguous base-level bytes to base64 encode
-                raw_bytes = audio_data.tobytes()
-                audio_base64 = base64.b64encode(raw_bytes).decode("utf-8")
-
-                cur.execute(
-                    """
-                    INSERT INTO main_cachetts
-                    (text, audio_data, audio_format, language_id, gender)
-                    VALUES (%s, %s, %s, %s, %s)
-                    """,
-                    (text, audio_base64, audio_format, language_id, gender),
-                )
-
-            conn.commit()
-            print(f"Successfully uploaded: {audio_filename}")
-
-        except FileNotFoundError:
-            print(f"Warning: Audio file not found: {audio_path}")
-        except Exception as e:
-            print(f"Error uploading {audio_filename}: {e}")
-            conn.rollback()
-
-    print("Upload complete!")
+    language_id = get_language_id(conn, language_code)
+    if language_id is None:
+        print(f"Error: language {language_code} not found")
+        conn.close()
+        return
+
+    entries, skipped = get_pending_entries(data, get_ingested_keys(conn, language_id))
+    print(f"{len(entries)} audios to upload, {skipped} already uploaded or empty")
+
+    batches = [entries[i : i + batch_size] for i in range(0, len(entries), batch_size)]
+    uploaded = failed = 0
+    audio_seconds = 0.0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+
+        def decode(batch):
+            paths = [os.path.join(audio_dir, entry["audio"]) for entry, _, _ in batch]
+            chunksize = max(1, len(paths) // (4 * workers))
+            return executor.map(_decode_entry, paths, chunksize=chunksize)
+
+        pending = decode(batches[0]) if batches else None
+        for i, batch in enumerate(batches):
+            decoded = list(pending)
+            # the next batch is decoded while this one is written
+            if i + 1 < len(batches):
+                pending = decode(batches[i + 1])
+            try:
+                count, seconds = write_batch(conn, language_id, batch, decoded)
+            except Exception as e:
+                print(f"Error uploading batch {i + 1}: {e}")
+                conn.rollback()
+                failed += len(batch)
+                continue
+            uploaded += count
+            failed += len(batch) - count
+            audio_seconds += seconds
+            elapsed = time.perf_counter() - start
+            print(
+                f"Batch {i + 1}/{len(batches)}: {uploaded} uploaded "
+                f"({uploaded / elapsed:.1f} files/s, "
+                f"{audio_seconds / elapsed:.1f}s of audio/s)"
+            )
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Upload complete! {uploaded} uploaded, {failed} failed, {skipped} skipped "
+        f"in {elapsed:.1f}s ({uploaded / max(elapsed, 1e-9):.1f} files/s)"
+    )
     conn.close()
 
 
 if __name__ == "__main__":
-    upload_data()
+    parser = argparse.ArgumentParser(
+        description="Uploads recorded audios to the TTS cache. Already uploaded "
+        "texts are skipped, so an interrupted upload can be run again."
+    )
+    parser.add_argument("--json-file", default=JSON_FILE)
+    parser.add_argument("--audio-dir", default=AUDIO_DIR)
+    parser.add_argument("--language", default=LANGUAGE_CODE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    upload_data(
+        args.json_file, args.audio_dir, args.language, args.workers, args.batch_size
+    )